@@ -0,0 +1,78 @@
+"""
+Micro-benchmark: clean_currency celda a celda vs. clean_currency_series.
+
+Genera una MATRIZ sintética con las columnas financieras de HCB y mezcla de
+formatos (números, textos con $ y puntos de miles, vacíos, textos basura) y
+compara tiempos y resultados de ambas versiones. Como en la MATRIZ real, los
+valores son del contrato y se repiten en cada UDS (--uds-por-contrato); con
+--uds-por-contrato 1 todos los valores son distintos (peor caso).
+
+Uso: python benchmarks/bench_clean_currency.py [--rows 200000] [--uds-por-contrato 40]
+
+La equivalencia entre ambas versiones se prueba en tests/test_cleaning.py.
+"""
+
+import os
+import sys
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from pipeline_common.cleaning import clean_currency, clean_currency_series
+
+FIN_COLS = [
+    'VALOR INICIAL 2026', 'APORTE CONTRAPARTIDA', 'VALOR ADICIONES A LA FECHA',
+    'VALOR REDUCCIONES A LA FECHA', 'INEJECUCIONES', 'VALOR ACTUAL',
+    'VALOR A ADICIONAR', 'VALOR UNITARIO MES', 'VALOR CANASTA 2026', 'CUPOS',
+]
+
+
+def matriz_sintetica(n_rows, uds_por_contrato=40, seed=2026):
+    rng = np.random.default_rng(seed)
+    n_contratos = max(n_rows // uds_por_contrato, 1)
+    contrato = np.sort(rng.integers(0, n_contratos, n_rows))
+    data = {}
+    for col in FIN_COLS:
+        valores = (rng.integers(0, 5_000_000_000, n_contratos) / 100)[contrato]
+        celdas = valores.astype(object)
+        tipo = rng.random(n_contratos)[contrato]
+        # ~35% texto con formato pesos colombianos, ~5% vacíos, ~2% basura
+        fmt = tipo < 0.35
+        celdas[fmt] = [f"$ {v:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.') for v in valores[fmt]]
+        celdas[(tipo >= 0.35) & (tipo < 0.38)] = np.nan
+        celdas[(tipo >= 0.38) & (tipo < 0.40)] = ''
+        celdas[(tipo >= 0.40) & (tipo < 0.42)] = 'N/A'
+        data[col] = celdas
+    return pd.DataFrame(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de limpieza de moneda en la MATRIZ HCB.')
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--uds-por-contrato', type=int, default=40)
+    args = parser.parse_args()
+
+    df = matriz_sintetica(args.rows, args.uds_por_contrato)
+    print(f"MATRIZ sintética: {len(df)} filas x {len(FIN_COLS)} columnas financieras "
+          f"(~{args.uds_por_contrato} UDS por contrato)")
+
+    t0 = time.time()
+    old = {c: df[c].apply(clean_currency) for c in FIN_COLS}
+    t_old = time.time() - t0
+
+    t0 = time.time()
+    new = {c: clean_currency_series(df[c]) for c in FIN_COLS}
+    t_new = time.time() - t0
+
+    for c in FIN_COLS:
+        pd.testing.assert_series_equal(old[c].astype('float64'), new[c], check_names=False)
+
+    print(f"  apply(clean_currency):  {t_old:.2f}s")
+    print(f"  clean_currency_series:  {t_new:.2f}s")
+    print(f"  Aceleración: x{t_old / t_new:.1f} (resultados idénticos)")
+
+
+if __name__ == '__main__':
+    main()
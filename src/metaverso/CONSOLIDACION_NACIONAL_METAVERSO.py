@@ -1,9 +1,15 @@
+import numpy as np
 import pandas as pd
+import argparse
 import glob
 import os
 import re
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from pipeline_common.excel_writer import write_excel
+from pipeline_common.uds_codes import SIN_CODIGO, canonical_uds_codes
 
 # --- CONFIGURACIÓN DE RUTAS ---
 DIR_BASE = r"D:\ICBF\cost-tracking\data\insumos metaverso"
@@ -22,124 +28,172 @@ def find_sheet_robust(xl_names, search_terms):
             return name
     return None
 
-def extract_all_insumos():
-    """Recopila todos los datos frescos de los insumos 2026 (Nacional)."""
-    print(">>> Extrayendo datos de Insumos 2026 (Integrales, HCB, Alimentos)...")
-    rows = []
-    
-    # 1. INTEGRALES (Por Regional)
-    int_files = glob.glob(os.path.join(INTEGRALES_DIR, "**", "*.xls*"), recursive=True)
-    for f in int_files:
-        if "~$" in f: continue
-        try:
-            xl = pd.ExcelFile(f)
-            sh_zon = find_sheet_robust(xl.sheet_names, ['ZONIFICA', 'PEDAGOGICO'])
-            if sh_zon:
-                df = pd.read_excel(f, sheet_name=sh_zon, skiprows=4)
-                for _, r in df.iterrows():
-                    code = str(r.iloc[6]).split('.')[0]
-                    if len(code) >= 10: # Validación básica de código UDS
-                        rows.append({
-                            'Codigo Unidad Servicio UDS': code,
-                            'Cupos a Programar 2026': r.iloc[8],
-                            'VALOR SOLO 2026': r.iloc[13],
-                            'SERVICIO\n2026': r.iloc[4],
-                            'ZONA 2026': str(r.iloc[0]),
-                            'Modalidad 2026': 'INTEGRAL'
-                        })
-        except Exception as e: print(f"Error en {os.path.basename(f)}: {e}")
-
-    # 2. HCB (Por Regional)
-    hcb_files = glob.glob(os.path.join(HCB_DIR, "**", "*.xls*"), recursive=True)
-    for f in hcb_files:
-        if "~$" in f: continue
-        try:
-            xl = pd.ExcelFile(f)
-            sh_hcb = find_sheet_robust(xl.sheet_names, ['BASE', 'COSTOS', 'HCB'])
-            if sh_hcb:
-                df = pd.read_excel(f, sheet_name=sh_hcb, skiprows=1)
-                for _, r in df.iterrows():
-                    code = str(r.iloc[6]).split('.')[0]
-                    if len(code) >= 10:
-                        rows.append({
-                            'Codigo Unidad Servicio UDS': code,
-                            'Cupos a Programar 2026': r.iloc[9],
-                            'VALOR SOLO 2026': r.iloc[-1],
-                            'Modalidad 2026': 'HCB'
-                        })
-        except Exception as e: print(f"Error en {os.path.basename(f)}: {e}")
-
-    # 3. ALIMENTOS (Nacional)
+def _texto_sin_decimales(values):
+    """`str(valor).split('.')[0]` de cada celda, calculado una vez por valor distinto."""
+    positions, uniques = pd.factorize(values.astype(object), use_na_sentinel=False)
+    text = np.array([str(v).split('.')[0] for v in uniques], dtype=object)
+    return text[positions]
+
+def _filas_con_codigo(df, col_codigo):
+    """Código como texto y máscara de filas con código UDS válido (validación básica: 10 o más caracteres)."""
+    code = _texto_sin_decimales(df.iloc[:, col_codigo])
+    return code, pd.Series(code).str.len().to_numpy() >= 10
+
+def _extraer_integrales(f):
+    with pd.ExcelFile(f) as xl:
+        sh_zon = find_sheet_robust(xl.sheet_names, ['ZONIFICA', 'PEDAGOGICO'])
+        if not sh_zon:
+            return None
+        df = pd.read_excel(xl, sheet_name=sh_zon, skiprows=4)
+    code, ok = _filas_con_codigo(df, 6)
+    df = df[ok]
+    return pd.DataFrame({
+        'Codigo Unidad Servicio UDS': code[ok],
+        'Cupos a Programar 2026': df.iloc[:, 8].to_numpy(),
+        'VALOR SOLO 2026': df.iloc[:, 13].to_numpy(),
+        'SERVICIO\n2026': df.iloc[:, 4].to_numpy(),
+        'ZONA 2026': df.iloc[:, 0].map(str).to_numpy(),
+        'Modalidad 2026': 'INTEGRAL',
+    })
+
+def _extraer_hcb(f):
+    with pd.ExcelFile(f) as xl:
+        sh_hcb = find_sheet_robust(xl.sheet_names, ['BASE', 'COSTOS', 'HCB'])
+        if not sh_hcb:
+            return None
+        df = pd.read_excel(xl, sheet_name=sh_hcb, skiprows=1)
+    code, ok = _filas_con_codigo(df, 6)
+    df = df[ok]
+    return pd.DataFrame({
+        'Codigo Unidad Servicio UDS': code[ok],
+        'Cupos a Programar 2026': df.iloc[:, 9].to_numpy(),
+        'VALOR SOLO 2026': df.iloc[:, -1].to_numpy(),
+        'Modalidad 2026': 'HCB',
+    })
+
+def _extraer_alimentos(f):
+    df = pd.read_excel(f, sheet_name='ZONIFICACION', skiprows=3)
+    code, ok = _filas_con_codigo(df, 7)
+    df = df[ok]
+    return pd.DataFrame({
+        'Codigo Unidad Servicio UDS': code[ok],
+        'Cupos a Programar 2026': df.iloc[:, 13].to_numpy(),
+        'VALOR SOLO 2026': df.iloc[:, 20].to_numpy(),
+        'SERVICIO\n2026': df.iloc[:, 9].to_numpy(),
+        'CONCEPTO DEFINITIVO': df.iloc[:, 14].to_numpy(),
+        'NIT CONTRATISTA 2026': _texto_sin_decimales(df.iloc[:, 16]),
+        'CONTRATISTA 2026': df.iloc[:, 15].to_numpy(),
+        'Modalidad 2026': 'ALIMENTOS',
+    })
+
+EXTRACTORES = {
+    'INTEGRAL': _extraer_integrales,
+    'HCB': _extraer_hcb,
+    'ALIMENTOS': _extraer_alimentos,
+}
+
+def extraer_insumo(tipo, f):
+    """
+    Un libro de insumos -> (filas con código válido o None, error). Corre en
+    el pool de procesos: el error vuelve como texto, porque una excepción que
+    no se puede serializar rompería el map completo.
+    """
     try:
-        df_alim = pd.read_excel(ALIMENTOS_PATH, sheet_name='ZONIFICACION', skiprows=3)
-        for _, r in df_alim.iterrows():
-            code = str(r.iloc[7]).split('.')[0]
-            if len(code) >= 10:
-                rows.append({
-                    'Codigo Unidad Servicio UDS': code,
-                    'Cupos a Programar 2026': r.iloc[13],
-                    'VALOR SOLO 2026': r.iloc[20],
-                    'SERVICIO\n2026': r.iloc[9],
-                    'CONCEPTO DEFINITIVO': r.iloc[14],
-                    'NIT CONTRATISTA 2026': str(r.iloc[16]).split('.')[0],
-                    'CONTRATISTA 2026': r.iloc[15],
-                    'Modalidad 2026': 'ALIMENTOS'
-                })
-    except Exception as e: print(f"Error en Alimentos: {e}")
-            
-    return pd.DataFrame(rows).drop_duplicates(subset=['Codigo Unidad Servicio UDS', 'Modalidad 2026'])
-
-def main_fusion_nacional():
+        return EXTRACTORES[tipo](f), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+def extract_all_insumos(workers=1):
+    """
+    Recopila todos los datos frescos de los insumos 2026 (Nacional). Cada
+    libro se lee en serie (workers=1) o en un pool de procesos, conservando
+    el orden: Integrales, HCB y Alimentos.
+    """
+    print(">>> Extrayendo datos de Insumos 2026 (Integrales, HCB, Alimentos)...")
+    # 1. INTEGRALES y 2. HCB (Por Regional), 3. ALIMENTOS (Nacional)
+    libros = []
+    for tipo, carpeta in [('INTEGRAL', INTEGRALES_DIR), ('HCB', HCB_DIR)]:
+        for f in glob.glob(os.path.join(carpeta, "**", "*.xls*"), recursive=True):
+            if "~$" in f: continue
+            libros.append((tipo, f))
+    libros.append(('ALIMENTOS', ALIMENTOS_PATH))
+
+    tipos = [t for t, _ in libros]
+    files = [f for _, f in libros]
+    # Nunca más procesos que libros; en Windows el pool no admite más de 61
+    workers = min(workers, len(libros), os.cpu_count() or 1, 61)
+    if workers <= 1:
+        resultados = [extraer_insumo(t, f) for t, f in libros]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            resultados = list(executor.map(extraer_insumo, tipos, files))
+
+    frames = []
+    for (tipo, f), (df, error) in zip(libros, resultados):
+        if error is not None:
+            print(f"Error en {'Alimentos' if tipo == 'ALIMENTOS' else os.path.basename(f)}: {error}")
+        elif df is not None and len(df):
+            frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=['Codigo Unidad Servicio UDS', 'Modalidad 2026'])
+    return pd.concat(frames, ignore_index=True, sort=False).drop_duplicates(subset=['Codigo Unidad Servicio UDS', 'Modalidad 2026'])
+
+# Estado de auditoría según el lado del outer join en que queda cada código
+ESTADOS_AUDITORIA = {
+    'both': "ACTUALIZADO (INSUMO 2026)",
+    'right_only': "NUEVO (SOLO INSUMO 2026)",
+    'left_only': "HISTORICO (SIN RESPALDO 2026)",
+}
+
+# Color de la fila según el estado (el primer texto que aparece en AUDITORIA_ESTADO_2026)
+COLORES_AUDITORIA = {
+    'ACTUALIZADO': "C6EFCE",
+    'NUEVO': "DDEBF7",
+    'HISTORICO': "FFC7CE",
+}
+
+def main_fusion_nacional(workers=1):
     print(">>> Iniciando Reconstrucción Nacional (Fusión Histórico + Insumos)...")
     
     # Cargar Base Histórica
     df_old = pd.read_excel(ORIGINAL_METAVERSO, sheet_name='ZonificacionPais')
-    df_old['Codigo Unidad Servicio UDS'] = df_old['Codigo Unidad Servicio UDS'].astype(str).str.split('.').str[0]
     headers_orig = df_old.columns.tolist()
+    # Cruce por código UDS canónico (int64); las filas sin código válido quedan como histórico
+    df_old['k'] = canonical_uds_codes(df_old['Codigo Unidad Servicio UDS']).codes
 
     # Cargar Insumos Nuevos
-    df_new = extract_all_insumos()
-    
-    # Fusión Maestra (Outer Join)
-    df_final = pd.merge(df_old, df_new, on='Codigo Unidad Servicio UDS', how='outer', suffixes=('_old', ''))
-    
-    # Lógica de Auditoría
-    old_codes = set(df_old['Codigo Unidad Servicio UDS'])
-    new_codes = set(df_new['Codigo Unidad Servicio UDS'])
-    
-    def get_status(row):
-        code = row['Codigo Unidad Servicio UDS']
-        if code in old_codes and code in new_codes: return "ACTUALIZADO (INSUMO 2026)"
-        if code in new_codes: return "NUEVO (SOLO INSUMO 2026)"
-        return "HISTORICO (SIN RESPALDO 2026)"
+    df_new = extract_all_insumos(workers)
+    codigos_new = canonical_uds_codes(df_new['Codigo Unidad Servicio UDS'])
+    if (~codigos_new.valid).any():
+        print(f">>> Insumos sin código UDS válido (descartados): {codigos_new.counts()}")
+    df_new = df_new[codigos_new.valid].assign(k=codigos_new.codes[codigos_new.valid])
+    df_new = df_new.drop_duplicates(subset=['k', 'Modalidad 2026']).drop(columns='Codigo Unidad Servicio UDS')
 
-    df_final['AUDITORIA_ESTADO_2026'] = df_final.apply(get_status, axis=1)
-    
-    # Guardar Excel
+    # Solo se cruzan las columnas que van a la salida. Las que trae el insumo
+    # reemplazan a las del histórico (también en las filas sin respaldo 2026).
+    cols_insumo = [c for c in df_new.columns if c in headers_orig]
+    df_old = df_old.drop(columns=cols_insumo)
+    df_new = df_new[['k'] + cols_insumo]
+
+    # Fusión Maestra (Outer Join sobre la clave int64)
+    df_final = pd.merge(df_old, df_new, on='k', how='outer', indicator='_origen')
+    # Código como texto canónico; las filas históricas sin código válido conservan el original
+    valid = df_final['k'].to_numpy() != SIN_CODIGO
+    df_final['Codigo Unidad Servicio UDS'] = df_final['Codigo Unidad Servicio UDS'].astype(object)
+    df_final.loc[valid, 'Codigo Unidad Servicio UDS'] = df_final.loc[valid, 'k'].astype(str)
+
+    # Lógica de Auditoría: el lado del cruce de cada fila define su estado
+    df_final['AUDITORIA_ESTADO_2026'] = df_final.pop('_origen').map(ESTADOS_AUDITORIA).astype(object)
+
+    # Guardar Excel, con el coloreado para decisores como formato condicional por fila
     final_cols = headers_orig + ['AUDITORIA_ESTADO_2026']
-    df_final[final_cols].to_excel(OUTPUT_PATH, index=False)
+    write_excel(OUTPUT_PATH, {'Sheet1': df_final[final_cols]},
+                row_highlights=('AUDITORIA_ESTADO_2026', COLORES_AUDITORIA))
     print(f"\n>>> Archivo Nacional generado: {OUTPUT_PATH}")
-    
-    # Aplicar Coloreado para Decisores
-    print(">>> Aplicando formato visual de auditoría...")
-    wb = load_workbook(OUTPUT_PATH)
-    ws = wb.active
-    fills = {
-        'ACTUALIZADO': PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid"),
-        'NUEVO': PatternFill(start_color="DDEBF7", end_color="DDEBF7", fill_type="solid"),
-        'HISTORICO': PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-    }
-    
-    col_idx = len(final_cols)
-    for r in range(2, ws.max_row + 1):
-        status = str(ws.cell(row=r, column=col_idx).value)
-        for key, fill in fills.items():
-            if key in status:
-                for c in range(1, col_idx + 1):
-                    ws.cell(row=r, column=c).fill = fill
-                break
-    wb.save(OUTPUT_PATH)
     print(">>> Proceso Nacional Finalizado.")
 
 if __name__ == "__main__":
-    main_fusion_nacional()
+    parser = argparse.ArgumentParser(description="Reconstrucción nacional del Metaverso 2026 (histórico + insumos).")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Procesos para leer los libros de insumos (1 = en serie).")
+    main_fusion_nacional(parser.parse_args().workers)
@@ -1,5 +1,9 @@
 import pandas as pd
 import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from pipeline_common.excel_writer import write_excel
 
 DIR_BASE = r"D:\ICBF\cost-tracking\data\insumos metaverso"
 ALIMENTOS_FILE = r"D:\ICBF\cost-tracking\data\insumos matriz 24 abril\CONTRATOS ALIMENTOS ORGANIZACIONES CAMPESINAS.xlsx"
@@ -48,9 +52,10 @@ KEY_COLS = [
     "Cupos", "CONCEPTO_DEFINITIVO", "CONTRATISTA", "NIT_CONTRATISTA",
 ]
 
-def main():
+def build_concat_alimentos(alimentos_file=ALIMENTOS_FILE):
+    """ZONIFICACION + ZONIFICACION LA GUAJIRA de Alimentos (lo que se guarda en CONCAT_ALIMENTOS)."""
     print(">>> Leyendo ALIMENTOS ZONIFICACION...")
-    df_zona = pd.read_excel(ALIMENTOS_FILE, sheet_name="ZONIFICACION", header=None, skiprows=4)
+    df_zona = pd.read_excel(alimentos_file, sheet_name="ZONIFICACION", header=None, skiprows=4)
     cols_zona = list(COLUMNS_ALIMENTOS_ZONA.keys())
     df_zona = df_zona.iloc[:, cols_zona].copy()
     df_zona.rename(columns=COLUMNS_ALIMENTOS_ZONA, inplace=True)
@@ -58,7 +63,7 @@ def main():
     print(f"  {len(df_zona)} filas de ZONIFICACION")
 
     print(">>> Leyendo ALIMENTOS ZONIFICACION LA GUAJIRA...")
-    df_guajira = pd.read_excel(ALIMENTOS_FILE, sheet_name="ZONIFICACION LA GUAJIRA", header=None, skiprows=2)
+    df_guajira = pd.read_excel(alimentos_file, sheet_name="ZONIFICACION LA GUAJIRA", header=None, skiprows=2)
     cols_guajira = list(COLUMNS_ALIMENTOS_GUAJIRA.keys())
     df_guajira = df_guajira.iloc[:, cols_guajira].copy()
     df_guajira.rename(columns=COLUMNS_ALIMENTOS_GUAJIRA, inplace=True)
@@ -77,8 +82,11 @@ def main():
 
     print(f">>> Filas totales: {len(df_concat)}")
     print(f">>> Columnas: {list(df_concat.columns)}")
+    return df_concat
 
-    df_concat.to_excel(OUTPUT_FILE, index=False)
+def main():
+    df_concat = build_concat_alimentos()
+    write_excel(OUTPUT_FILE, {'Sheet1': df_concat})
     print(f">>> Archivo guardado: {OUTPUT_FILE}")
 
 if __name__ == "__main__":
@@ -1,5 +1,9 @@
 ﻿import pandas as pd
 import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from pipeline_common.excel_writer import write_excel
 
 DIR_BASE = r"D:\ICBF\cost-tracking\data\insumos metaverso"
 INPUT_FILE = os.path.join(DIR_BASE, "zonificación_abastecimiento_servicios_primera_infancia25052026.xlsx")
@@ -36,15 +40,16 @@ COLUMNS_INTEGRALES = {
     12: "Cupos",
 }
 
-def main():
+def build_concat(input_file=INPUT_FILE):
+    """Comunitarios + Integrales-Convenios en una sola tabla (lo que se guarda en CONCAT_ZONIFICACION)."""
     print(">>> Leyendo hoja Comunitarios (columnas A–N)...")
-    df_com = pd.read_excel(INPUT_FILE, sheet_name="Comunitarios", header=None, skiprows=1)
+    df_com = pd.read_excel(input_file, sheet_name="Comunitarios", header=None, skiprows=1)
     df_com = df_com.iloc[:, 0:14].copy()
     df_com.rename(columns=COLUMNS_COMUNITARIOS, inplace=True)
     df_com["Tipo_Modalidad"] = "COMUNITARIO"
 
     print(">>> Leyendo hoja Integrales-Convenios (columnas A–J + M)...")
-    df_int = pd.read_excel(INPUT_FILE, sheet_name="Integrales-Convenios", header=None, skiprows=1)
+    df_int = pd.read_excel(input_file, sheet_name="Integrales-Convenios", header=None, skiprows=1)
     cols_int = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 12]
     df_int = df_int.iloc[:, cols_int].copy()
     df_int.rename(columns=COLUMNS_INTEGRALES, inplace=True)
@@ -67,8 +72,11 @@ def main():
 
     print(f">>> Filas totales: {len(df_concat)}")
     print(f">>> Columnas: {list(df_concat.columns)}")
+    return df_concat
 
-    df_concat.to_excel(OUTPUT_FILE, index=False)
+def main():
+    df_concat = build_concat()
+    write_excel(OUTPUT_FILE, {'Sheet1': df_concat})
     print(f">>> Archivo guardado: {OUTPUT_FILE}")
 
 if __name__ == "__main__":
@@ -0,0 +1,50 @@
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from pipeline_common.excel_writer import write_excel
+from pipeline_common.snapshot_diff import diff_snapshots, summarize_changes
+
+DIR_BASE = r"D:\ICBF\cost-tracking\data\insumos metaverso"
+OUTPUT   = os.path.join(DIR_BASE, "CAMBIOS_ZONIFICACIONPAIS_2026.xlsx")
+
+# Compara dos versiones guardadas de ZonificacionPais (p. ej. la salida de
+# ayer y la de hoy, o 'Metaverso 2026.xlsx' contra la actualizada) y deja
+# el delta campo a campo por código UDS. El runner hace lo mismo por etapa
+# con --cambios.
+
+def hoja(valor):
+    """Posición de la hoja si viene en dígitos ('1' -> 1), si no el nombre tal cual."""
+    return int(valor) if valor.isdigit() else valor
+
+def main():
+    parser = argparse.ArgumentParser(description="Cambios campo a campo entre dos snapshots de ZonificacionPais.")
+    parser.add_argument('antes', help="Libro de antes.")
+    parser.add_argument('despues', help="Libro de después.")
+    parser.add_argument('--hoja-antes', type=hoja, default=0, help="Hoja del libro de antes: nombre o posición desde 0 (por defecto la primera).")
+    parser.add_argument('--hoja-despues', type=hoja, default=0, help="Hoja del libro de después: nombre o posición desde 0 (por defecto la primera).")
+    parser.add_argument('--etapa', default='', help="Texto para la columna 'etapa' (por defecto el nombre del libro de después).")
+    parser.add_argument('--salida', default=OUTPUT)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    antes = pd.read_excel(args.antes, sheet_name=args.hoja_antes)
+    despues = pd.read_excel(args.despues, sheet_name=args.hoja_despues)
+    print(f">>> Antes: {len(antes)} filas x {len(antes.columns)} cols | Después: {len(despues)} filas x {len(despues.columns)} cols "
+          f"({time.perf_counter() - t0:.1f}s de lectura)")
+
+    t0 = time.perf_counter()
+    cambios = diff_snapshots(antes, despues, stage=args.etapa or os.path.basename(args.despues))
+    print(f">>> {len(cambios)} celdas cambiadas ({time.perf_counter() - t0:.2f}s)")
+    for r in summarize_changes(cambios).itertuples(index=False):
+        print(f"    {r.cambio}: {r.uds} UDS, {r.celdas} celdas")
+
+    write_excel(args.salida, {'Cambios': cambios})
+    print(f">>> Archivo guardado: {args.salida}")
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,14 @@ import os
 import re
 import unicodedata
 import warnings
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from pipeline_common.excel_writer import write_excel
+from pipeline_common.modality import ModalityClassifier
+from pipeline_common.reference_snapshots import read_references
+from pipeline_common.uds_codes import canonical_uds_codes
+
 warnings.filterwarnings('ignore')
 
 DIR_BASE = r"D:\ICBF\cost-tracking\data\insumos metaverso"
@@ -32,27 +40,29 @@ def col_letter(idx):
 print("="*50)
 print("PASO 1: CONCAT")
 df = pd.read_excel(CONCAT)
-df["k"] = df["Codigo_UDS"].astype(str).str.strip()
-print(f"  {len(df)} filas")
+codigos = canonical_uds_codes(df["Codigo_UDS"])
+df["k"] = codigos.codes
+print(f"  {len(df)} filas, codigos: {codigos.counts()}")
 
 print("PASO 2: UDS_15052026")
-uds = pd.read_excel(UDS, sheet_name="UDS_15052026")
-uds["k"] = uds["CodigoUnidadServicioUDS"].astype(str).str.strip()
-uds = uds.drop_duplicates(subset="k", keep="first")
+# Del snapshot de snapshot_uds_2026.py si está al día: clave k y un registro por código
+ref = read_references(UDS, {
+    "UDS_15052026": {'code_column': "CodigoUnidadServicioUDS", 'unique': True},
+    "TH_Transito_15052026": {'code_column': "codigounidadservicio", 'columns': ["total"], 'unique': True},
+    "UDS_31122025": {'code_column': "CodigoUnidadServicioUDS",
+                     'columns': ["CuposUDS_31122025", "CuposServicioUDS_31122025"], 'unique': True},
+})
+uds = ref["UDS_15052026"]
 df = df.merge(uds, on="k", how="left", suffixes=("_cat","_uds"))
 print(f"  {df['CodigoUnidadServicioUDS'].notna().sum()} enlazados")
 
 print("PASO 3: TH_Transito_15052026")
-th = pd.read_excel(UDS, sheet_name="TH_Transito_15052026")
-th["k"] = th["codigounidadservicio"].astype(str).str.strip()
-th = th.drop_duplicates(subset="k", keep="first")
+th = ref["TH_Transito_15052026"]
 df = df.merge(th[["k","total"]].rename(columns={"total":"TH_Transito_Cupos"}), on="k", how="left")
 print(f"  {df['TH_Transito_Cupos'].notna().sum()} enlazados")
 
 print("PASO 4: UDS_31122025 (CuposUDS_31122025, CuposServicioUDS_31122025)")
-uds25 = pd.read_excel(UDS, sheet_name="UDS_31122025")
-uds25["k"] = uds25["CodigoUnidadServicioUDS"].astype(str).str.strip()
-uds25 = uds25.drop_duplicates(subset="k", keep="first")
+uds25 = ref["UDS_31122025"]
 df = df.merge(uds25[["k","CuposUDS_31122025","CuposServicioUDS_31122025"]], on="k", how="left")
 print(f"  CuposUDS_31122025: {df['CuposUDS_31122025'].notna().sum()}")
 print(f"  CuposServicioUDS_31122025: {df['CuposServicioUDS_31122025'].notna().sum()}")
@@ -67,15 +77,13 @@ print("PASO 6: Campos derivados")
 df["NIT_EC"] = df["NumeroDocumentoEC"].apply(clean_nit)
 df["NumeroContrato_clean"] = df["NumeroContrato"].astype(str).str.strip()
 AM = {"HCB":"FAMILIAR Y COMUNITARIA","FAMI":"FAMILIAR Y COMUNITARIA","HCB_SA":"FAMILIAR Y COMUNITARIA","BV":"INSTITUCIONAL","JC":"INSTITUCIONAL"}
-def mod(row):
-    if pd.notna(row["Abrev"]) and row["Abrev"] in AM: return AM[row["Abrev"]]
-    s = str(row["Servicio"]).upper() if pd.notna(row["Servicio"]) else ""
-    if "PROPIA" in s or "INTERCULTURAL" in s: return "PROPIA E INTERCULTURAL"
-    if "INSTITUCIONAL" in s or "CDI" in s or "CENTRO DE DESARROLLO" in s: return "INSTITUCIONAL"
-    if "MODELO PROPIO" in s or "MAI" in s: return "MODELO PROPIO"
-    if "FAMILIAR" in s or "COMUNITARIA" in s or "HCB" in s: return "FAMILIAR Y COMUNITARIA"
-    return row["Abrev"] if pd.notna(row["Abrev"]) else None
-df["Modalidad_calc"] = df.apply(mod, axis=1).fillna(df["Tipo_Modalidad"])
+mod = ModalityClassifier(AM, [
+    ("PROPIA E INTERCULTURAL", ["PROPIA", "INTERCULTURAL"]),
+    ("INSTITUCIONAL", ["INSTITUCIONAL", "CDI", "CENTRO DE DESARROLLO"]),
+    ("MODELO PROPIO", ["MODELO PROPIO", "MAI"]),
+    ("FAMILIAR Y COMUNITARIA", ["FAMILIAR", "COMUNITARIA", "HCB"]),
+])
+df["Modalidad_calc"] = mod(df["Abrev"], df["Servicio"]).fillna(df["Tipo_Modalidad"])
 
 print("PASO 7: Mapear columnas base")
 M = {
@@ -138,7 +146,7 @@ print(f"  RIESGO TRANSPARENCIA index: {riesgo_idx} -> col {col_letter(riesgo_idx
 print(f"  Servicio ajustado + nuevas index: {servicio_aj_idx} -> col {col_letter(servicio_aj_idx)}")
 
 print("GUARDANDO...")
-out.to_excel(OUTPUT, index=False)
+write_excel(OUTPUT, {'Sheet1': out})
 print(f"  {OUTPUT}")
 print(f"  Filas: {len(out)}, Columnas: {len(out.columns)}")
 
@@ -0,0 +1,137 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from pipeline_common.excel_reader import excel_roundtrip
+from pipeline_common.excel_writer import riesgo_formulas, write_excel
+from pipeline_common.snapshot_diff import CHANGE_COLUMNS, diff_snapshots, summarize_changes
+from pipeline_common.stage_runner import StageRunner
+
+import concat_alimentos_2026 as concat_alim
+import concat_zonificacion_metaverso_2026 as concat_zonif
+import update_zonificacionpais_2026 as upd26
+import update_zonificacionpais_alimentos as upd_alim
+import update_zonificacionpais_integrales as upd_int
+
+DIR_BASE = upd26.DIR_BASE
+CHECKPOINT_DIR = os.path.join(DIR_BASE, "_etapas_metaverso_2026")
+OUTPUT_CAMBIOS = os.path.join(DIR_BASE, "CAMBIOS_ZONIFICACIONPAIS_2026.xlsx")
+
+# Cada etapa que modifica ZonificacionPais: (etapa, antes, después)
+ETAPAS_ZONIFICACION = [
+    ('update_2026', 'zonificacion_original', 'zonificacion_2026'),
+    ('update_integrales', 'zonificacion_2026', 'zonificacion_integrales'),
+    ('update_alimentos', 'zonificacion_integrales', 'zonificacion_final'),
+]
+
+# Las etapas se pasan los DataFrames en memoria. Cada salida que antes se
+# guardaba en Excel y la etapa siguiente volvía a leer pasa por
+# `excel_roundtrip`, así los tipos son los mismos que con los scripts sueltos.
+# ZonificacionPais se guardaba con la fórmula de riesgo en la columna Unnamed,
+# que al releerla queda vacía: `_guardada` hace lo mismo.
+
+def _guardada(zonificacion):
+    return excel_roundtrip(zonificacion, formulas=riesgo_formulas(zonificacion.columns))
+
+def _concat_zonificacion():
+    return excel_roundtrip(concat_zonif.build_concat())
+
+def _concat_alimentos():
+    return excel_roundtrip(concat_alim.build_concat_alimentos())
+
+def _update_2026(zonificacion_original, concat_zonificacion, uds, th, uds25):
+    return _guardada(upd26.actualizar_2026(zonificacion_original, concat_zonificacion, uds, th, uds25))
+
+def _update_integrales(zonificacion_2026, integrales):
+    return _guardada(upd_int.actualizar_integrales(zonificacion_2026, integrales))
+
+def _update_alimentos(zonificacion_integrales, concat_alimentos):
+    salidas = upd_alim.actualizar_alimentos(zonificacion_integrales, concat_alimentos)
+    return {
+        'zonificacion_final': salidas['zonificacion'],
+        'reporte_no_actualizables': salidas['reporte'],
+        'no_actualizables_persistentes': salidas['persistentes'],
+    }
+
+def armar_pipeline(checkpoint_dir=None):
+    runner = StageRunner(checkpoint_dir)
+    # Fuentes
+    runner.add('concat_zonificacion', _concat_zonificacion, outputs=['concat_zonificacion'])
+    runner.add('concat_alimentos', _concat_alimentos, outputs=['concat_alimentos'])
+    runner.add('zonificacion_original', upd26.cargar_original, outputs=['zonificacion_original'])
+    runner.add('uds', upd26.cargar_uds, outputs=['uds', 'th', 'uds25'])
+    runner.add('integrales', upd_int.cargar_integrales, outputs=['integrales'])
+    # Actualizaciones de ZonificacionPais, en cadena
+    runner.add('update_2026', _update_2026,
+               inputs=['zonificacion_original', 'concat_zonificacion', 'uds', 'th', 'uds25'],
+               outputs=['zonificacion_2026'])
+    runner.add('update_integrales', _update_integrales,
+               inputs=['zonificacion_2026', 'integrales'], outputs=['zonificacion_integrales'])
+    runner.add('update_alimentos', _update_alimentos,
+               inputs=['zonificacion_integrales', 'concat_alimentos'],
+               outputs=['zonificacion_final', 'reporte_no_actualizables', 'no_actualizables_persistentes'])
+    return runner
+
+def guardar_entregables(frames, intermedios=False):
+    """Los Excel finales, una sola vez al terminar (y los CONCAT si se piden)."""
+    final = frames['zonificacion_final']
+    write_excel(upd_alim.OUTPUT_ZONIF, {'Sheet1': final}, formulas=riesgo_formulas(final.columns))
+    print(f"    {upd_alim.OUTPUT_ZONIF} ({len(final)} filas x {len(final.columns)} cols)")
+    for path, name in [(upd_alim.OUTPUT_REPORTE, 'reporte_no_actualizables'),
+                       (upd_alim.OUTPUT_PERSISTENTES, 'no_actualizables_persistentes')]:
+        write_excel(path, {'Sheet1': frames[name]})
+        print(f"    {path} ({len(frames[name])} filas)")
+    if intermedios:
+        # Los usan rebuild_zonificacionpais_2026 y enrich_zonificacion_con_uds
+        for path, name in [(concat_zonif.OUTPUT_FILE, 'concat_zonificacion'),
+                           (concat_alim.OUTPUT_FILE, 'concat_alimentos')]:
+            if name in frames:
+                write_excel(path, {'Sheet1': frames[name]})
+                print(f"    {path} ({len(frames[name])} filas)")
+
+def cambios_por_etapa(frames):
+    """Delta campo a campo de ZonificacionPais en cada etapa (las que tienen antes y después en memoria)."""
+    cambios = [diff_snapshots(frames[antes], frames[despues], stage=etapa)
+               for etapa, antes, despues in ETAPAS_ZONIFICACION
+               if antes in frames and despues in frames]
+    cambios = [c for c in cambios if len(c)]
+    return pd.concat(cambios, ignore_index=True) if cambios else pd.DataFrame(columns=CHANGE_COLUMNS)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Pipeline metaverso 2026 en memoria: CONCAT -> update 2026 -> integrales -> alimentos.")
+    parser.add_argument('--checkpoints', action='store_true',
+                        help=f"Guarda la salida de cada etapa en formato columnar en {CHECKPOINT_DIR}.")
+    parser.add_argument('--desde', metavar='ETAPA',
+                        help="Reejecuta desde esta etapa (y las que dependen de ella); el resto sale de los checkpoints.")
+    parser.add_argument('--intermedios', action='store_true',
+                        help="Escribe también CONCAT_ZONIFICACION y CONCAT_ALIMENTOS en Excel.")
+    parser.add_argument('--cambios', action='store_true',
+                        help=f"Escribe en {os.path.basename(OUTPUT_CAMBIOS)} el delta de ZonificacionPais de cada etapa.")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    runner = armar_pipeline(CHECKPOINT_DIR if args.checkpoints or args.desde else None)
+    print(f"[{datetime.now():%H:%M:%S}] Etapas: {' -> '.join(s.name for s in runner.order())}")
+    frames = runner.run(desde=args.desde)
+    runner.print_report()
+
+    t_write = time.perf_counter()
+    print("\n  ARCHIVOS GENERADOS:")
+    guardar_entregables(frames, args.intermedios)
+    if args.cambios:
+        t_diff = time.perf_counter()
+        cambios = cambios_por_etapa(frames)
+        write_excel(OUTPUT_CAMBIOS, {'Cambios': cambios})
+        print(f"    {OUTPUT_CAMBIOS} ({len(cambios)} celdas, {time.perf_counter() - t_diff:.2f}s)")
+        for r in summarize_changes(cambios).itertuples(index=False):
+            print(f"      {r.etapa} / {r.cambio}: {r.uds} UDS, {r.celdas} celdas")
+    print(f"\n  Escritura de Excel: {time.perf_counter() - t_write:.2f}s | Total: {time.perf_counter() - t0:.2f}s")
+
+if __name__ == "__main__":
+    main()
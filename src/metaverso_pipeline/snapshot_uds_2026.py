@@ -0,0 +1,66 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from pipeline_common.reference_snapshots import ingest_snapshot, snapshot_root
+
+DIR_BASE = r"D:\ICBF\cost-tracking\data\insumos metaverso"
+UDS      = os.path.join(DIR_BASE, "UDS_15052026_3112025.xlsx")
+UDS_2025 = os.path.join(DIR_BASE, "UDS_31122025.xlsx")
+
+# Extractos de referencia: {libro: {hoja: columna con el código UDS}}
+LIBROS = {
+    UDS: {
+        "UDS_15052026": "CodigoUnidadServicioUDS",
+        "TH_Transito_15052026": "codigounidadservicio",
+        "UDS_31122025": "CodigoUnidadServicioUDS",
+    },
+    UDS_2025: {
+        "UDS_31122026": "CodigoUnidadServicioUDS",
+    },
+}
+
+# update_zonificacionpais_2026, rebuild_zonificacionpais_2026 y
+# enrich_zonificacion_con_uds leen estos libros con `read_references`: si
+# hay un snapshot al día con el Excel cargan solo las columnas que usan, ya
+# con la clave `k` y sin códigos repetidos; si no, leen el Excel como antes.
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convierte los extractos UDS en snapshots columnares versionados con índice por código UDS.")
+    parser.add_argument('--libro', help="Solo este libro (por defecto todos los de LIBROS).")
+    parser.add_argument('--hoja', action='append', metavar='HOJA:COLUMNA',
+                        help="Hoja y columna de código de --libro (se puede repetir).")
+    parser.add_argument('--forzar', action='store_true',
+                        help="Crea una versión nueva aunque el libro no haya cambiado.")
+    args = parser.parse_args()
+
+    if args.libro:
+        if args.hoja:
+            hojas = dict(h.rsplit(':', 1) for h in args.hoja)
+        elif args.libro in LIBROS:
+            hojas = LIBROS[args.libro]
+        else:
+            parser.error("Para un libro que no está en LIBROS hay que indicar --hoja HOJA:COLUMNA")
+        libros = {args.libro: hojas}
+    else:
+        libros = LIBROS
+
+    for libro, hojas in libros.items():
+        if not os.path.exists(libro):
+            print(f">>> No existe {libro}, se omite")
+            continue
+        t0 = time.perf_counter()
+        print(f">>> {os.path.basename(libro)}: {list(hojas)}")
+        snapshot, creada = ingest_snapshot(libro, hojas, force=args.forzar)
+        estado = "creada" if creada else "sin cambios en el libro, se mantiene"
+        print(f"    Versión {snapshot.version} ({estado}) en {snapshot_root(libro)} [{time.perf_counter() - t0:.1f}s]")
+        for hoja in hojas:
+            meta = snapshot.sheet(hoja).meta
+            print(f"    {hoja}: {meta['filas']} filas, {len(meta['columnas'])} columnas, "
+                  f"{meta['codigos_unicos']} códigos únicos {meta['estados']}")
+
+if __name__ == "__main__":
+    main()
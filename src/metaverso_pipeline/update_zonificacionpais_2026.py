@@ -3,6 +3,14 @@ import os
 import unicodedata
 import warnings
 from datetime import datetime
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from pipeline_common.excel_writer import riesgo_formulas, write_excel
+from pipeline_common.modality import ModalityClassifier
+from pipeline_common.reference_snapshots import read_references
+from pipeline_common.uds_codes import canonical_uds_codes, unique_by_code
+
 warnings.filterwarnings('ignore')
 
 DIR_BASE = r"D:\ICBF\cost-tracking\data\insumos metaverso"
@@ -31,57 +39,15 @@ MONETARY = {
     "Costo total hasta Julio ajuste operador alimentos",
 }
 
-# ============================================================
-log("PASO 1: Cargar ZonificacionPais original")
-orig = pd.read_excel(ORIG, sheet_name="ZonificacionPais")
-ORIG_COLS = list(orig.columns)
-log(f"  {len(ORIG_COLS)} cols, {len(orig)} filas")
-
-orig_norm = {normalize(c): c for c in ORIG_COLS if c not in MONETARY}
-
-orig["k"] = orig["Codigo Unidad Servicio UDS"].astype(str).str.strip()
-orig["k"] = orig["k"].replace(["nan", "None", ""], None)
-orig_codes = set(orig.loc[orig["k"].notna(), "k"].unique())
-
-# ============================================================
-log("PASO 2: Construir datos nuevos")
-df = pd.read_excel(CONCAT)
-df["k"] = df["Codigo_UDS"].astype(str).str.strip()
-log(f"  CONCAT: {len(df)} filas")
-
-uds = pd.read_excel(UDS, sheet_name="UDS_15052026")
-uds["k"] = uds["CodigoUnidadServicioUDS"].astype(str).str.strip()
-uds = uds.drop_duplicates(subset="k", keep="first")
-df = df.merge(uds, on="k", how="left", suffixes=("_cat", "_uds"))
-
-th = pd.read_excel(UDS, sheet_name="TH_Transito_15052026")
-th["k"] = th["codigounidadservicio"].astype(str).str.strip()
-th = th.drop_duplicates(subset="k", keep="first")
-df = df.merge(th[["k", "total"]].rename(columns={"total": "TH_Transito_Cupos"}), on="k", how="left")
-
-uds25 = pd.read_excel(UDS, sheet_name="UDS_31122025")
-uds25["k"] = uds25["CodigoUnidadServicioUDS"].astype(str).str.strip()
-uds25 = uds25.drop_duplicates(subset="k", keep="first")
-df = df.merge(uds25[["k", "CuposUDS_31122025", "CuposServicioUDS_31122025"]], on="k", how="left")
-
-df["NIT_EC"] = df["NumeroDocumentoEC"].apply(clean_nit)
-df["NumeroContrato_clean"] = df["NumeroContrato"].astype(str).str.strip()
-
 AM = {"HCB":"FAMILIAR Y COMUNITARIA","FAMI":"FAMILIAR Y COMUNITARIA","HCB_SA":"FAMILIAR Y COMUNITARIA","BV":"INSTITUCIONAL","JC":"INSTITUCIONAL"}
-def mod(row):
-    if pd.notna(row["Abrev"]) and row["Abrev"] in AM: return AM[row["Abrev"]]
-    s = str(row["Servicio"]).upper() if pd.notna(row["Servicio"]) else ""
-    if "PROPIA" in s or "INTERCULTURAL" in s: return "PROPIA E INTERCULTURAL"
-    if "INSTITUCIONAL" in s or "CDI" in s: return "INSTITUCIONAL"
-    if "MODELO PROPIO" in s or "MAI" in s: return "MODELO PROPIO"
-    if "FAMILIAR" in s or "COMUNITARIA" in s or "HCB" in s: return "FAMILIAR Y COMUNITARIA"
-    return row["Abrev"] if pd.notna(row["Abrev"]) else None
-df["Modalidad_calc"] = df.apply(mod, axis=1).fillna(df["Tipo_Modalidad"])
-new_keys = set(df["k"].unique())
-log(f"  {len(df)} filas, {len(new_keys)} codigos")
-
-# ============================================================
-log("PASO 3: Mapeo de columnas")
+# Abrev (AM) y luego el texto del servicio, en este orden
+mod = ModalityClassifier(AM, [
+    ("PROPIA E INTERCULTURAL", ["PROPIA", "INTERCULTURAL"]),
+    ("INSTITUCIONAL", ["INSTITUCIONAL", "CDI"]),
+    ("MODELO PROPIO", ["MODELO PROPIO", "MAI"]),
+    ("FAMILIAR Y COMUNITARIA", ["FAMILIAR", "COMUNITARIA", "HCB"]),
+])
+
 MAPPINGS = [
     ("Regional_UDS","Regional UDS"),("Centro_Zonal_UDS","Centro Zonal UDS"),
     ("Municipio_UDS","Municipio UDS"),("ZONA","ZONA 2026"),
@@ -106,128 +72,164 @@ MAPPINGS = [
     ("EntidadContratista","NIT_EntidadContratista"),
     ("Servicio","Servicio 2025"),("Modalidad_calc","Modalidad 2025"),
 ]
-resolved = []
-for src, dst in MAPPINGS:
-    n = normalize(dst)
-    if n in orig_norm:
-        resolved.append((src, orig_norm[n]))
-
-# ============================================================
-log("PASO 4: Merge vectorizado")
-df_dedup = df.drop_duplicates(subset="k", keep="first").set_index("k")
-up_cols = list({src for src,_ in resolved}) + ["CuposUDS_31122025","CuposServicioUDS_31122025","TH_Transito_Cupos"]
-up_cols = [c for c in up_cols if c in df_dedup.columns]
-dup = df_dedup[up_cols].rename(columns={c:f"_n_{c}" for c in up_cols})
-
-merged = orig[["k"]].merge(dup, left_on="k", right_index=True, how="left")
-
-audit = pd.Series("No actualizable", index=orig.index, dtype="string")
-audit[merged["k"].isin(new_keys)] = "Actualizado"
-audit[orig["k"].isna()] = "Sin codigo"
-orig["Estado_Actualizacion"] = audit
-
-for src, dst in resolved:
-    nc = f"_n_{src}"
-    if nc in merged.columns:
-        m = merged[nc].notna()
-        orig.loc[m.values, dst] = merged.loc[m.values, nc].values
 
 NEW_COLS = ["CuposUDS_31122025","CuposServicioUDS_31122025","TH_Transito_Cupos"]
-for c in NEW_COLS:
-    nc = f"_n_{c}"
-    orig[c] = orig.get(c) if nc not in merged.columns else merged[nc]
-
-log(f"  Actualizados: {(audit=='Actualizado').sum()} | No act: {(audit=='No actualizable').sum()}")
 
-# ============================================================
-log("PASO 5: Nuevos UDS")
-exist = set(orig.loc[orig["k"].notna(), "k"].unique())
-nuevos = new_keys - exist
-log(f"  {len(nuevos)} nuevos")
+def cargar_original(path=ORIG):
+    return pd.read_excel(path, sheet_name="ZonificacionPais")
+
+def cargar_concat(path=CONCAT):
+    return pd.read_excel(path)
+
+def cargar_uds(path=UDS):
+    """
+    Las tres hojas del libro UDS (UDS vigentes, TH en tránsito y UDS a
+    31/12/2025) como tablas de búsqueda: clave `k`, un registro por código.
+    Salen del snapshot de snapshot_uds_2026.py si está al día con el libro.
+    """
+    return dict(zip(['uds', 'th', 'uds25'], read_references(path, {
+        "UDS_15052026": {'code_column': "CodigoUnidadServicioUDS", 'unique': True},
+        "TH_Transito_15052026": {'code_column': "codigounidadservicio", 'columns': ["total"], 'unique': True},
+        "UDS_31122025": {'code_column': "CodigoUnidadServicioUDS",
+                         'columns': ["CuposUDS_31122025", "CuposServicioUDS_31122025"], 'unique': True},
+    }).values()))
+
+def actualizar_2026(orig, concat, uds, th, uds25):
+    """
+    Actualiza la ZonificacionPais original con CONCAT y el libro UDS (pasos
+    1 a 7, en memoria). `uds`, `th` y `uds25` son las tablas de `cargar_uds`.
+    Devuelve la hoja final con las columnas en el orden en que se guarda.
+    """
+    # ============================================================
+    log("PASO 1: ZonificacionPais original")
+    orig = orig.copy()
+    ORIG_COLS = list(orig.columns)
+    log(f"  {len(ORIG_COLS)} cols, {len(orig)} filas")
+
+    orig_norm = {normalize(c): c for c in ORIG_COLS if c not in MONETARY}
+
+    codigos_orig = canonical_uds_codes(orig["Codigo Unidad Servicio UDS"])
+    orig["k"] = codigos_orig.codes
+    log(f"  Codigos: {codigos_orig.counts()}")
+
+    # ============================================================
+    log("PASO 2: Construir datos nuevos")
+    df = concat.copy()
+    df["k"] = canonical_uds_codes(df["Codigo_UDS"]).codes
+    log(f"  CONCAT: {len(df)} filas")
+
+    df = df.merge(uds, on="k", how="left", suffixes=("_cat", "_uds"))
+    df = df.merge(th[["k", "total"]].rename(columns={"total": "TH_Transito_Cupos"}), on="k", how="left")
+    df = df.merge(uds25[["k", "CuposUDS_31122025", "CuposServicioUDS_31122025"]], on="k", how="left")
+
+    df["NIT_EC"] = df["NumeroDocumentoEC"].apply(clean_nit)
+    df["NumeroContrato_clean"] = df["NumeroContrato"].astype(str).str.strip()
+
+    df["Modalidad_calc"] = mod(df["Abrev"], df["Servicio"]).fillna(df["Tipo_Modalidad"])
+    df_dedup = unique_by_code(df).set_index("k")
+    new_keys = set(df_dedup.index)
+    log(f"  {len(df)} filas, {len(new_keys)} codigos")
+
+    # ============================================================
+    log("PASO 3: Mapeo de columnas")
+    resolved = []
+    for src, dst in MAPPINGS:
+        n = normalize(dst)
+        if n in orig_norm:
+            resolved.append((src, orig_norm[n]))
+
+    # ============================================================
+    log("PASO 4: Merge vectorizado")
+    up_cols = list({src for src,_ in resolved}) + ["CuposUDS_31122025","CuposServicioUDS_31122025","TH_Transito_Cupos"]
+    up_cols = [c for c in up_cols if c in df_dedup.columns]
+    dup = df_dedup[up_cols].rename(columns={c:f"_n_{c}" for c in up_cols})
+
+    merged = orig[["k"]].merge(dup, left_on="k", right_index=True, how="left")
+
+    audit = pd.Series("No actualizable", index=orig.index, dtype="string")
+    audit[merged["k"].isin(new_keys)] = "Actualizado"
+    audit[~codigos_orig.valid] = "Sin codigo"
+    orig["Estado_Actualizacion"] = audit
 
-if nuevos:
-    nr = df_dedup.loc[df_dedup.index.isin(nuevos)].copy()
-    ndf = pd.DataFrame(index=range(len(nr)), columns=ORIG_COLS, dtype=object)
     for src, dst in resolved:
-        if src in nr.columns:
-            ndf[dst] = nr[src].values
+        nc = f"_n_{src}"
+        if nc in merged.columns:
+            m = merged[nc].notna()
+            orig.loc[m.values, dst] = merged.loc[m.values, nc].values
+
+    for c in NEW_COLS:
+        nc = f"_n_{c}"
+        orig[c] = orig.get(c) if nc not in merged.columns else merged[nc]
+
+    log(f"  Actualizados: {(audit=='Actualizado').sum()} | No act: {(audit=='No actualizable').sum()}")
+
+    # ============================================================
+    log("PASO 5: Nuevos UDS")
+    exist = set(orig.loc[codigos_orig.valid, "k"].unique())
+    nuevos = new_keys - exist
+    log(f"  {len(nuevos)} nuevos")
+
+    if nuevos:
+        nr = df_dedup.loc[df_dedup.index.isin(nuevos)].copy()
+        ndf = pd.DataFrame(index=range(len(nr)), columns=ORIG_COLS, dtype=object)
+        for src, dst in resolved:
+            if src in nr.columns:
+                ndf[dst] = nr[src].values
+        for c in NEW_COLS:
+            if c in nr.columns:
+                ndf[c] = nr[c].values
+        ndf["Estado_Actualizacion"] = "Nuevo"
+        orig = pd.concat([orig, ndf], ignore_index=True)
+
+    # ============================================================
+    log("PASO 6: Limpiar NITs")
+    for c in orig.columns:
+        if "NIT_EntidadContratista" in str(c): continue
+        ca = "".join(ch for ch in c if ch.isascii()).lower().strip()
+        if "nit" in ca and "contratista" in ca:
+            orig[c] = orig[c].apply(lambda x: str(int(x)) if pd.notna(x) and str(x).replace(".0","").isdigit() else (str(x) if pd.notna(x) else None))
+
+    # ============================================================
+    log("PASO 7: Columnas finales")
+    final_cols = [c for c in ORIG_COLS if c not in MONETARY and c != "k"]
     for c in NEW_COLS:
-        if c in nr.columns:
-            ndf[c] = nr[c].values
-    ndf["Estado_Actualizacion"] = "Nuevo"
-    orig = pd.concat([orig, ndf], ignore_index=True)
-
-# ============================================================
-log("PASO 6: Limpiar NITs")
-for c in orig.columns:
-    if "NIT_EntidadContratista" in str(c): continue
-    ca = "".join(ch for ch in c if ch.isascii()).lower().strip()
-    if "nit" in ca and "contratista" in ca:
-        orig[c] = orig[c].apply(lambda x: str(int(x)) if pd.notna(x) and str(x).replace(".0","").isdigit() else (str(x) if pd.notna(x) else None))
-
-# ============================================================
-log("PASO 7: Guardar")
-final_cols = [c for c in ORIG_COLS if c not in MONETARY and c != "k"]
-for c in NEW_COLS:
-    if c not in orig.columns: orig[c] = None
-
-unnamed = None
-for c in final_cols:
-    if str(c).startswith("Unnamed"):
-        unnamed = c; final_cols.remove(c); break
-
-final_cols += [c for c in NEW_COLS if c not in final_cols] + ["Estado_Actualizacion"]
-if unnamed: final_cols.append(unnamed)
-final_cols = [c for c in final_cols if c in orig.columns]
-out = orig[final_cols]
-
-log(f"  Guardando con openpyxl...")
-out.to_excel(OUTPUT, index=False, engine='openpyxl')
-log(f"  OK: {OUTPUT} ({len(out)} filas x {len(final_cols)} cols)")
-
-# ============================================================
-log("PASO 8: Inyectar formulas en Unnamed: 101")
-if unnamed:
-    import openpyxl
-    from openpyxl.utils import get_column_letter
-
-    riesgo_col_name = None
+        if c not in orig.columns: orig[c] = None
+
+    unnamed = None
     for c in final_cols:
-        if normalize(c) == normalize("RIESGO TRANSPARENCIA"):
-            riesgo_col_name = c
-            break
-
-    if riesgo_col_name:
-        riesgo_idx = final_cols.index(riesgo_col_name)
-        unnamed_idx = final_cols.index(unnamed)
-        ref_letter = get_column_letter(riesgo_idx + 1)  # 1-indexed
-        target_letter = get_column_letter(unnamed_idx + 1)
-
-        log(f"  Riesgo: {riesgo_col_name} ({ref_letter}), Unnamed ({target_letter})")
-
-        wb = openpyxl.load_workbook(OUTPUT)
-        ws = wb.active
-        nrows = len(out)
-        batch = 5000
-        for start in range(2, nrows + 2, batch):
-            end = min(start + batch - 1, nrows + 1)
-            for r in range(start, end + 1):
-                ws[f"{target_letter}{r}"] = f"=+EXACT({ref_letter}{r},CF{r})"
-        wb.save(OUTPUT)
-        log(f"  {nrows} formulas inyectadas en {target_letter}2:{target_letter}{nrows+1}")
-    else:
-        log("  AVISO: No se encontro columna RIESGO TRANSPARENCIA")
-elif any(str(c).startswith("Unnamed") for c in final_cols):
-    log("  AVISO: Unnamed column exists but wasn't tracked")
-
-# ============================================================
-print("="*50)
-print("RESUMEN:")
-for s, n in orig["Estado_Actualizacion"].value_counts().items():
-    print(f"  {s}: {n}")
-print(f"  Filas: {len(out)}, Columnas: {len(final_cols)}")
-th_codes = set(th["k"].unique())
-print(f"  TH_Transito sin match: {len(th_codes-new_keys)}/{len(th_codes)}")
-for c in NEW_COLS:
-    if c in out.columns: print(f"  {c} vacios: {out[c].isna().sum()}/{len(out)}")
-print()
+        if str(c).startswith("Unnamed"):
+            unnamed = c; final_cols.remove(c); break
+
+    final_cols += [c for c in NEW_COLS if c not in final_cols] + ["Estado_Actualizacion"]
+    if unnamed: final_cols.append(unnamed)
+    final_cols = [c for c in final_cols if c in orig.columns]
+    out = orig[final_cols]
+
+    # ============================================================
+    print("="*50)
+    print("RESUMEN:")
+    for s, n in orig["Estado_Actualizacion"].value_counts().items():
+        print(f"  {s}: {n}")
+    print(f"  Filas: {len(out)}, Columnas: {len(final_cols)}")
+    th_codes = set(th["k"].unique())
+    print(f"  TH_Transito sin match: {len(th_codes-new_keys)}/{len(th_codes)}")
+    for c in NEW_COLS:
+        if c in out.columns: print(f"  {c} vacios: {out[c].isna().sum()}/{len(out)}")
+    print()
+    return out
+
+def main():
+    log("Cargar ZonificacionPais original, CONCAT y libro UDS")
+    fuentes = cargar_uds()
+    out = actualizar_2026(cargar_original(), cargar_concat(), fuentes['uds'], fuentes['th'], fuentes['uds25'])
+
+    # ============================================================
+    log("PASO 8: Guardar con formulas en Unnamed: 101 (escritura en streaming)")
+    formulas = riesgo_formulas(out.columns)
+    write_excel(OUTPUT, {'Sheet1': out}, formulas=formulas)
+    log(f"  OK: {OUTPUT} ({len(out)} filas x {len(out.columns)} cols)")
+    for col, template in formulas.items():
+        log(f"  {len(out)} formulas en {col}: {template.format(row='<fila>')}")
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
-import os, re, time, unicodedata
+import os, re, sys, time, unicodedata
 from datetime import datetime
 from pathlib import Path
 
 import pandas as pd
 from openpyxl import load_workbook
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from pipeline_common.column_mapping import ColumnMapper
+
 REGIONALES_DIR = Path(r"d:\ICBF\cost-tracking\data\replicacion hcb 5 junio\REGIONALES")
 OUTPUT_DIR = Path(r"d:\ICBF\cost-tracking\data\monitoring")
 OUTPUT_FILE = OUTPUT_DIR / "monitor_hcb.xlsx"
@@ -63,13 +66,15 @@ def _strip_accents(text):
     return "".join(c for c in nfkd if not unicodedata.combining(c))
 
 
-def _match_col(headers, keywords):
-    for col_idx, hdr in sorted(headers.items()):
-        hdr_clean = _strip_accents(hdr.split("\n")[0]).strip().upper()
-        for kw in keywords:
-            if _strip_accents(kw).upper() in hdr_clean:
-                return col_idx
-    return None
+def _normalize_header(text):
+    return _strip_accents(text.split("\n")[0]).strip().upper()
+
+
+# Cada clave toma la primera columna cuyo encabezado contenga alguna de sus palabras
+COLUMN_MAPPER = ColumnMapper(
+    [(k, {"alguno": kw}) for k, kw in KEYWORDS.items()],
+    normalizer=_normalize_header,
+)
 
 
 def scan_file(filepath, folder_name):
@@ -93,7 +98,7 @@ def scan_file(filepath, folder_name):
             if val:
                 headers[ci] = str(val).strip()
 
-    col_map = {k: _match_col(headers, kw) for k, kw in KEYWORDS.items()}
+    col_map = COLUMN_MAPPER.locate(headers)
 
     data_rows = errors_ref = empty_critical = 0
     total_cupos = total_valor_ini = total_valor_adc = 0.0
@@ -0,0 +1,269 @@
+import time
+from abc import ABC, abstractmethod
+
+import numpy as np
+import pandas as pd
+
+from pipeline_common.cleaning import detect_total_rows
+
+# Severidades, de mayor a menor
+SEVERIDADES = ['error', 'alerta', 'info']
+FINDING_COLUMNS = ['regla', 'severidad', 'hoja', 'regional', 'contrato', 'fila', 'detalle']
+
+
+class AuditContext:
+    """
+    Hoja que se audita más los cálculos que comparten las reglas (columnas
+    convertidas a número, máscaras de vacíos), para hacerlos una sola vez.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._numeric = {}
+        self._empty = {}
+        self._total_rows = None
+
+    def has(self, *columns):
+        return all(c in self.df.columns for c in columns)
+
+    def numeric(self, column):
+        if column not in self._numeric:
+            numeric = pd.to_numeric(self.df[column], errors='coerce')
+            self._numeric[column] = numeric.to_numpy(dtype='float64', na_value=np.nan)
+        return self._numeric[column]
+
+    def empty(self, column):
+        """Nulo o texto en blanco."""
+        if column not in self._empty:
+            values = self.df[column]
+            mask = values.isna().to_numpy()
+            if (pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values)
+                    or isinstance(values.dtype, pd.CategoricalDtype)):
+                codes, uniques = pd.factorize(values)
+                blank = pd.Series(uniques, dtype=object).astype(str).str.strip().eq('').to_numpy(dtype=bool)
+                mask |= np.append(blank, False)[codes]
+            self._empty[column] = mask
+        return self._empty[column]
+
+    def total_rows(self):
+        """(máscara, columna que disparó la marca) de `detect_total_rows`."""
+        if self._total_rows is None:
+            self._total_rows = detect_total_rows(self.df)
+        return self._total_rows
+
+
+class Rule(ABC):
+    """
+    Regla de auditoría. `evaluate` devuelve la máscara de filas con hallazgo
+    sobre toda la hoja y `describe` el detalle solo de esas filas. Si a la hoja
+    le faltan las columnas de `columns`, la regla se omite.
+    """
+
+    columns = ()
+
+    def __init__(self, name, severity='alerta', description=''):
+        if severity not in SEVERIDADES:
+            raise ValueError(f"Severidad desconocida: {severity}")
+        self.name = name
+        self.severity = severity
+        self.description = description
+
+    def applies(self, ctx):
+        return ctx.has(*self.columns)
+
+    @abstractmethod
+    def evaluate(self, ctx):
+        """Máscara booleana (numpy) de las filas con hallazgo."""
+
+    def describe(self, ctx, pos):
+        return ''
+
+
+class TotalRowsRule(Rule):
+    """Filas de TOTAL / SUBTOTAL que se colaron al consolidado (doble conteo)."""
+
+    def evaluate(self, ctx):
+        mask, _ = ctx.total_rows()
+        return mask.to_numpy()
+
+    def describe(self, ctx, pos):
+        _, matched = ctx.total_rows()
+        return 'TOTAL en ' + matched.iloc[pos].astype(str).to_numpy(dtype=object)
+
+
+class DuplicateKeyRule(Rule):
+    """Filas que repiten la clave `columns` (todas las ocurrencias; None = la fila completa)."""
+
+    def __init__(self, name, columns=None, **kwargs):
+        super().__init__(name, **kwargs)
+        self.key = list(columns) if columns else None
+        self.columns = tuple(self.key or ())
+
+    def evaluate(self, ctx):
+        df = ctx.df if self.key is None else ctx.df[self.key]
+        mask = df.duplicated(keep=False).to_numpy()
+        if self.key is not None:
+            # Las claves vacías no cuentan como repetidas
+            for c in self.key:
+                mask &= ~ctx.empty(c)
+        return mask
+
+    def describe(self, ctx, pos):
+        return 'clave repetida' if self.key is None else 'repite ' + ' + '.join(self.key)
+
+
+class ConflictingKeyRule(Rule):
+    """Una misma clave (p. ej. contrato) asociada a más de un valor de `column` (p. ej. regional)."""
+
+    def __init__(self, name, key, column, **kwargs):
+        super().__init__(name, **kwargs)
+        self.key = key
+        self.column = column
+        self.columns = (key, column)
+
+    def evaluate(self, ctx):
+        key_codes, _ = pd.factorize(ctx.df[self.key])
+        val_codes, vals = pd.factorize(ctx.df[self.column])
+        valid = (key_codes >= 0) & (val_codes >= 0)
+        pares = pd.DataFrame({'k': key_codes[valid], 'v': val_codes[valid]}).drop_duplicates()
+        n_vals = pares.groupby('k')['v'].size()
+        conflictivas = n_vals.index[n_vals.to_numpy() > 1].to_numpy()
+        return valid & np.isin(key_codes, conflictivas)
+
+    def describe(self, ctx, pos):
+        return f"{self.key} con varios valores de {self.column}; aquí: " + \
+            ctx.df[self.column].iloc[pos].astype(str).to_numpy(dtype=object)
+
+
+class RangeRule(Rule):
+    """Valores numéricos fuera de [min_value, max_value] (los vacíos no se evalúan)."""
+
+    def __init__(self, name, column, min_value=None, max_value=None, **kwargs):
+        super().__init__(name, **kwargs)
+        self.column = column
+        self.min_value = min_value
+        self.max_value = max_value
+        self.columns = (column,)
+
+    def evaluate(self, ctx):
+        values = ctx.numeric(self.column)
+        mask = np.zeros(len(values), dtype=bool)
+        if self.min_value is not None:
+            mask |= values < self.min_value
+        if self.max_value is not None:
+            mask |= values > self.max_value
+        return mask
+
+    def describe(self, ctx, pos):
+        return f"{self.column}=" + pd.Series(ctx.numeric(self.column)[pos]).astype(str).to_numpy(dtype=object)
+
+
+class ThresholdRule(RangeRule):
+    """Valores por encima de un umbral (p. ej. contratos de más de 1.000 SMLMV)."""
+
+    def __init__(self, name, column, limit, **kwargs):
+        super().__init__(name, column, max_value=limit, **kwargs)
+
+
+class ColumnsMatchRule(Rule):
+    """Dos columnas numéricas que deberían coincidir (p. ej. CUPOS vs Cupos_Zona)."""
+
+    def __init__(self, name, left, right, tolerance=0, **kwargs):
+        super().__init__(name, **kwargs)
+        self.left = left
+        self.right = right
+        self.tolerance = tolerance
+        self.columns = (left, right)
+
+    def evaluate(self, ctx):
+        a = ctx.numeric(self.left)
+        b = ctx.numeric(self.right)
+        both_nan = np.isnan(a) & np.isnan(b)
+        with np.errstate(invalid='ignore'):
+            return ~both_nan & ~(np.abs(a - b) <= self.tolerance)
+
+    def describe(self, ctx, pos):
+        a = pd.Series(ctx.numeric(self.left)[pos]).astype(str)
+        b = pd.Series(ctx.numeric(self.right)[pos]).astype(str)
+        return (f"{self.left}=" + a + f" / {self.right}=" + b).to_numpy(dtype=object)
+
+
+class RequiredFieldsRule(Rule):
+    """Campos críticos vacíos. Solo evalúa las columnas presentes en la hoja."""
+
+    def __init__(self, name, columns, **kwargs):
+        super().__init__(name, **kwargs)
+        self.required = list(columns)
+
+    def applies(self, ctx):
+        return any(ctx.has(c) for c in self.required)
+
+    def evaluate(self, ctx):
+        mask = np.zeros(len(ctx.df), dtype=bool)
+        for c in self.required:
+            if ctx.has(c):
+                mask |= ctx.empty(c)
+        return mask
+
+    def describe(self, ctx, pos):
+        detail = np.full(len(pos), 'vacío:', dtype=object)
+        sep = np.full(len(pos), ' ', dtype=object)
+        for c in self.required:
+            if ctx.has(c):
+                empty = ctx.empty(c)[pos]
+                detail[empty] = detail[empty] + sep[empty] + c
+                sep[empty] = ', '
+        return detail
+
+
+def run_audit(df, rules, sheet='', regional_col='REGIONAL', contract_col='REFERENCIA / No. CONTRATO SECOP'):
+    """
+    Evalúa todas las reglas sobre la hoja y devuelve (hallazgos, tiempos).
+
+    - hallazgos: una fila por (regla, fila de la hoja) con regla, severidad, hoja,
+      regional, contrato, fila (número de fila en el Excel, con encabezado en la
+      fila 1) y detalle.
+    - tiempos: por regla, filas marcadas, segundos y si se omitió por faltar columnas.
+    """
+
+    ctx = AuditContext(df)
+    regional = df[regional_col].to_numpy(dtype=object) if regional_col in df.columns else None
+    contract = df[contract_col].to_numpy(dtype=object) if contract_col in df.columns else None
+    partes = []
+    tiempos = []
+    for rule in rules:
+        t0 = time.perf_counter()
+        if not rule.applies(ctx):
+            tiempos.append({'regla': rule.name, 'severidad': rule.severity, 'hallazgos': 0,
+                            'segundos': 0.0, 'estado': 'omitida (faltan columnas)'})
+            continue
+        pos = np.flatnonzero(rule.evaluate(ctx))
+        detail = rule.describe(ctx, pos) if len(pos) else []
+        partes.append(pd.DataFrame({
+            'regla': rule.name,
+            'severidad': rule.severity,
+            'hoja': sheet,
+            'regional': regional[pos] if regional is not None else None,
+            'contrato': contract[pos] if contract is not None else None,
+            'fila': pos + 2,
+            'detalle': detail,
+        }, columns=FINDING_COLUMNS))
+        tiempos.append({'regla': rule.name, 'severidad': rule.severity, 'hallazgos': len(pos),
+                        'segundos': time.perf_counter() - t0, 'estado': 'ok'})
+
+    hallazgos = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=FINDING_COLUMNS)
+    return hallazgos, pd.DataFrame(tiempos, columns=['regla', 'severidad', 'hallazgos', 'segundos', 'estado'])
+
+
+def print_audit_summary(hallazgos, tiempos, max_examples=5):
+    """Resumen en consola: hallazgos y tiempo por regla, y algunos ejemplos de cada una."""
+    print(f"\n--- REGLAS DE AUDITORÍA ({tiempos['segundos'].sum():.2f}s) ---")
+    for t in tiempos.itertuples(index=False):
+        if t.estado != 'ok':
+            print(f"  [--] {t.regla}: {t.estado}")
+            continue
+        marca = 'OK' if t.hallazgos == 0 else t.severidad.upper()
+        print(f"  [{marca}] {t.regla}: {t.hallazgos} filas ({t.segundos:.3f}s)")
+    for regla, grupo in hallazgos.groupby('regla', sort=False):
+        print(f"\nEjemplos de '{regla}':")
+        print(grupo[['regional', 'contrato', 'fila', 'detalle']].head(max_examples).to_string(index=False))
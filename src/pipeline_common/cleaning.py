@@ -0,0 +1,139 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Tipos que `infer_dtype` reporta cuando todos los valores no nulos son números
+_NUMERIC_INFERRED = {'integer', 'floating', 'mixed-integer-float', 'decimal', 'boolean'}
+# Misma limpieza que `clean_currency` en una sola pasada: fuera '$', espacios y
+# puntos de miles; la coma decimal pasa a punto
+_CURRENCY_TABLE = str.maketrans({'$': None, ' ': None, '.': None, ',': '.'})
+# Filas de resumen dentro de las matrices regionales (SUBTOTAL ya contiene TOTAL)
+TOTAL_ROW_RE = re.compile('TOTAL|SUBTOTAL', re.IGNORECASE)
+
+
+def clean_currency(val):
+    if pd.isna(val) or val == '': return 0.0
+    if isinstance(val, (int, float)): return float(val)
+    # Limpiar string: quitar $, puntos de miles, espacios, etc.
+    s = str(val).replace('$', '').replace(' ', '').replace('.', '').replace(',', '.')
+    # Si después de limpiar hay varios puntos (ej. 1.200.000 -> 1200000)
+    # Ya quitamos los puntos arriba, ahora nos aseguramos que sea convertible
+    try:
+        return float(s)
+    except:
+        # Intentar rescatar solo números
+        s_only_num = re.sub(r'[^0-9.]', '', s)
+        try: return float(s_only_num)
+        except: return 0.0
+
+
+def _float_or_none(x):
+    try:
+        return float(x)
+    except ValueError:
+        return None
+
+
+def _parse_currency_strings(s):
+    """
+    Versión por columna de la rama de texto de `clean_currency`.
+
+    La limpieza de '$', espacios y separadores se hace con un solo `translate`
+    y la conversión con `astype('float64')`, que llama a `float()` por dentro
+    (mismo resultado exacto, a diferencia de `pd.to_numeric`). Solo si algún
+    texto no convierte se pasa valor a valor y luego al rescate de dígitos.
+    """
+
+    raw = s.str.translate(_CURRENCY_TABLE).to_numpy(dtype=object)
+    try:
+        return pd.Series(raw.astype('float64'), index=s.index)
+    except ValueError:
+        pass
+
+    parsed = np.array([_float_or_none(x) for x in raw], dtype=object)
+    failed = np.equal(parsed, None)
+    values = np.zeros(len(raw))
+    values[~failed] = parsed[~failed].astype('float64')
+    if failed.any():
+        # Intentar rescatar solo números; lo que siga sin convertir (ej. '') queda en 0
+        only_num = pd.Series(raw[failed], dtype=object).str.replace(r'[^0-9.]', '', regex=True)
+        valid = (only_num.str.fullmatch(r'[0-9]*\.?[0-9]*') & only_num.str.contains('[0-9]')).to_numpy(dtype=bool)
+        rescued = np.zeros(len(only_num))
+        rescued[valid] = only_num.to_numpy(dtype=object)[valid].astype('float64')
+        values[failed] = rescued
+    return pd.Series(values, index=s.index)
+
+
+def _clean_currency_values(s):
+    if pd.api.types.is_bool_dtype(s) or pd.api.types.is_numeric_dtype(s):
+        return s.astype('float64').fillna(0.0).to_numpy()
+
+    out = np.zeros(len(s))
+    present = s.notna().to_numpy()
+    is_str = np.array([isinstance(v, str) for v in s.to_numpy()], dtype=bool)
+
+    if is_str.any():
+        out[is_str] = _parse_currency_strings(s[is_str]).to_numpy()
+
+    other = present & ~is_str
+    if other.any():
+        rest = s[other]
+        if pd.api.types.infer_dtype(rest, skipna=False) in _NUMERIC_INFERRED:
+            out[other] = rest.astype('float64').to_numpy()
+        else:
+            out[other] = rest.map(clean_currency).astype('float64').to_numpy()
+    return out
+
+
+def clean_currency_series(s):
+    """
+    Equivalente vectorizado de `s.apply(clean_currency)`.
+
+    Las columnas numéricas se convierten directamente. En las de tipo objeto
+    se factoriza primero (en la MATRIZ los valores del contrato se repiten en
+    cada UDS tras el ffill) y solo se limpian los valores distintos: los textos
+    con operaciones `.str` sobre toda la columna y los valores exóticos
+    (fechas, horas...) con `clean_currency` uno a uno.
+    """
+
+    if pd.api.types.is_bool_dtype(s) or pd.api.types.is_numeric_dtype(s):
+        return s.astype('float64').fillna(0.0)
+
+    codes, uniques = pd.factorize(s)
+    values = _clean_currency_values(pd.Series(uniques, dtype=object))
+    # Código -1 = nulo -> 0.0
+    out = np.append(values, 0.0)[codes]
+    return pd.Series(out, index=s.index, name=s.name)
+
+
+def detect_total_rows(df, columns=None, pattern=TOTAL_ROW_RE):
+    """
+    Marca las filas de TOTAL / SUBTOTAL de una hoja.
+
+    Solo revisa columnas de texto (object / string / category) o las indicadas en
+    `columns`: las numéricas nunca pueden contener la palabra. En cada columna
+    se evalúa la regex una vez por valor distinto y se reparte el resultado a
+    las filas. Devuelve (máscara booleana, columna que disparó la marca), esta
+    última con la primera columna coincidente o NaN si la fila no es de totales.
+    """
+
+    mask = np.zeros(len(df), dtype=bool)
+    matched = np.full(len(df), np.nan, dtype=object)
+    for pos, col in enumerate(df.columns):
+        values = df.iloc[:, pos]
+        if columns is not None:
+            if col not in columns:
+                continue
+        elif not (pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values)
+                  or isinstance(values.dtype, pd.CategoricalDtype)):
+            continue
+        codes, uniques = pd.factorize(values)
+        if not len(uniques):
+            continue
+        hits = pd.Series(uniques, dtype=object).astype(str).str.contains(pattern).to_numpy(dtype=bool)
+        # Código -1 = nulo, nunca es total
+        col_mask = np.append(hits, False)[codes]
+        matched[col_mask & ~mask] = col
+        mask |= col_mask
+    return pd.Series(mask, index=df.index), pd.Series(matched, index=df.index)
@@ -0,0 +1,183 @@
+import re
+import unicodedata
+
+
+def normalize_str(s):
+    """
+    Mayúsculas, sin tildes y solo caracteres A-Z / 0-9 ('Nombre del Servicio' -> 'NOMBREDELSERVICIO').
+    """
+
+    if not isinstance(s, str):
+        return str(s)
+    s = s.upper().strip()
+    s = ''.join(c for c in unicodedata.normalize('NFD', s) if unicodedata.category(c) != 'Mn')
+    s_clean = re.sub(r'[^A-Z0-9]', '', s)
+    return s_clean
+
+
+def _compile_rule(target, cond, normalizer):
+    """
+    Convierte una regla declarativa en una tupla
+    (destino, igual, todos, alguno, ninguno) con los patrones ya normalizados.
+
+    Claves admitidas en `cond`:
+      - 'igual':   el encabezado normalizado debe ser exactamente este texto.
+      - 'todos':   deben aparecer todas las subcadenas.
+      - 'alguno':  debe aparecer al menos una de las subcadenas.
+      - 'ninguno': no debe aparecer ninguna de las subcadenas.
+    """
+
+    unknown = set(cond) - {'igual', 'todos', 'alguno', 'ninguno'}
+    if unknown:
+        raise ValueError(f"Regla '{target}' con claves desconocidas: {sorted(unknown)}")
+    eq = normalizer(cond['igual']) if 'igual' in cond else None
+    return (
+        target,
+        eq,
+        tuple(normalizer(p) for p in cond.get('todos', ())),
+        tuple(normalizer(p) for p in cond.get('alguno', ())),
+        tuple(normalizer(p) for p in cond.get('ninguno', ())),
+    )
+
+
+def _rule_matches(rule, c):
+    _, eq, todos, alguno, ninguno = rule
+    if eq is not None and c != eq:
+        return False
+    if any(p not in c for p in todos):
+        return False
+    if alguno and not any(p in c for p in alguno):
+        return False
+    if any(p in c for p in ninguno):
+        return False
+    return True
+
+
+class ColumnMapper:
+    """
+    Motor de mapeo de encabezados a partir de una tabla de reglas.
+
+    Las reglas se compilan una sola vez y los resultados se memorizan: por
+    encabezado crudo (`target_for`) y por tupla completa de encabezados
+    (`rename_dict` / `locate`), así que los archivos que comparten plantilla
+    cuestan una sola búsqueda en diccionario.
+    """
+
+    def __init__(self, rules, normalizer=normalize_str):
+        self.normalizer = normalizer
+        self.rules = tuple(_compile_rule(target, cond, normalizer) for target, cond in rules)
+        self._targets = {}
+        self._layouts = {}
+        self._locations = {}
+
+    def target_for(self, header):
+        """
+        Destino de la primera regla que cumple el encabezado (como una cadena
+        de `elif`), o None si ninguna aplica.
+        """
+
+        try:
+            return self._targets[header]
+        except KeyError:
+            pass
+        c = self.normalizer(header)
+        target = next((rule[0] for rule in self.rules if _rule_matches(rule, c)), None)
+        self._targets[header] = target
+        return target
+
+    def rename_dict(self, headers):
+        """
+        Diccionario {encabezado_crudo: destino} listo para `df.rename(columns=...)`.
+        """
+
+        key = tuple(headers)
+        cached = self._layouts.get(key)
+        if cached is None:
+            cached = {}
+            for col in key:
+                target = self.target_for(col)
+                if target is not None:
+                    cached[col] = target
+            self._layouts[key] = cached
+        return dict(cached)
+
+    def locate(self, headers):
+        """
+        Para cada regla, posición del primer encabezado que la cumple.
+
+        `headers` es un dict {posición: encabezado}; se recorre en orden de
+        posición. Devuelve {destino: posición o None}. A diferencia de
+        `rename_dict`, un mismo encabezado puede satisfacer varias reglas.
+        """
+
+        key = tuple(sorted(headers.items()))
+        cached = self._locations.get(key)
+        if cached is None:
+            normalized = [(idx, self.normalizer(hdr)) for idx, hdr in key]
+            cached = {}
+            for rule in self.rules:
+                cached[rule[0]] = next((idx for idx, c in normalized if _rule_matches(rule, c)), None)
+            self._locations[key] = cached
+        return dict(cached)
+
+
+# ---------------------------------------------------------------------------
+# Reglas de la hoja MATRIZ de HCB. El orden importa: gana la primera que aplique.
+# ---------------------------------------------------------------------------
+SML = ['SML', 'SMML']
+
+HCB_MATRIZ_RULES = [
+    ('REGIONAL', {'todos': ['REGIONAL']}),
+    ('REFERENCIA / No. CONTRATO SECOP', {'todos': ['CONTRATOSECOP']}),
+    ('CENTRO ZONAL', {'todos': ['CENTROZONAL']}),
+    ('MUNICIPIO', {'todos': ['MUNICIPIO']}),
+    ('SERVICIO 2026', {'todos': ['NOMBREDELSERVICIO']}),
+    ('Componente para la UDS', {'todos': ['MODALIDADDESERVICIO']}),
+    ('NIT CONTRATISTA 2026', {'igual': 'NIT'}),
+    ('CONTRATISTA 2026', {'todos': ['NOMBREEAS']}),
+    ('Cupos', {'todos': ['CUPOSPORUNIDAD']}),
+    ('CANTIDAD DE MADRES POR UDS', {'todos': ['MADRESPORUDS', '2025']}),
+
+    # Administrativos y Tiempos
+    ('No. RP', {'igual': 'NORP'}),
+    ('VIGENCIA', {'igual': 'VIGENCIA'}),
+    ('FORMA CONTRATACION', {'todos': ['FORMADECONTRATACION']}),
+    ('DURACION INICIAL', {'todos': ['TIEMPOINICIALDELCONTRATO']}),
+    ('DURACION ADICION', {'todos': ['TIEMPOAADICIONAR']}),
+    ('CANTIDAD UDS', {'todos': ['CANTIDADDEUDS']}),
+    ('SANCIONATORIOS', {'todos': ['SANCIONATORIOS']}),
+    ('ALERTA 1000 SMLMV', {'todos': ['ALERTADEAVAL', '1000']}),
+    ('ALERTA 5000 SMLMV', {'todos': ['ALERTA', '5000']}),
+
+    # Variables de Análisis Presupuestal
+    ('VALOR UNITARIO MES', {'todos': ['VALORUNITARIO', 'MES']}),
+    ('VALOR CANASTA 2026', {'todos': ['VALORCANASTA', '2026']}),
+
+    # Pesos
+    ('VALOR INICIAL 2026', {'todos': ['VALORTOTALINICIAL', 'APORTEICBF', 'UNICO']}),
+    ('APORTE CONTRAPARTIDA', {'todos': ['VALORINICIALCONTRAPARTIDA']}),
+    ('VALOR ADICIONES A LA FECHA', {'todos': ['VALORADICIONESHISTORICAS', 'ICBF']}),
+    ('ADICION OTROS CONCEPTOS', {'todos': ['VALORADICIONOTROSCONCEPTOS']}),
+    ('VALOR REDUCCIONES A LA FECHA', {'todos': ['VALORREDUCCIONESHISTORICAS', 'ICBF']}),
+    ('INEJECUCIONES', {'todos': ['VALORINEJECUCIONES']}),
+    ('VALOR ACTUAL', {'todos': ['VALORACTUALDELCONTRATO', 'ANTES', 'UNICO'], 'ninguno': ['SML']}),
+    ('VALOR FINAL ADICION SERVICIO', {'todos': ['VALORTOTALDELAADICIONCONTRATO', 'UNICO'], 'ninguno': ['SML']}),
+    ('VALOR A ADICIONAR', {'todos': ['VALORTOTALDELAADICIONAPORTEICBF', 'UNICO']}),
+    ('CONTRAPARTIDA ADICION', {'todos': ['VALORCONTRAPARTIDAADICION']}),
+
+    # SMLV (Detección por palabra 'SML' o 'SMML')
+    ('VALOR INICIAL 2026 (SMLV)', {'todos': ['VALORTOTALINICIAL', 'UNICO'], 'alguno': SML}),
+    ('VALOR ACTUAL TOTAL DEL CONTRATO (SMLV)', {'todos': ['VALORACTUAL', 'UNICO'], 'alguno': SML}),
+    ('VALOR FINAL ADICION SERVICIO (SMLV)', {'todos': ['VALORTOTALDELAADICION', 'UNICO'], 'alguno': SML}),
+    ('VALOR TOTAL DEL CONTRATO (SMLV)', {'todos': ['VALORFINAL', 'UNICO'], 'alguno': SML}),
+
+    # Granular
+    ('VALOR ADICION CANASTA (MULTIPLE)', {'todos': ['VALORADICIONNIVELACIONCANASTA', 'MULTIPLE']}),
+    ('VALOR TOTAL ADICION (MULTIPLE)', {'todos': ['VALORTOTALDELAADICIONAPORTEICBF', 'MULTIPLE']}),
+
+    # Cupos (Manejo de erratas como 'CONTRAO' y variaciones)
+    ('CUPOS', {'todos': ['CUPOS'], 'alguno': ['UNICO', 'CONTRATO', 'CONTRAO', 'SUMATORIA']}),
+    ('Cupos', {'todos': ['CUPOS', 'UNIDAD']}),  # Para zonificación
+]
+
+HCB_MATRIZ_MAPPER = ColumnMapper(HCB_MATRIZ_RULES)
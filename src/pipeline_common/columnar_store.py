@@ -0,0 +1,306 @@
+import json
+import os
+import pickle
+import shutil
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401 (solo para saber si hay Parquet disponible)
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+MANIFEST_FILE = '_hojas.json'
+INDEX_FILE = '_indices.json'
+PARTS_FILE = '_partes.json'
+FRAME_EXTS = ('.parquet', '.pkl')
+
+
+def save_frame(df, base_path):
+    """
+    Guarda un DataFrame en `base_path` + '.parquet', o en '.pkl' si no hay
+    pyarrow o el frame no vuelve idéntico de Parquet (columnas object con
+    tipos mezclados, None vs NaN, nombres de columna no textuales...).
+    Devuelve la ruta escrita.
+    """
+
+    _remove_frame(base_path)
+    if HAS_PARQUET:
+        path = base_path + '.parquet'
+        try:
+            df.to_parquet(path, index=True)
+            if pd.read_parquet(path).equals(df):
+                return path
+        except Exception:
+            pass
+        if os.path.exists(path):
+            os.remove(path)
+    path = base_path + '.pkl'
+    with open(path, 'wb') as fh:
+        pickle.dump(df, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def _remove_frame(base_path):
+    for ext in FRAME_EXTS:
+        if os.path.exists(base_path + ext):
+            os.remove(base_path + ext)
+    if os.path.isdir(base_path):
+        shutil.rmtree(base_path)
+
+
+def _is_parts_dir(path):
+    return os.path.exists(os.path.join(path, PARTS_FILE))
+
+
+def find_frame(base_path):
+    for ext in FRAME_EXTS:
+        if os.path.exists(base_path + ext):
+            return base_path + ext
+    if _is_parts_dir(base_path):
+        return base_path
+    return None
+
+
+def _read_parts(folder):
+    with open(os.path.join(folder, PARTS_FILE), encoding='utf-8') as fh:
+        return json.load(fh)['partes']
+
+
+def load_frame(path):
+    if os.path.isdir(path):
+        # Hoja escrita por partes (DatasetAppender): mismo resultado que concatenarlas en memoria
+        frames = [load_frame(os.path.join(path, p)) for p in _read_parts(path)]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    with open(path, 'rb') as fh:
+        return pickle.load(fh)
+
+
+def dataset_dir(excel_path):
+    """Carpeta de datos columnares de un libro: 'salida.xlsx' -> 'salida_datos/'."""
+    return os.path.splitext(excel_path)[0] + '_datos'
+
+
+def _sheet_base(folder, sheet_name):
+    safe = ''.join('_' if c in '\\/:*?"<>|' else c for c in sheet_name)
+    return os.path.join(folder, safe)
+
+
+def write_dataset(excel_path, frames):
+    """
+    Escribe junto al Excel una copia columnar de cada hoja ({hoja: df}).
+
+    Llamar después de guardar el Excel: las etapas siguientes solo usan el
+    dataset si es más reciente que el libro. El manifiesto registra todas las
+    hojas del libro para no tener que abrirlo al buscar una hoja que no existe.
+    """
+
+    update_dataset(excel_path, frames)
+
+
+def update_dataset(excel_path, frames, changed=None):
+    """
+    Como `write_dataset`, pero solo reescribe las hojas de `changed`: las demás
+    de `frames` se conservan si ya están en la carpeta (por ejemplo tras
+    `copy_dataset`). `changed=None` reescribe todas. Las hojas que ya no están
+    en `frames` se eliminan del dataset.
+    """
+
+    folder = dataset_dir(excel_path)
+    os.makedirs(folder, exist_ok=True)
+    keep = set()
+    for sheet_name, df in frames.items():
+        base = _sheet_base(folder, sheet_name)
+        path = find_frame(base)
+        if changed is not None and sheet_name not in changed and path is not None:
+            keep.add(os.path.basename(path))
+        else:
+            keep.add(os.path.basename(save_frame(df, base)))
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if name in keep:
+            continue
+        if name.endswith(FRAME_EXTS):
+            os.remove(path)
+        elif _is_parts_dir(path):
+            shutil.rmtree(path)
+    write_manifest(excel_path, list(frames))
+
+
+def write_manifest(excel_path, sheet_names):
+    """
+    Registra las hojas del libro en el dataset. Marca el dataset como al día
+    con el Excel, así que se llama después de guardar el libro.
+    """
+
+    folder = dataset_dir(excel_path)
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, MANIFEST_FILE), 'w', encoding='utf-8') as fh:
+        json.dump({'libro': os.path.basename(excel_path), 'hojas': list(sheet_names)}, fh, ensure_ascii=False)
+
+
+class DatasetAppender:
+    """
+    Hoja del dataset escrita por partes en `<nombre>_datos/<hoja>/`, p. ej. una
+    parte por libro regional, sin juntar nunca la hoja completa en memoria.
+
+    Las columnas se unifican a medida que llegan, en orden de primera aparición
+    como `pd.concat`; al leer una parte con `iter_frames` las columnas que no
+    trae quedan vacías. `read_sheets` / `load_frame` devuelven la hoja
+    concatenada, igual que si se hubiera armado en memoria.
+
+        appender = DatasetAppender(salida, 'ZONIFICACIÓN- PEDAGOGICO')
+        for df in libros:
+            appender.append(df)
+        appender.close()
+        with StreamingExcelWriter(salida) as writer:
+            writer.write_sheet_chunks(hoja, appender.columns, appender.iter_frames())
+        write_manifest(salida, [hoja])
+    """
+
+    def __init__(self, excel_path, sheet_name):
+        folder = dataset_dir(excel_path)
+        os.makedirs(folder, exist_ok=True)
+        # Hasta el nuevo manifiesto el dataset no vale (el Excel aún no está escrito)
+        if os.path.exists(os.path.join(folder, MANIFEST_FILE)):
+            os.remove(os.path.join(folder, MANIFEST_FILE))
+        self.sheet_name = sheet_name
+        self.folder = _sheet_base(folder, sheet_name)
+        _remove_frame(self.folder)
+        os.makedirs(self.folder)
+        self.columns = []
+        self.parts = []
+        self.rows = 0
+        self._known = set()
+
+    def append(self, df):
+        for col in df.columns:
+            if col not in self._known:
+                self._known.add(col)
+                self.columns.append(col)
+        path = save_frame(df, os.path.join(self.folder, f'parte_{len(self.parts):05d}'))
+        self.parts.append(os.path.basename(path))
+        self.rows += len(df)
+
+    def close(self):
+        with open(os.path.join(self.folder, PARTS_FILE), 'w', encoding='utf-8') as fh:
+            json.dump({'hoja': self.sheet_name, 'filas': self.rows, 'partes': self.parts}, fh, ensure_ascii=False)
+
+    def iter_frames(self):
+        """Partes de una en una, con las columnas unificadas."""
+        for name in self.parts:
+            yield load_frame(os.path.join(self.folder, name)).reindex(columns=self.columns)
+
+
+def _fresh_manifest(excel_path):
+    manifest = os.path.join(dataset_dir(excel_path), MANIFEST_FILE)
+    if not os.path.exists(manifest):
+        return None
+    if os.path.exists(excel_path) and os.path.getmtime(manifest) < os.path.getmtime(excel_path):
+        return None
+    with open(manifest, encoding='utf-8') as fh:
+        return json.load(fh)['hojas']
+
+
+def read_sheets(excel_path, sheet_names):
+    """
+    Lee varias hojas de un libro consolidado y devuelve {hoja: df} con las que existan.
+
+    Si el dataset columnar es más reciente que el Excel se usa ese; si no (o
+    falta alguna hoja), se abre el Excel una sola vez para las restantes.
+    """
+
+    result = {}
+    pending = list(sheet_names)
+    hojas = _fresh_manifest(excel_path)
+    if hojas is not None:
+        folder = dataset_dir(excel_path)
+        for sheet_name in list(pending):
+            path = find_frame(_sheet_base(folder, sheet_name))
+            if sheet_name in hojas and path is not None:
+                result[sheet_name] = load_frame(path)
+                pending.remove(sheet_name)
+            elif sheet_name not in hojas:
+                # El libro no tiene esa hoja
+                pending.remove(sheet_name)
+    if pending:
+        xls = pd.ExcelFile(excel_path)
+        for sheet_name in pending:
+            if sheet_name in xls.sheet_names:
+                result[sheet_name] = pd.read_excel(xls, sheet_name=sheet_name)
+    return result
+
+
+def read_sheet(excel_path, sheet_name):
+    """Una hoja del libro (columnar si está al día, si no desde el Excel)."""
+    frames = read_sheets(excel_path, [sheet_name])
+    if sheet_name not in frames:
+        raise ValueError(f"Worksheet named '{sheet_name}' not found")
+    return frames[sheet_name]
+
+
+def write_column_index(excel_path, sheet_name, df, columns):
+    """
+    Índice liviano junto al dataset: valores distintos (como texto) de algunas
+    columnas de una hoja, p. ej. las regionales del consolidado, para que la
+    etapa siguiente no tenga que leer la hoja completa. Llamar después de
+    guardar el Excel.
+    """
+
+    write_index_values(excel_path, sheet_name, {c: df[c] for c in columns if c in df.columns})
+
+
+def write_index_values(excel_path, sheet_name, values):
+    """Como `write_column_index` con los valores ya reunidos: {columna: iterable de valores}."""
+
+    folder = dataset_dir(excel_path)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, INDEX_FILE)
+    indices = {}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as fh:
+            indices = json.load(fh)['indices']
+    indices[sheet_name] = {}
+    for c, v in values.items():
+        v = v if isinstance(v, pd.Series) else pd.Series(list(v), dtype=object)
+        indices[sheet_name][c] = sorted(v.dropna().astype(str).unique().tolist())
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump({'libro': os.path.basename(excel_path), 'indices': indices}, fh, ensure_ascii=False, indent=1)
+
+
+def read_column_index(excel_path, sheet_name, column):
+    """Valores indexados de `column`, o None si no hay índice al día con el Excel."""
+    path = os.path.join(dataset_dir(excel_path), INDEX_FILE)
+    if not os.path.exists(path):
+        return None
+    if os.path.exists(excel_path) and os.path.getmtime(path) < os.path.getmtime(excel_path):
+        return None
+    with open(path, encoding='utf-8') as fh:
+        return json.load(fh)['indices'].get(sheet_name, {}).get(column)
+
+
+def copy_dataset(src_excel, dst_excel):
+    """
+    Acompaña una copia literal del libro (shutil.copy) con la de su dataset,
+    si el de origen está al día. Llamar después de copiar el Excel.
+    """
+
+    dst = dataset_dir(dst_excel)
+    if _fresh_manifest(src_excel) is None:
+        return False
+    if os.path.isdir(dst):
+        shutil.rmtree(dst)
+    shutil.copytree(dataset_dir(src_excel), dst)
+    with open(os.path.join(dst, MANIFEST_FILE), 'r+', encoding='utf-8') as fh:
+        manifest = json.load(fh)
+        manifest['libro'] = os.path.basename(dst_excel)
+        fh.seek(0)
+        fh.truncate()
+        json.dump(manifest, fh, ensure_ascii=False)
+    # copytree conserva la fecha original; el índice vale igual para la copia
+    if os.path.exists(os.path.join(dst, INDEX_FILE)):
+        os.utime(os.path.join(dst, INDEX_FILE))
+    return True
@@ -0,0 +1,234 @@
+import numbers
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import ERROR_CODES, TYPE_ERROR, TYPE_NUMERIC
+from pandas.io.parsers import TextParser
+
+from pipeline_common.excel_writer import column_values
+
+# Extensiones que openpyxl puede leer en modo streaming
+STREAMING_EXTS = ('.xlsx', '.xlsm')
+
+
+def _convert_cell(cell):
+    """
+    Convierte una celda de openpyxl igual que el lector de pandas
+    (vacía -> '', error -> NaN, números enteros -> int).
+    """
+
+    if cell.value is None:
+        return ""
+    if cell.data_type == TYPE_ERROR:
+        return np.nan
+    if cell.data_type == TYPE_NUMERIC:
+        val = int(cell.value)
+        if val == cell.value:
+            return val
+        return float(cell.value)
+    return cell.value
+
+
+def _find_sheet(sheet_names, sheet_match):
+    """
+    `sheet_match` puede ser el nombre exacto o una función nombre -> bool.
+    """
+
+    for name in sheet_names:
+        if callable(sheet_match):
+            if sheet_match(name):
+                return name
+        elif name == sheet_match:
+            return name
+    return None
+
+
+def _rows_to_frame(rows, max_width):
+    """
+    Arma el DataFrame con el mismo parser que usa `pd.read_excel`, tomando
+    la primera fila de `rows` como encabezado.
+    """
+
+    if not rows:
+        return pd.DataFrame()
+    rows = [r + [""] * (max_width - len(r)) if len(r) < max_width else r for r in rows]
+    return TextParser(rows, header=0, skip_blank_lines=False).read()
+
+
+def read_sheet_data(ws, header_match, max_scan_rows=20):
+    """
+    Recorre una hoja abierta en modo `read_only` una sola vez: busca la fila de
+    encabezados entre las primeras `max_scan_rows` filas y, desde ese mismo
+    iterador, acumula los datos.
+
+    `header_match` recibe la lista de valores de una fila y devuelve True si es
+    la fila de encabezados. Devuelve (DataFrame, indice_fila_header) o
+    (None, None) si no se encontró el encabezado.
+    """
+
+    ws.reset_dimensions()
+    h_idx = None
+    rows = []
+    max_width = 0
+    last_with_data = -1
+
+    for row_number, row in enumerate(ws.rows):
+        converted = [_convert_cell(c) for c in row]
+        while converted and converted[-1] == "":
+            converted.pop()
+        # pandas rellena todas las filas al ancho máximo de la hoja, incluidas
+        # las que están por encima del encabezado
+        max_width = max(max_width, len(converted))
+
+        if h_idx is None:
+            if header_match(converted):
+                h_idx = row_number
+            elif row_number + 1 >= max_scan_rows:
+                return None, None
+            else:
+                continue
+
+        if converted:
+            last_with_data = len(rows)
+        rows.append(converted)
+
+    if h_idx is None:
+        return None, None
+    # Quitar filas vacías al final de la hoja
+    rows = rows[: last_with_data + 1]
+    return _rows_to_frame(rows, max_width), h_idx
+
+
+class WorkbookSession:
+    """
+    Libro abierto una sola vez: el índice de hojas y el zip se leen al abrir y
+    cada hoja pedida se recorre una sola vez (detección de encabezado + datos
+    en la misma pasada), en lugar de un `read_excel` de sondeo y otro completo
+    por hoja.
+
+        with WorkbookSession(ruta) as wb:
+            hoja, df = wb.read_with_header(lambda s: 'ZONIFICAC' in s.upper(),
+                                           header_contains('Regional UDS'), max_scan_rows=15)
+
+    Los formatos que openpyxl no lee en streaming (.xls) usan `pd.ExcelFile`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._wb = None
+        self._xls = None
+        if str(path).lower().endswith(STREAMING_EXTS):
+            self._wb = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+            self.sheet_names = list(self._wb.sheetnames)
+        else:
+            self._xls = pd.ExcelFile(path)
+            self.sheet_names = list(self._xls.sheet_names)
+
+    def find_sheet(self, sheet_match):
+        return _find_sheet(self.sheet_names, sheet_match)
+
+    def read_with_header(self, sheet_match, header_match, max_scan_rows=20):
+        """
+        Devuelve (nombre_hoja, DataFrame) como `read_sheet_with_header`: el
+        DataFrame es None si no hay encabezado reconocible y ambos son None si
+        no existe la hoja.
+        """
+
+        sheet_name = self.find_sheet(sheet_match)
+        if sheet_name is None:
+            return None, None
+        if self._wb is not None:
+            df, _ = read_sheet_data(self._wb[sheet_name], header_match, max_scan_rows)
+            return sheet_name, df
+        df_temp = pd.read_excel(self._xls, sheet_name=sheet_name, nrows=max_scan_rows, header=None)
+        for idx, row in df_temp.iterrows():
+            if header_match(list(row.values)):
+                return sheet_name, pd.read_excel(self._xls, sheet_name=sheet_name, header=idx)
+        return sheet_name, None
+
+    def close(self):
+        if self._wb is not None:
+            self._wb.close()
+        if self._xls is not None:
+            self._xls.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def header_contains(keyword):
+    """Criterio de encabezado: alguna celda de texto contiene `keyword` (sin distinguir mayúsculas)."""
+    keyword = keyword.lower()
+    return lambda values: any(isinstance(val, str) and keyword in val.lower() for val in values)
+
+
+def read_sheet_with_header(path, sheet_match, header_match, max_scan_rows=20):
+    """
+    Lee la hoja que cumpla `sheet_match` detectando el encabezado en una sola
+    pasada (equivalente a `read_excel(nrows=N, header=None)` + `read_excel(header=h)`).
+
+    Devuelve (nombre_hoja, DataFrame). El DataFrame es None si la hoja no tiene
+    encabezado reconocible; ambos son None si no existe la hoja. Los formatos
+    que openpyxl no lee en streaming (.xls) usan el camino clásico de pandas.
+    """
+
+    with WorkbookSession(path) as wb:
+        return wb.read_with_header(sheet_match, header_match, max_scan_rows)
+
+
+def _read_back(value):
+    """
+    Lo que devuelve `_convert_cell` para una celda escrita con `value`:
+    openpyxl guarda los textos '=...' como fórmula (sin valor al releer) y
+    los códigos de error como error.
+    """
+
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        if len(value) > 1 and value.startswith('='):
+            return ""
+        if value in ERROR_CODES:
+            return np.nan
+        return value
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, numbers.Number):
+        val = int(value)
+        if val == value:
+            return val
+        return float(value)
+    return value
+
+
+def excel_roundtrip(df, formulas=None):
+    """
+    `df` tal como queda al guardarlo con `write_excel` y volver a leerlo con
+    `pd.read_excel`, sin pasar por disco: números enteros como int, textos
+    numéricos convertidos, vacíos como NaN, nombres de columna como en el
+    encabezado del libro y sin filas ni columnas vacías al final. Permite
+    encadenar etapas en memoria con los mismos tipos que si cada una leyera
+    el Excel de la anterior.
+
+    `formulas` es el mismo {columna: plantilla} de `write_excel`: esas
+    columnas se guardan como fórmula y al releerlas quedan vacías.
+    """
+
+    if not len(df.columns):
+        return pd.DataFrame()
+    formulas = formulas or {}
+    header = [_read_back(c) for c in df.columns]
+    columns = [[""] * len(df) if c in formulas else [_read_back(v) for v in column_values(df.iloc[:, i])]
+               for i, c in enumerate(df.columns)]
+    # Columnas vacías al final (incluido el encabezado): el lector no las ve
+    while columns and header[-1] == "" and all(v == "" for v in columns[-1]):
+        columns.pop()
+        header.pop()
+    rows = [list(r) for r in zip(*columns)]
+    while rows and all(v == "" for v in rows[-1]):
+        rows.pop()
+    return _rows_to_frame([header] + rows, len(header))
@@ -0,0 +1,210 @@
+import unicodedata
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import FormulaRule
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+# Filas que se convierten a la vez antes de pasarlas a openpyxl
+CHUNK_ROWS = 20000
+# Pesos con separador de miles (los valores unitarios pueden traer centavos)
+CURRENCY_FORMAT = '"$"#,##0.00'
+
+_THIN = Side(style='thin')
+# Mismo estilo de encabezado que `DataFrame.to_excel`
+HEADER_STYLE = {
+    'font': Font(bold=True),
+    'border': Border(left=_THIN, right=_THIN, top=_THIN, bottom=_THIN),
+    'alignment': Alignment(horizontal='center', vertical='top'),
+}
+
+
+def column_values(series):
+    """
+    Valores de una columna listos para openpyxl: nulos -> celda vacía e
+    infinitos -> 'inf' / '-inf', igual que `to_excel`.
+    """
+
+    values = series.astype(object).to_numpy()
+    missing = pd.isna(series).to_numpy()
+    if missing.any():
+        values = values.copy()
+        values[missing] = None
+    if pd.api.types.is_float_dtype(series):
+        raw = series.to_numpy()
+        values[np.isposinf(raw)] = 'inf'
+        values[np.isneginf(raw)] = '-inf'
+    return values.tolist()
+
+
+class StreamingExcelWriter:
+    """
+    Escritor de libros Excel en modo `write_only` de openpyxl.
+
+    Las filas se escriben en disco a medida que se agregan, así que la memoria
+    no crece con el tamaño de la hoja (a diferencia de `pd.ExcelWriter`, que
+    arma todo el libro antes de guardar). Como contrapartida, cada hoja se
+    escribe de una vez y en orden: no se puede volver a editar una celda.
+
+        with StreamingExcelWriter(ruta) as writer:
+            writer.write_sheet('MATRIZ_CALCULADA', df,
+                               number_formats={'VALOR ACTUAL': CURRENCY_FORMAT},
+                               col_widths={'REGIONAL': 25})
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.wb = Workbook(write_only=True)
+
+    def write_sheet(self, sheet_name, df, **options):
+        """
+        Escribe `df` (sin índice) en una hoja nueva.
+
+        - col_widths:     {columna: ancho}.
+        - number_formats: {columna: formato Excel}, ej. CURRENCY_FORMAT.
+        - formulas:       {columna: plantilla}; la plantilla se completa con la
+                          fila de Excel, ej. '=+EXACT(A{row},CF{row})', y
+                          reemplaza los valores de esa columna.
+        - row_highlights: (columna, {texto: color}); pinta la fila completa del
+                          color del primer texto contenido en esa columna, con
+                          reglas de formato condicional (no estilo por celda).
+        """
+
+        return self.write_sheet_chunks(sheet_name, list(df.columns), [df], **options)
+
+    def write_sheet_chunks(self, sheet_name, columns, chunks, header=True, header_style=HEADER_STYLE,
+                           col_widths=None, number_formats=None, formulas=None, row_highlights=None,
+                           freeze_header=False):
+        """
+        Como `write_sheet`, pero la hoja llega por partes: `chunks` es un
+        iterable de DataFrames con las columnas `columns` (p. ej. las partes de
+        un dataset en disco), así que nunca hace falta tenerla completa en memoria.
+        """
+
+        ws = self.wb.create_sheet(title=sheet_name)
+        columns = list(columns)
+        positions = {c: i for i, c in enumerate(columns)}
+
+        for col, width in (col_widths or {}).items():
+            if col in positions:
+                ws.column_dimensions[get_column_letter(positions[col] + 1)].width = width
+        if freeze_header and header:
+            ws.freeze_panes = 'A2'
+
+        if header:
+            header_cells = []
+            for col in columns:
+                cell = WriteOnlyCell(ws, value=col)
+                if header_style:
+                    for attr, style in header_style.items():
+                        setattr(cell, attr, style)
+                header_cells.append(cell)
+            ws.append(header_cells)
+
+        next_row = 2 if header else 1
+        number_formats = number_formats or {}
+        formulas = formulas or {}
+        for df in chunks:
+            # Se convierte por bloques de filas para que la memoria no dependa del tamaño de la hoja
+            for start in range(0, len(df), CHUNK_ROWS):
+                chunk = df.iloc[start:start + CHUNK_ROWS]
+                rows = range(next_row, next_row + len(chunk))
+                data = []
+                for i, col in enumerate(columns):
+                    if col in formulas:
+                        values = [formulas[col].format(row=r) for r in rows]
+                    else:
+                        values = column_values(chunk.iloc[:, i])
+                    fmt = number_formats.get(col)
+                    if fmt is not None:
+                        values = [self._formatted_cell(ws, v, fmt) for v in values]
+                    data.append(values)
+                for row in zip(*data):
+                    ws.append(row)
+                next_row += len(chunk)
+        if row_highlights:
+            self._highlight_rows(ws, columns, 2 if header else 1, next_row - 1, *row_highlights)
+        return ws
+
+    @staticmethod
+    def _highlight_rows(ws, columns, first_row, last_row, column, colors):
+        # Una regla por color sobre toda la hoja: el costo no depende de las filas.
+        # FIND distingue mayúsculas, como `texto in valor`; stopIfTrue deja el primer texto que coincide.
+        if last_row < first_row or column not in columns:
+            return
+        letter = get_column_letter(columns.index(column) + 1)
+        ref = f"A{first_row}:{get_column_letter(len(columns))}{last_row}"
+        for text, color in colors.items():
+            text = str(text).replace('"', '""')
+            fill = PatternFill(start_color=color, end_color=color, fill_type='solid')
+            ws.conditional_formatting.add(ref, FormulaRule(
+                formula=[f'ISNUMBER(FIND("{text}",${letter}{first_row}))'], fill=fill, stopIfTrue=True))
+
+    @staticmethod
+    def _formatted_cell(ws, value, fmt):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.number_format = fmt
+        return cell
+
+    def close(self):
+        self.wb.save(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+
+def column_formula(template, columns, **refs):
+    """
+    Plantilla para `formulas=` con columnas referidas por nombre: cada
+    {ref} se reemplaza por la letra de esa columna en `columns` y {row}
+    queda para el escritor.
+
+        column_formula('=+EXACT({ref}{row},CF{row})', df.columns, ref='RIESGO TRANSPARENCIA')
+        -> '=+EXACT(AG{row},CF{row})'
+    """
+
+    columns = list(columns)
+    letters = {name: get_column_letter(columns.index(col) + 1) for name, col in refs.items()}
+    return template.format(row='{row}', **letters)
+
+
+def _header_key(name):
+    return unicodedata.normalize('NFKD', str(name)).encode('ASCII', 'ignore').decode('ASCII').lower().replace(' ', '').replace('\n', '')
+
+
+def riesgo_formulas(columns):
+    """
+    {columna Unnamed: '=+EXACT(<RIESGO TRANSPARENCIA>{row},CF{row})'} para
+    `formulas=` de ZonificacionPais; {} si falta alguna de las dos columnas.
+    La usan todos los escritores de ZonificacionPais para que la fórmula sea
+    la misma en cada uno.
+    """
+
+    columns = list(columns)
+    unnamed = None
+    riesgo_col = None
+    for c in columns:
+        if str(c).startswith("Unnamed"):
+            unnamed = c
+        elif _header_key(c) == _header_key("RIESGO TRANSPARENCIA"):
+            riesgo_col = c
+    if not unnamed:
+        return {}
+    if not riesgo_col:
+        print("  AVISO: No se encontro columna RIESGO TRANSPARENCIA")
+        return {}
+    return {unnamed: column_formula("=+EXACT({ref}{row},CF{row})", columns, ref=riesgo_col)}
+
+
+def write_excel(path, sheets, **options):
+    """Atajo: escribe {hoja: df} en un libro nuevo con las mismas opciones para todas las hojas."""
+    with StreamingExcelWriter(path) as writer:
+        for sheet_name, df in sheets.items():
+            writer.write_sheet(sheet_name, df, **options)
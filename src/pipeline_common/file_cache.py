@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import shutil
+
+from pipeline_common.columnar_store import load_frame, save_frame
+
+INDEX_FILE = 'index.json'
+
+
+def file_sha1(path, chunk_size=1 << 20):
+    h = hashlib.sha1()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def code_version(*paths):
+    """
+    Huella del código que produce los DataFrames cacheados (script, reglas de
+    mapeo, limpieza...). Si cualquiera de esos archivos cambia, cambia la
+    versión y todas las entradas anteriores dejan de servir.
+    """
+
+    h = hashlib.sha1()
+    for p in paths:
+        with open(p, 'rb') as fh:
+            h.update(fh.read())
+    return h.hexdigest()[:16]
+
+
+class FileCache:
+    """
+    Caché por archivo de entrada para las consolidaciones regionales.
+
+    Cada entrada guarda el resultado ya normalizado de un libro (DataFrame en
+    Parquet, o pickle si no hay pyarrow o el frame no sobrevive al formato,
+    más un JSON con los metadatos). La clave combina ruta, huella del
+    contenido (SHA-1) y versión del código; tamaño y fecha de modificación
+    solo sirven para no recalcular el SHA-1 de los libros que no han cambiado.
+
+    `enabled=False` (--no-cache) no lee ni escribe; `rebuild=True` (--rebuild)
+    borra la caché y la vuelve a poblar.
+    """
+
+    def __init__(self, cache_dir, version, enabled=True, rebuild=False):
+        self.cache_dir = cache_dir
+        self.version = version
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._used = set()
+        self._index = {}
+        if not enabled:
+            return
+        if rebuild and os.path.isdir(cache_dir):
+            shutil.rmtree(cache_dir)
+        os.makedirs(cache_dir, exist_ok=True)
+        index_path = os.path.join(cache_dir, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, encoding='utf-8') as fh:
+                self._index = json.load(fh)
+
+    def fingerprint(self, path):
+        """
+        {'size', 'mtime_ns', 'sha1'} del libro; el SHA-1 solo se recalcula si
+        cambió el tamaño o la fecha de modificación desde la última vez.
+        """
+
+        path = os.path.normcase(os.path.abspath(path))
+        st = os.stat(path)
+        entry = self._index.get(path)
+        if not (entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns):
+            entry = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha1': file_sha1(path)}
+            self._index[path] = entry
+        return dict(entry)
+
+    def _key(self, path):
+        sha1 = self.fingerprint(path)['sha1']
+        path = os.path.normcase(os.path.abspath(path))
+        return hashlib.sha1(f"{path}|{sha1}|{self.version}".encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key, ext):
+        return os.path.join(self.cache_dir, f"{key}{ext}")
+
+    def get(self, path):
+        """Devuelve (df, meta) si el libro está en caché con la versión actual, o None."""
+        if not self.enabled:
+            return None
+        key = self._key(path)
+        meta_path = self._entry_path(key, '.json')
+        if not os.path.exists(meta_path):
+            self.misses += 1
+            return None
+        with open(meta_path, encoding='utf-8') as fh:
+            meta = json.load(fh)
+        fmt = meta.pop('_formato', None)
+        df = load_frame(self._entry_path(key, fmt)) if fmt else None
+        self._used.add(key)
+        self.hits += 1
+        return df, meta
+
+    def put(self, path, df, meta):
+        """Guarda el resultado de un libro. `meta` debe ser serializable a JSON."""
+        if not self.enabled:
+            return
+        key = self._key(path)
+        meta = dict(meta)
+        if df is None:
+            meta['_formato'] = None
+        else:
+            meta['_formato'] = os.path.splitext(save_frame(df, self._entry_path(key, '')))[1]
+        with open(self._entry_path(key, '.json'), 'w', encoding='utf-8') as fh:
+            json.dump(meta, fh, ensure_ascii=False)
+        self._used.add(key)
+
+    def close(self):
+        """
+        Guarda el índice y borra las entradas que no se usaron en esta corrida
+        (libros eliminados, versiones anteriores del código).
+        """
+
+        if not self.enabled:
+            return
+        self._index = {p: e for p, e in self._index.items() if os.path.exists(p)}
+        with open(os.path.join(self.cache_dir, INDEX_FILE), 'w', encoding='utf-8') as fh:
+            json.dump(self._index, fh, ensure_ascii=False, indent=1)
+        for name in os.listdir(self.cache_dir):
+            key, ext = os.path.splitext(name)
+            if ext in ('.json', '.parquet', '.pkl') and name != INDEX_FILE and key not in self._used:
+                os.remove(os.path.join(self.cache_dir, name))
@@ -0,0 +1,50 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+
+class ModalityClassifier:
+    """
+    Modalidad de cada UDS a partir de la abreviatura y el nombre del servicio:
+
+    1. Si la abreviatura está en `abrev_map`, esa modalidad.
+    2. Si no, la primera de `patterns` [(modalidad, [textos])] con algún
+       texto contenido en el servicio (en mayúsculas).
+    3. Si no, la abreviatura tal cual (None si no hay).
+
+        clasificar = ModalityClassifier(AM, [("INSTITUCIONAL", ["INSTITUCIONAL", "CDI"]), ...])
+        df["Modalidad_calc"] = clasificar(df["Abrev"], df["Servicio"]).fillna(df["Tipo_Modalidad"])
+
+    Los servicios se repiten en miles de filas: cada nombre distinto se
+    clasifica una sola vez y el resultado se reparte a sus filas.
+    """
+
+    def __init__(self, abrev_map, patterns):
+        self.abrev_map = dict(abrev_map)
+        self.patterns = [(modalidad, re.compile('|'.join(re.escape(t) for t in textos)))
+                         for modalidad, textos in patterns]
+
+    def classify_service(self, servicio):
+        """Modalidad según el texto del servicio, o None si ningún patrón aparece."""
+        s = str(servicio).upper() if pd.notna(servicio) else ""
+        for modalidad, pattern in self.patterns:
+            if pattern.search(s):
+                return modalidad
+        return None
+
+    def __call__(self, abrev, servicio):
+        abrev = abrev if isinstance(abrev, pd.Series) else pd.Series(abrev)
+        servicio = servicio if isinstance(servicio, pd.Series) else pd.Series(servicio, index=abrev.index)
+
+        # Posición -1 (nulo) -> último elemento de cada tabla
+        codes, uniques = pd.factorize(servicio)
+        por_servicio = np.array([self.classify_service(v) for v in uniques] + [None], dtype=object)[codes]
+
+        codes, uniques = pd.factorize(abrev)
+        propia = np.array(list(uniques) + [None], dtype=object)[codes]
+        mapeada = np.array([self.abrev_map.get(v) for v in uniques] + [None], dtype=object)[codes]
+
+        result = np.where(pd.notna(mapeada), mapeada,
+                          np.where(pd.notna(por_servicio), por_servicio, propia))
+        return pd.Series(result, index=abrev.index, dtype=object)
@@ -0,0 +1,112 @@
+import pandas as pd
+
+
+class NameIndex:
+    """
+    Índice de los encabezados de una plantilla por nombre normalizado, para
+    resolver cada destino con una búsqueda en diccionario. Si dos encabezados
+    normalizan igual gana el último, como `{normalize(c): c for c in cols}`.
+    """
+
+    def __init__(self, columns, normalizer):
+        self.normalizer = normalizer
+        self.columns = list(columns)
+        self._index = {normalizer(c): c for c in self.columns}
+
+    def find(self, name):
+        """Encabezado real de la plantilla para `name`, o None si no está."""
+        return self._index.get(self.normalizer(name))
+
+
+class PrecedenceMerge:
+    """
+    Arma un DataFrame con las columnas de una plantilla a partir de varias
+    fuentes en orden de precedencia: para cada celda gana el primer valor no
+    nulo, de la primera capa a la última (como `combine_first` encadenado).
+
+        motor = PrecedenceMerge(NameIndex(cols_plantilla, normalize), merged.index)
+        motor.layer('CONCAT', {'Regional UDS': merged['Regional_UDS'], ...})
+        motor.layer('UDS', {...})
+        motor.layer('DERIVADO', {...})
+        out, llenado = motor.build(extra=extra_df)
+
+    Los destinos se resuelven por nombre normalizado contra la plantilla; los
+    que no existen en ella quedan en `not_found`. `build` recorre las capas
+    una vez por columna: solo las columnas que llegan de más de una capa se
+    combinan, y en la misma pasada cuenta cuántas celdas aportó cada capa (el
+    reporte de llenado).
+    """
+
+    def __init__(self, index, rows):
+        self.names = index
+        self.rows = rows
+        self.layers = []
+        self.mapped = []
+        self.not_found = []
+
+    def layer(self, name, sources):
+        """
+        Agrega una capa (menor precedencia que las anteriores). `sources` es
+        {nombre destino: valores} con valores alineados a `rows`; si dos
+        entradas de la misma capa caen en la misma columna gana la última.
+        """
+
+        columns = {}
+        for target, values in sources.items():
+            col = self.names.find(target)
+            if col is None:
+                self.not_found.append((name, target))
+                continue
+            values = values.values if isinstance(values, pd.Series) else values
+            columns[col] = pd.Series(values, index=self.rows)
+            self.mapped.append((name, target, col))
+        self.layers.append((name, columns))
+        return self
+
+    def build(self, extra=None):
+        """
+        Devuelve (out, llenado).
+
+        - out: columnas de la plantilla en su orden; las que ninguna capa llena
+          quedan vacías. Las columnas de `extra` se agregan al final (o
+          reemplazan a la de la plantilla con el mismo nombre).
+        - llenado: por columna, celdas llenas y vacías, porcentaje y aporte de
+          cada capa.
+        """
+
+        data = {}
+        aportes = {}
+        for name, columns in self.layers:
+            aportes[name] = counts = {}
+            for col, values in columns.items():
+                present = values.notna()
+                if col not in data:
+                    data[col] = values
+                    counts[col] = int(present.sum())
+                    continue
+                # Solo las celdas vacías hasta ahora que esta capa sí trae
+                fill = data[col].isna() & present
+                counts[col] = int(fill.sum())
+                if counts[col]:
+                    data[col] = data[col].mask(fill, values)
+
+        empty = pd.Series(index=self.rows, dtype=object)
+        out = {c: data.get(c, empty) for c in self.names.columns}
+        if extra is not None and len(extra.columns):
+            aportes['EXTRA'] = {}
+            for c in extra.columns:
+                out[c] = extra[c]
+                aportes['EXTRA'][c] = int(extra[c].notna().sum())
+                # Una columna extra reemplaza a la de la plantilla con el mismo nombre
+                for name, counts in aportes.items():
+                    if name != 'EXTRA':
+                        counts.pop(c, None)
+        out = pd.DataFrame(out, index=self.rows)
+
+        llenado = pd.DataFrame({name: pd.Series(counts, dtype='int64') for name, counts in aportes.items()},
+                               index=out.columns).fillna(0).astype('int64')
+        llenado.insert(0, 'llenas', llenado.sum(axis=1))
+        llenado.insert(1, 'vacias', len(out) - llenado['llenas'])
+        llenado.insert(2, 'pct', llenado['llenas'] / len(out) * 100 if len(out) else 0.0)
+        llenado.index.name = 'columna'
+        return out, llenado
@@ -0,0 +1,245 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from pipeline_common.columnar_store import load_frame, save_frame
+from pipeline_common.source_manifest import source_entry, source_unchanged
+from pipeline_common.uds_codes import canonical_uds_codes, unique_by_code
+
+VERSIONS_FILE = '_versiones.json'
+META_FILE = '_meta.json'
+INDEX_FILE = '_indice.npz'
+KEY = 'k'
+
+
+def snapshot_root(excel_path):
+    """Carpeta de snapshots de un extracto: 'UDS_15052026.xlsx' -> 'UDS_15052026_snapshots/'."""
+    return os.path.splitext(excel_path)[0] + '_snapshots'
+
+
+def _is_plain_numpy(values):
+    # Números, booleanos y fechas sin zona: se guardan como .npy y se abren mapeados en memoria
+    return (isinstance(values.dtype, np.dtype) and values.dtype.kind in 'biufM'
+            and not values.dtype.hasobject)
+
+
+def _write_column(values, base):
+    if _is_plain_numpy(values):
+        np.save(base + '.npy', values.to_numpy())
+        return os.path.basename(base) + '.npy'
+    # Texto o tipos mezclados: Parquet si la columna vuelve idéntica, si no pickle
+    return os.path.basename(save_frame(values.to_frame('v'), base))
+
+
+def _read_column(path):
+    if path.endswith('.npy'):
+        return np.load(path, mmap_mode='r')
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path, memory_map=True)['v']
+    return load_frame(path)['v']
+
+
+def _write_sheet(folder, df, sheet_name, code_column):
+    os.makedirs(folder)
+    codigos = canonical_uds_codes(df[code_column])
+    np.save(os.path.join(folder, KEY + '.npy'), codigos.codes)
+
+    # Índice: códigos válidos ordenados y sin repetir, con la primera fila de cada uno
+    valid = np.flatnonzero(codigos.valid)
+    codes, first = np.unique(codigos.codes[valid], return_index=True)
+    np.savez(os.path.join(folder, INDEX_FILE), codigos=codes, filas=valid[first])
+
+    columnas = []
+    for i, col in enumerate(df.columns):
+        archivo = _write_column(df.iloc[:, i], os.path.join(folder, f'c{i:03d}'))
+        columnas.append({'nombre': col, 'archivo': archivo})
+    meta = {
+        'hoja': sheet_name,
+        'columna_codigo': code_column,
+        'filas': len(df),
+        'codigos_unicos': len(codes),
+        'estados': {k: int(v) for k, v in codigos.counts().items()},
+        'columnas': columnas,
+    }
+    with open(os.path.join(folder, META_FILE), 'w', encoding='utf-8') as fh:
+        json.dump(meta, fh, ensure_ascii=False, indent=1, default=str)
+    return meta
+
+
+class SnapshotSheet:
+    """
+    Hoja de un snapshot: columnas guardadas por separado (se leen solo las
+    pedidas; las numéricas quedan mapeadas en memoria, de solo lectura), la
+    clave canónica `k` de cada fila y el índice de códigos.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        with open(os.path.join(folder, META_FILE), encoding='utf-8') as fh:
+            self.meta = json.load(fh)
+        self._files = {c['nombre']: c['archivo'] for c in self.meta['columnas']}
+        self._index = None
+
+    @property
+    def columns(self):
+        return [c['nombre'] for c in self.meta['columnas']]
+
+    def _load_index(self):
+        if self._index is None:
+            with np.load(os.path.join(self.folder, INDEX_FILE)) as npz:
+                self._index = (npz['codigos'], npz['filas'])
+        return self._index
+
+    @property
+    def codes(self):
+        """Códigos UDS válidos, ordenados y sin repetir."""
+        return self._load_index()[0]
+
+    def positions(self, codes):
+        """Fila de la primera aparición de cada código en la hoja, -1 si no está."""
+        index_codes, rows = self._load_index()
+        codes = np.asarray(codes, dtype=np.int64)
+        if len(index_codes) == 0:
+            return np.full(len(codes), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(index_codes, codes), len(index_codes) - 1)
+        return np.where(index_codes[pos] == codes, rows[pos], -1)
+
+    def load(self, columns=None, unique=False):
+        """
+        DataFrame con `columns` (None = todas, en el orden de la hoja) más la
+        clave `k` al final, como `df[k] = canonical_uds_codes(...).codes`.
+        Con `unique=True` solo la primera fila de cada código válido, igual
+        que `unique_by_code`.
+        """
+
+        columns = self.columns if columns is None else list(columns)
+        missing = [c for c in columns if c not in self._files]
+        if missing:
+            raise KeyError(f"Columnas que no están en el snapshot de '{self.meta['hoja']}': {missing}")
+        data = {c: _read_column(os.path.join(self.folder, self._files[c])) for c in columns}
+        data[KEY] = np.load(os.path.join(self.folder, KEY + '.npy'), mmap_mode='r')
+        df = pd.DataFrame(data, columns=columns + [KEY], copy=False)
+        if unique:
+            df = df.take(np.sort(self._load_index()[1]))
+        return df
+
+
+class ReferenceSnapshot:
+    """Una versión del snapshot de un extracto de referencia (todas sus hojas)."""
+
+    def __init__(self, folder, entry):
+        self.folder = folder
+        self.version = entry['version']
+        self.source = entry['fuente']
+        self.sheet_names = list(entry['hojas'])
+
+    def sheet(self, sheet_name):
+        if sheet_name not in self.sheet_names:
+            raise KeyError(f"La hoja '{sheet_name}' no está en el snapshot {self.version}")
+        return SnapshotSheet(os.path.join(self.folder, _safe_name(sheet_name)))
+
+
+def _safe_name(name):
+    return ''.join('_' if c in '\\/:*?"<>|' else c for c in name)
+
+
+def _read_versions(root):
+    path = os.path.join(root, VERSIONS_FILE)
+    if not os.path.exists(path):
+        return {'versiones': [], 'actual': None}
+    with open(path, encoding='utf-8') as fh:
+        return json.load(fh)
+
+
+def _write_versions(root, versions):
+    with open(os.path.join(root, VERSIONS_FILE), 'w', encoding='utf-8') as fh:
+        json.dump(versions, fh, ensure_ascii=False, indent=1)
+
+
+def ingest_snapshot(excel_path, sheets, force=False):
+    """
+    Convierte un extracto de referencia en un snapshot versionado junto al
+    libro (`<nombre>_snapshots/v001/`, `v002/`...). `sheets` es {hoja:
+    columna de código UDS}. Si el libro no cambió desde la última versión
+    (tamaño/fecha, o SHA-1) y tiene esas hojas, no se crea otra salvo con
+    `force=True`. Devuelve (ReferenceSnapshot, creada).
+    """
+
+    root = snapshot_root(excel_path)
+    os.makedirs(root, exist_ok=True)
+    versions = _read_versions(root)
+    actual = next((v for v in versions['versiones'] if v['version'] == versions['actual']), None)
+    if (not force and actual is not None and source_unchanged(actual['fuente'], excel_path)
+            and all(actual['hojas'].get(h, {}).get('columna_codigo') == c for h, c in sheets.items())):
+        return ReferenceSnapshot(os.path.join(root, actual['version']), actual), False
+
+    version = f"v{len(versions['versiones']) + 1:03d}"
+    folder = os.path.join(root, version)
+    if os.path.isdir(folder):
+        shutil.rmtree(folder)
+    fuente = source_entry(excel_path)
+    hojas = {}
+    with pd.ExcelFile(excel_path) as xls:
+        for sheet_name, code_column in sheets.items():
+            df = pd.read_excel(xls, sheet_name=sheet_name)
+            meta = _write_sheet(os.path.join(folder, _safe_name(sheet_name)), df, sheet_name, code_column)
+            hojas[sheet_name] = {k: meta[k] for k in ('columna_codigo', 'filas', 'codigos_unicos')}
+    entry = {'version': version, 'fuente': fuente, 'hojas': hojas}
+    versions['versiones'].append(entry)
+    versions['actual'] = version
+    versions['libro'] = os.path.basename(excel_path)
+    _write_versions(root, versions)
+    return ReferenceSnapshot(folder, entry), True
+
+
+def open_snapshot(excel_path, version=None):
+    """
+    Snapshot de un extracto: la versión pedida, o la actual si sigue al día
+    con el libro (o el libro ya no está). None si no hay una que sirva.
+    """
+
+    root = snapshot_root(excel_path)
+    versions = _read_versions(root)
+    wanted = version or versions['actual']
+    entry = next((v for v in versions['versiones'] if v['version'] == wanted), None)
+    if entry is None:
+        return None
+    if version is None and os.path.exists(excel_path) and not source_unchanged(entry['fuente'], excel_path):
+        return None
+    return ReferenceSnapshot(os.path.join(root, entry['version']), entry)
+
+
+def read_references(excel_path, specs):
+    """
+    Lee varias hojas de un extracto de referencia, cada una con la clave `k`.
+
+    `specs` es {hoja: {'code_column': ..., 'columns': [...] o None, 'unique': bool}}.
+    Si hay un snapshot al día con el libro se usa (solo las columnas
+    pedidas); si no, se abre el Excel una sola vez para todas las hojas y se
+    calcula la clave igual que al crear el snapshot.
+    """
+
+    snapshot = open_snapshot(excel_path)
+    result = {}
+    pending = {}
+    for sheet_name, spec in specs.items():
+        if snapshot is not None and sheet_name in snapshot.sheet_names:
+            sheet = snapshot.sheet(sheet_name)
+            if sheet.meta['columna_codigo'] == spec['code_column']:
+                result[sheet_name] = sheet.load(spec.get('columns'), unique=spec.get('unique', False))
+                continue
+        pending[sheet_name] = spec
+    if pending:
+        print(f"  Sin snapshot al día de {os.path.basename(excel_path)} para {list(pending)}: se lee el Excel")
+        with pd.ExcelFile(excel_path) as xls:
+            for sheet_name, spec in pending.items():
+                df = pd.read_excel(xls, sheet_name=sheet_name)
+                codes = canonical_uds_codes(df[spec['code_column']]).codes
+                if spec.get('columns') is not None:
+                    df = df[list(spec['columns'])].copy()
+                df[KEY] = codes
+                result[sheet_name] = unique_by_code(df, KEY) if spec.get('unique', False) else df
+    return {s: result[s] for s in specs}
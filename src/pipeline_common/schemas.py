@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+
+# Tipos compactos del registro:
+# - CATEGORIA: textos de baja cardinalidad (regional, municipio, servicio...). Los
+#   valores se guardan una vez y cada fila ocupa 1-2 bytes en lugar de un objeto str.
+# - ENTERO: conteos (cupos, madres, duraciones) como entero con nulos ('Int32'); si la
+#   columna trae decimales se deja como está.
+# - PESOS: valores en pesos como float64, que representa exacto cualquier monto al
+#   centavo hasta ~9e13. Un decimal de punto fijo real necesita pyarrow (opcional)
+#   y haría más lentas las sumas por grupo, así que solo se garantiza que sea numérico.
+CATEGORIA = 'category'
+ENTERO = 'Int32'
+PESOS = 'float64'
+
+_HCB_CATEGORIAS = [
+    'REGIONAL', 'CENTRO ZONAL', 'MUNICIPIO', 'SERVICIO 2026', 'Componente para la UDS',
+    'FORMA CONTRATACION', 'SANCIONATORIOS', 'ALERTA 1000 SMLMV', 'ALERTA 5000 SMLMV',
+    'Archivo_Origen',
+]
+_HCB_ENTEROS = ['VIGENCIA', 'CUPOS', 'Cupos', 'CANTIDAD UDS', 'CANTIDAD DE MADRES POR UDS',
+                'DURACION INICIAL', 'DURACION ADICION']
+_HCB_PESOS = [
+    'VALOR UNITARIO MES', 'VALOR CANASTA 2026', 'VALOR INICIAL 2026', 'APORTE CONTRAPARTIDA',
+    'VALOR ADICIONES A LA FECHA', 'ADICION OTROS CONCEPTOS', 'VALOR REDUCCIONES A LA FECHA',
+    'INEJECUCIONES', 'VALOR ACTUAL', 'VALOR FINAL ADICION SERVICIO', 'VALOR A ADICIONAR',
+    'CONTRAPARTIDA ADICION', 'VALOR ADICION CANASTA (MULTIPLE)', 'VALOR TOTAL ADICION (MULTIPLE)',
+]
+
+
+def _schema(categorias=(), enteros=(), pesos=()):
+    schema = {c: CATEGORIA for c in categorias}
+    schema.update({c: ENTERO for c in enteros})
+    schema.update({c: PESOS for c in pesos})
+    return schema
+
+
+# Registro: {nombre: {columna: tipo}}. Las columnas que no estén en la hoja se ignoran.
+SCHEMAS = {
+    # Filas de los libros HCB ya limpios (01_consolidacion_hcb antes de agrupar)
+    'hcb_filas': _schema(_HCB_CATEGORIAS + ['Regional UDS', 'Centro Zonal UDS', 'Municipio UDS'],
+                         _HCB_ENTEROS, _HCB_PESOS),
+    'hcb_matriz': _schema(_HCB_CATEGORIAS, _HCB_ENTEROS, _HCB_PESOS),
+    'hcb_zonificacion': _schema(['Regional UDS', 'Centro Zonal UDS', 'Municipio UDS', 'SERVICIO 2026',
+                                 'Componente para la UDS', 'Archivo_Origen'],
+                                ['Cupos', 'CANTIDAD DE MADRES POR UDS'], _HCB_PESOS),
+    'integrales_matriz': _schema(_HCB_CATEGORIAS, ['CUPOS', 'Cupos_Zona'], _HCB_PESOS),
+    'integrales_zonificacion': _schema(
+        ['Regional UDS', 'Centro Zonal UDS', 'Municipio UDS', 'Departamento UDS', 'Servicio',
+         'Modalidad', 'Archivo_Origen'],
+        ['Cupos']),
+}
+
+
+def _to_int(values):
+    """Convierte a entero con nulos si todos los valores son enteros; si no, None."""
+    numeric = pd.to_numeric(values, errors='coerce')
+    if (numeric.isna() != values.isna()).any():
+        # Había textos que no son números
+        return None
+    raw = numeric.to_numpy(dtype='float64', na_value=np.nan)
+    finite = raw[~np.isnan(raw)]
+    if len(finite) and (np.any(finite != np.round(finite)) or np.abs(finite).max() > np.iinfo('int32').max):
+        return None
+    return numeric.astype(ENTERO)
+
+
+def apply_schema(df, schema, only=None, report=False):
+    """
+    Asigna los tipos del registro (`schema` es un nombre de SCHEMAS o un dict
+    {columna: tipo}) y devuelve un DataFrame nuevo. `only` limita los tipos
+    que se aplican (p. ej. only=(CATEGORIA,) antes de exportar, para no cambiar
+    los tipos numéricos). Con `report=True` imprime la memoria antes y después.
+    """
+
+    if isinstance(schema, str):
+        schema = SCHEMAS[schema]
+    before = memory_mb(df) if report else None
+    out = df.copy(deep=False)
+    sin_cambio = []
+    for col, kind in schema.items():
+        if col not in out.columns or (only is not None and kind not in only):
+            continue
+        values = out[col]
+        if kind == CATEGORIA:
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                # Texto mixto (números y textos) queda tal cual para no mezclar categorías
+                if pd.api.types.infer_dtype(values, skipna=True) in ('string', 'empty', 'categorical'):
+                    out[col] = values.astype(CATEGORIA)
+                else:
+                    sin_cambio.append(col)
+        elif kind == ENTERO:
+            converted = _to_int(values)
+            if converted is None:
+                sin_cambio.append(col)
+            else:
+                out[col] = converted
+        elif kind == PESOS:
+            if not pd.api.types.is_float_dtype(values):
+                converted = pd.to_numeric(values, errors='coerce')
+                if (converted.isna() != values.isna()).any():
+                    sin_cambio.append(col)
+                else:
+                    out[col] = converted.astype(PESOS)
+    if report:
+        after = memory_mb(out)
+        ahorro = (1 - after / before) * 100 if before else 0.0
+        print(f"  Memoria: {before:.1f} MB -> {after:.1f} MB ({ahorro:.0f}% menos)")
+        if sin_cambio:
+            print(f"  Sin convertir (valores no compatibles): {sin_cambio}")
+    return out
+
+
+def memory_mb(df):
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
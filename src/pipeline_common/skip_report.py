@@ -0,0 +1,46 @@
+import os
+
+import pandas as pd
+
+
+class SkipReport:
+    """
+    Registro de los libros que un paso no pudo usar (error de lectura, sin hoja
+    esperada, sin columna clave...), en lugar de descartarlos en silencio.
+
+        omitidos = SkipReport()
+        omitidos.add(ruta, 'error_lectura', str(e))
+        omitidos.print_summary()
+        omitidos.save(ruta_csv)
+    """
+
+    COLUMNS = ['archivo', 'ruta', 'motivo', 'detalle']
+
+    def __init__(self):
+        self.items = []
+
+    def add(self, path, reason, detail=''):
+        self.items.append({'archivo': os.path.basename(path), 'ruta': path,
+                           'motivo': reason, 'detalle': detail})
+
+    def __len__(self):
+        return len(self.items)
+
+    def to_frame(self):
+        return pd.DataFrame(self.items, columns=self.COLUMNS)
+
+    def print_summary(self, title='Archivos omitidos'):
+        if not self.items:
+            return
+        print(f"\n{title} ({len(self.items)}):")
+        for item in self.items:
+            detail = f": {item['detalle']}" if item['detalle'] else ''
+            print(f"  [{item['motivo'].upper()}] {item['archivo']}{detail}")
+
+    def save(self, path):
+        """CSV (utf-8 con BOM para abrirlo en Excel). Si no hay omitidos, borra el reporte anterior."""
+        if not self.items:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        self.to_frame().to_csv(path, index=False, encoding='utf-8-sig')
@@ -0,0 +1,168 @@
+import datetime
+import numbers
+
+import numpy as np
+import pandas as pd
+
+from pipeline_common.uds_codes import canonical_uds_codes
+
+# Tipo de cambio de cada UDS entre dos snapshots
+AGREGADO = 'agregado'
+ELIMINADO = 'eliminado'
+MODIFICADO = 'modificado'
+CHANGE_COLUMNS = ['codigo', 'columna', 'antes', 'despues', 'etapa', 'cambio']
+
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _normalize_value(value):
+    """
+    Forma canónica de una celda para comparar: vacíos -> '', números sin
+    ceros de más (5 == 5.0 == '5'), textos sin espacios en los extremos.
+    """
+
+    if value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NaT:
+        return ''
+    if isinstance(value, (bool, np.bool_)):
+        return str(bool(value))
+    if isinstance(value, numbers.Integral):
+        return str(int(value))
+    if isinstance(value, numbers.Real):
+        value = float(value)
+        return str(int(value)) if value.is_integer() else repr(value)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return pd.Timestamp(value).isoformat()
+    text = str(value).strip()
+    try:
+        number = float(text)
+    except ValueError:
+        return text
+    if not np.isfinite(number):
+        return text
+    return str(int(number)) if number.is_integer() else repr(number)
+
+
+class _NormalizedColumn:
+    """Columna normalizada: código de cada fila y texto canónico de cada valor distinto (una vez por valor)."""
+
+    def __init__(self, values):
+        codes, uniques = pd.factorize(values)
+        text = np.array([_normalize_value(v) for v in uniques] + [''], dtype=object)
+        self.codes = np.where(codes < 0, len(text) - 1, codes)
+        self.text = text
+        self.hashes = pd.util.hash_array(text, categorize=False)
+
+    def row_text(self, rows):
+        return self.text[self.codes[rows]]
+
+    def row_hashes(self):
+        return self.hashes[self.codes]
+
+
+def _row_hashes(columns, n_rows):
+    """Hash de las celdas normalizadas de cada fila: misma fila, mismo hash."""
+    h = np.zeros(n_rows, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for col in columns:
+            h = (h * _MIX) ^ col.row_hashes()
+    return h
+
+
+def _pair_rows(before_codes, after_codes):
+    """
+    Empareja filas por código UDS; si un código se repite, la n-ésima fila
+    de antes con la n-ésima de después. Devuelve (fila_antes, fila_despues),
+    con -1 donde el código no está de un lado.
+    """
+
+    def keyed(codes):
+        valid = codes.valid
+        rows = np.flatnonzero(valid)
+        frame = pd.DataFrame({'k': codes.codes[valid], 'fila': rows})
+        frame['n'] = frame.groupby('k').cumcount()
+        return frame
+
+    pairs = pd.merge(keyed(before_codes), keyed(after_codes), on=['k', 'n'], how='outer',
+                     suffixes=('_antes', '_despues'), sort=False)
+    return (pairs['fila_antes'].fillna(-1).to_numpy(dtype=np.int64),
+            pairs['fila_despues'].fillna(-1).to_numpy(dtype=np.int64),
+            pairs['k'].to_numpy(dtype=np.int64))
+
+
+def diff_snapshots(before, after, key='Codigo Unidad Servicio UDS', stage='', columns=None):
+    """
+    Cambios campo a campo entre dos snapshots de ZonificacionPais, por
+    código UDS, en formato largo (CHANGE_COLUMNS): una fila por celda
+    distinta, con el valor de antes y el de después, la etapa y si la UDS
+    fue agregada, eliminada o modificada.
+
+    Las celdas se comparan normalizadas (vacíos, 5 vs 5.0, espacios), y las
+    filas cuyo hash no cambió se descartan sin mirar columna por columna.
+    Se comparan `columns` (por defecto todas las de ambos lados; una columna
+    que falta de un lado cuenta como vacía). Las filas sin código UDS válido
+    no se pueden emparejar y quedan fuera.
+    """
+
+    if columns is None:
+        columns = list(before.columns) + [c for c in after.columns if c not in before.columns]
+    columns = list(columns)
+
+    b_codes = canonical_uds_codes(before[key])
+    a_codes = canonical_uds_codes(after[key])
+    fila_b, fila_a, k = _pair_rows(b_codes, a_codes)
+
+    def normalized(df):
+        empty = pd.Series(None, index=df.index, dtype=object)
+        return [_NormalizedColumn(df[c] if c in df.columns else empty) for c in columns]
+
+    norm_b = normalized(before)
+    norm_a = normalized(after)
+
+    # Filas que siguen iguales: mismo hash de punta a punta
+    both = (fila_b >= 0) & (fila_a >= 0)
+    hash_b = _row_hashes(norm_b, len(before))
+    hash_a = _row_hashes(norm_a, len(after))
+    changed = both.copy()
+    changed[both] = hash_b[fila_b[both]] != hash_a[fila_a[both]]
+
+    parts = []
+    for cambio, sel in [(MODIFICADO, changed), (AGREGADO, fila_b < 0), (ELIMINADO, fila_a < 0)]:
+        if not sel.any():
+            continue
+        rows_b, rows_a, codes = fila_b[sel], fila_a[sel], k[sel]
+        for i, col in enumerate(columns):
+            text_b = norm_b[i].row_text(rows_b) if cambio != AGREGADO else np.full(len(codes), '', dtype=object)
+            text_a = norm_a[i].row_text(rows_a) if cambio != ELIMINADO else np.full(len(codes), '', dtype=object)
+            diff = text_b != text_a
+            if not diff.any():
+                continue
+            parts.append(pd.DataFrame({
+                'codigo': codes[diff].astype(str),
+                'columna': col,
+                'antes': _original(before, col, rows_b[diff]) if cambio != AGREGADO else None,
+                'despues': _original(after, col, rows_a[diff]) if cambio != ELIMINADO else None,
+                'etapa': stage,
+                'cambio': cambio,
+                '_k': codes[diff],
+                '_orden': i,
+            }))
+    if not parts:
+        return pd.DataFrame(columns=CHANGE_COLUMNS)
+    changes = pd.concat(parts, ignore_index=True)
+    changes = changes.sort_values(['_k', '_orden'], kind='stable')
+    return changes.reset_index(drop=True)[CHANGE_COLUMNS]
+
+
+def _original(df, col, rows):
+    if col not in df.columns:
+        return np.full(len(rows), None, dtype=object)
+    return df[col].iloc[rows].to_numpy(dtype=object)
+
+
+def summarize_changes(changes):
+    """UDS y celdas por etapa y tipo de cambio, para el log."""
+    if changes.empty:
+        return pd.DataFrame(columns=['etapa', 'cambio', 'uds', 'celdas'])
+    return (changes.groupby(['etapa', 'cambio'], sort=False)
+            .agg(uds=('codigo', 'nunique'), celdas=('columna', 'size'))
+            .reset_index())
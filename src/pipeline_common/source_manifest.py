@@ -0,0 +1,70 @@
+import json
+import os
+
+from pipeline_common.columnar_store import dataset_dir
+from pipeline_common.file_cache import file_sha1
+
+SOURCES_FILE = '_fuentes.json'
+
+
+def source_key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def source_entry(path, fingerprint=None, hash_content=True, **info):
+    """
+    Registro de un libro fuente: ruta, huella ({'size', 'mtime_ns', 'sha1'};
+    se calcula si no viene de la caché) y datos libres como la hoja leída o
+    las regionales que contiene. Con `hash_content=False` no se lee el libro
+    para el SHA-1 (queda en None): si cambia la fecha cuenta como modificado.
+    """
+
+    if fingerprint is None:
+        st = os.stat(path)
+        fingerprint = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                       'sha1': file_sha1(path) if hash_content else None}
+    return dict(info, ruta=os.path.abspath(path), **fingerprint)
+
+
+def source_unchanged(entry, path):
+    """
+    True si el libro sigue siendo el registrado en `entry`. Tamaño y fecha
+    iguales bastan; si solo cambió la fecha se compara el SHA-1 (y se
+    actualiza la fecha en `entry`). Sin SHA-1 registrado, cambió.
+    """
+
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    if st.st_size != entry.get('size'):
+        return False
+    if st.st_mtime_ns == entry.get('mtime_ns'):
+        return True
+    if entry.get('sha1') is None or file_sha1(path) != entry['sha1']:
+        return False
+    entry['mtime_ns'] = st.st_mtime_ns
+    return True
+
+
+def write_sources(excel_path, entries):
+    """
+    Guarda en la carpeta de datos del libro (`<nombre>_datos/`) la lista de
+    libros fuente que se revisaron para producirlo.
+    """
+
+    folder = dataset_dir(excel_path)
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, SOURCES_FILE), 'w', encoding='utf-8') as fh:
+        json.dump({'libro': os.path.basename(excel_path), 'fuentes': list(entries)},
+                  fh, ensure_ascii=False, indent=1)
+
+
+def read_sources(excel_path):
+    """{ruta normalizada: registro} de los libros fuente de un consolidado ({} si no hay manifiesto)."""
+    path = os.path.join(dataset_dir(excel_path), SOURCES_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as fh:
+        entries = json.load(fh)['fuentes']
+    return {source_key(e['ruta']): e for e in entries}
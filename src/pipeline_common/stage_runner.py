@@ -0,0 +1,161 @@
+import os
+import time
+
+import pandas as pd
+
+from pipeline_common.columnar_store import find_frame, load_frame, save_frame
+
+
+class Stage:
+    """
+    Etapa de un pipeline: `func(**entradas)` recibe los DataFrames de `inputs`
+    por nombre y devuelve {salida: df} con los de `outputs` (o directamente
+    el DataFrame si tiene una sola salida).
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=()):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+
+    def call(self, frames):
+        result = self.func(**{name: frames[name] for name in self.inputs})
+        if isinstance(result, pd.DataFrame) and len(self.outputs) == 1:
+            result = {self.outputs[0]: result}
+        if not isinstance(result, dict) or set(result) != set(self.outputs):
+            raise ValueError(f"La etapa '{self.name}' debe devolver {self.outputs}")
+        return result
+
+
+class StageRunner:
+    """
+    Ejecuta etapas que se pasan DataFrames en memoria, en orden de
+    dependencias (cada entrada la produce la etapa que la tiene en `outputs`).
+
+        runner = StageRunner(checkpoint_dir=carpeta)
+        runner.add('concat', armar_concat, outputs=['concat'])
+        runner.add('update', actualizar, inputs=['original', 'concat'], outputs=['zonificacion'])
+        frames = runner.run()
+        runner.print_report()
+
+    Con `checkpoint_dir` cada salida se guarda en formato columnar
+    (`save_frame`) al terminar su etapa, y `run(desde='update')` vuelve a
+    ejecutar solo esa etapa y las que dependen de ella: las anteriores se
+    cargan de sus checkpoints.
+    """
+
+    def __init__(self, checkpoint_dir=None):
+        self.checkpoint_dir = checkpoint_dir
+        self.stages = []
+        self.report = None
+        self._producer = {}
+
+    def add(self, name, func, inputs=(), outputs=()):
+        if any(s.name == name for s in self.stages):
+            raise ValueError(f"Etapa repetida: {name}")
+        stage = Stage(name, func, inputs, outputs)
+        for out in stage.outputs:
+            if out in self._producer:
+                raise ValueError(f"'{out}' ya lo produce la etapa '{self._producer[out].name}'")
+            self._producer[out] = stage
+        self.stages.append(stage)
+        return stage
+
+    def order(self):
+        """Etapas en orden de ejecución (el de `add` cuando no hay dependencias entre ellas)."""
+        for stage in self.stages:
+            missing = [i for i in stage.inputs if i not in self._producer]
+            if missing:
+                raise ValueError(f"La etapa '{stage.name}' usa {missing}, que ninguna etapa produce")
+        done = set()
+        ordered = []
+        pending = list(self.stages)
+        while pending:
+            ready = [s for s in pending if all(self._producer[i].name in done for i in s.inputs)]
+            if not ready:
+                raise ValueError(f"Dependencias circulares entre {[s.name for s in pending]}")
+            for stage in ready:
+                ordered.append(stage)
+                done.add(stage.name)
+                pending.remove(stage)
+        return ordered
+
+    def _downstream(self, name):
+        """`name` y todas las etapas que dependen de ella."""
+        ordered = self.order()
+        affected = {name}
+        for stage in ordered:
+            if any(self._producer[i].name in affected for i in stage.inputs):
+                affected.add(stage.name)
+        return affected
+
+    def _checkpoint_base(self, output):
+        return os.path.join(self.checkpoint_dir, output)
+
+    def run(self, desde=None):
+        """
+        Ejecuta el pipeline y devuelve {nombre: df} con todas las salidas. El
+        reporte por etapa (segundos, filas de entrada y salida) queda en
+        `self.report`.
+        """
+
+        ordered = self.order()
+        if desde is not None:
+            if desde not in {s.name for s in self.stages}:
+                raise ValueError(f"Etapa desconocida: {desde}")
+            if self.checkpoint_dir is None:
+                raise ValueError("Para retomar desde una etapa hace falta checkpoint_dir")
+            rerun = self._downstream(desde)
+        else:
+            rerun = {s.name for s in ordered}
+        # Lo que se carga de checkpoints: solo lo que usan las etapas que se ejecutan
+        needed = {i for s in ordered if s.name in rerun for i in s.inputs}
+        if self.checkpoint_dir is not None:
+            os.makedirs(self.checkpoint_dir, exist_ok=True)
+
+        frames = {}
+        filas = []
+        for stage in ordered:
+            t0 = time.perf_counter()
+            if stage.name in rerun:
+                result = stage.call(frames)
+                origen = 'ejecutada'
+            else:
+                result = {}
+                for out in stage.outputs:
+                    if out not in needed:
+                        continue
+                    path = find_frame(self._checkpoint_base(out))
+                    if path is None:
+                        raise ValueError(f"Falta el checkpoint de '{out}' (etapa '{stage.name}')")
+                    result[out] = load_frame(path)
+                origen = 'checkpoint'
+            segundos = time.perf_counter() - t0
+            frames.update(result)
+
+            t0 = time.perf_counter()
+            if self.checkpoint_dir is not None and origen == 'ejecutada':
+                for out, df in result.items():
+                    save_frame(df, self._checkpoint_base(out))
+            guardado = time.perf_counter() - t0
+
+            filas.append({
+                'etapa': stage.name,
+                'origen': origen,
+                'segundos': segundos,
+                'checkpoint_s': guardado,
+                'filas_entrada': sum(len(frames[i]) for i in stage.inputs if i in frames),
+                'filas_salida': sum(len(df) for df in result.values()),
+                'salidas': ', '.join(f"{out}={len(df)}x{len(df.columns)}" for out, df in result.items()),
+            })
+        self.report = pd.DataFrame(filas, columns=['etapa', 'origen', 'segundos', 'checkpoint_s',
+                                                   'filas_entrada', 'filas_salida', 'salidas'])
+        return frames
+
+    def print_report(self):
+        print(f"\n--- ETAPAS ({self.report['segundos'].sum() + self.report['checkpoint_s'].sum():.2f}s) ---")
+        for r in self.report.itertuples(index=False):
+            guardado = f" + {r.checkpoint_s:.2f}s checkpoint" if r.origen == 'ejecutada' and self.checkpoint_dir else ''
+            print(f"  [{r.origen}] {r.etapa}: {r.segundos:.2f}s{guardado} | "
+                  f"entrada {r.filas_entrada} filas -> {r.salidas or '-'}")
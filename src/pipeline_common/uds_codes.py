@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+# Clave de las filas sin código UDS válido. Las tablas de búsqueda se filtran
+# con `unique_by_code`, así que estas filas nunca cruzan con nada.
+SIN_CODIGO = -1
+
+# Estado de cada código (canal aparte de la clave entera)
+VALIDO = 'valido'
+NO_APLICA = 'no_aplica'
+VACIO = 'vacio'
+INVALIDO = 'invalido'
+ESTADOS = [VALIDO, NO_APLICA, VACIO, INVALIDO]
+
+# Un int64 alcanza para 18 dígitos; los códigos UDS tienen 10-12
+_MAX_DIGITOS = 18
+_TEXTOS_VACIOS = {'', 'NAN', 'NONE', 'NAT'}
+
+
+class UdsCodes:
+    """
+    Códigos UDS canónicos de una columna: `codes` (int64, SIN_CODIGO donde no
+    hay código válido) y `estado` (VALIDO, NO_APLICA, VACIO o INVALIDO).
+    """
+
+    def __init__(self, codes, estado):
+        self.codes = codes
+        self.estado = estado
+
+    @property
+    def valid(self):
+        return self.codes != SIN_CODIGO
+
+    def counts(self):
+        """{estado: filas}, para el log."""
+        return pd.Series(self.estado).value_counts().reindex(ESTADOS, fill_value=0).to_dict()
+
+    def text(self):
+        """Código como texto ('1234567890'); None donde no hay código válido."""
+        return np.where(self.valid, self.codes.astype(str), None).astype(object)
+
+
+def _from_float(raw):
+    codes = np.full(len(raw), SIN_CODIGO, dtype=np.int64)
+    estado = np.full(len(raw), ESTADOS.index(INVALIDO), dtype=np.int8)
+    vacio = np.isnan(raw)
+    with np.errstate(invalid='ignore'):
+        ok = ~vacio & (raw >= 0) & (raw < 10 ** _MAX_DIGITOS) & (raw == np.floor(raw))
+    codes[ok] = raw[ok].astype(np.int64)
+    estado[ok] = ESTADOS.index(VALIDO)
+    estado[vacio] = ESTADOS.index(VACIO)
+    return codes, estado
+
+
+def _from_objects(values):
+    # Cada código se repite en varias filas: se interpreta una vez por valor distinto
+    positions, uniques = pd.factorize(values)
+    text = pd.Series(uniques, dtype=object).astype(str).str.strip()
+    # 1234567890.0 (número leído como float) -> 1234567890
+    text = text.str.replace(r'\.0+$', '', regex=True)
+    upper = text.str.upper()
+    digits = text.str.fullmatch(rf'\d{{1,{_MAX_DIGITOS}}}').to_numpy(dtype=bool)
+
+    codes_u = np.full(len(text), SIN_CODIGO, dtype=np.int64)
+    codes_u[digits] = text[digits].astype(np.int64).to_numpy()
+    estado_u = np.full(len(text), ESTADOS.index(INVALIDO), dtype=np.int8)
+    estado_u[digits] = ESTADOS.index(VALIDO)
+    estado_u[upper.str.replace(' ', '', regex=False).eq('NOAPLICA').to_numpy()] = ESTADOS.index(NO_APLICA)
+    estado_u[upper.isin(_TEXTOS_VACIOS).to_numpy()] = ESTADOS.index(VACIO)
+
+    # Posición -1 = nulo
+    codes = np.append(codes_u, SIN_CODIGO)[positions]
+    estado = np.append(estado_u, ESTADOS.index(VACIO))[positions]
+    return codes, estado
+
+
+def canonical_uds_codes(values):
+    """
+    Interpreta una columna de códigos UDS tal como llega de Excel (enteros,
+    floats como 1234567890.0, textos con espacios o '.0', 'No aplica',
+    vacíos) y devuelve un `UdsCodes` con la clave int64 y el estado de cada
+    fila. Los cruces se hacen sobre la clave entera: mismo código, misma
+    clave, sin importar cómo lo guardó cada libro.
+    """
+
+    values = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_integer_dtype(values) and not pd.api.types.is_extension_array_dtype(values):
+        codes = values.to_numpy(dtype=np.int64)
+        estado = np.where(codes >= 0, ESTADOS.index(VALIDO), ESTADOS.index(INVALIDO)).astype(np.int8)
+        codes = np.where(codes >= 0, codes, SIN_CODIGO)
+    elif pd.api.types.is_float_dtype(values) and not pd.api.types.is_extension_array_dtype(values):
+        codes, estado = _from_float(values.to_numpy(dtype=np.float64))
+    else:
+        codes, estado = _from_objects(values.astype(object))
+    return UdsCodes(codes, pd.Categorical.from_codes(estado, ESTADOS))
+
+
+def unique_by_code(df, key='k'):
+    """
+    Tabla de búsqueda por código: solo filas con código válido y la primera
+    de cada código (como `drop_duplicates(subset=key, keep='first')`).
+    """
+
+    return df[df[key].to_numpy() != SIN_CODIGO].drop_duplicates(subset=key, keep='first')
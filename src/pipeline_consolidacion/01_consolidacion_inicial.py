@@ -1,16 +1,23 @@
 import os
+import sys
+import argparse
 import pandas as pd
 import warnings
 import re
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from pipeline_common.columnar_store import (DatasetAppender, write_column_index, write_dataset,
+                                            write_index_values, write_manifest)
+from pipeline_common.excel_writer import StreamingExcelWriter, write_excel
+from pipeline_common.file_cache import FileCache, code_version
+from pipeline_common.schemas import CATEGORIA, apply_schema
+
 warnings.filterwarnings('ignore', category=UserWarning, module='openpyxl')
 
 # Configuración de rutas
 base_dir = 'd:/ICBF/cost-tracking/data/insumos 28 abril'
 output_file = 'd:/ICBF/cost-tracking/data/insumos 28 abril/consolidacion_matriz_integrales_28042026.xlsx'
-
-all_dfs = []
-regionales_encontradas = set()
+HOJA_ZONIFICACION = 'ZONIFICACIÓN- PEDAGOGICO'
 
 # Lista de todas las regionales del ICBF esperadas (33 regionales)
 regionales_icbf = {
@@ -32,75 +39,135 @@ def clean_regional_name(name):
     name = re.sub(r'[Ú]', 'U', name)
     return name
 
-print(f"Buscando archivos en: {base_dir}")
-
-for root, dirs, files in os.walk(base_dir):
-    for f in files:
-        f_lower = f.lower()
-        # Filtros: que sea excel, que NO sea el consolidado, que NO sea HCB y que NO sea integralidad
-        if (f.endswith(('.xlsx', '.xls', '.xlsm')) and 
-            not f.startswith('~$') and 
-            'consolidacion' not in f_lower and
-            'hcb' not in f_lower and 
-            'integralidad' not in f_lower):
+def procesar_archivo(path):
+    """Lee la hoja de zonificación de un libro regional. Devuelve (df, regionales) o (None, [])."""
+    xls = pd.ExcelFile(path)
+    sheet_match = [s for s in xls.sheet_names if 'ZONIFICAC' in s.upper()]
+    if sheet_match:
+        sheet_name = sheet_match[0]
+        # Buscar la fila de encabezados
+        df_temp = pd.read_excel(xls, sheet_name=sheet_name, nrows=15, header=None)
+        
+        header_idx = None
+        for idx, row in df_temp.iterrows():
+            if any(isinstance(val, str) and 'Regional UDS' in val for val in row.values):
+                header_idx = idx
+                break
+        
+        if header_idx is not None:
+            df = pd.read_excel(xls, sheet_name=sheet_name, header=header_idx)
+            
+            col_regional = [c for c in df.columns if 'Regional UDS' in str(c)][0]
+            df = df.dropna(subset=[col_regional])
+            
+            # Fix datetime timezone issues to avoid Excel corruption
+            for col in df.columns:
+                if pd.api.types.is_datetime64_any_dtype(df[col]):
+                    df[col] = df[col].dt.tz_localize(None).astype(str)
+            
+            df[col_regional] = df[col_regional].astype(str).str.strip()
+            regs = df[col_regional].unique()
             
-            path = os.path.join(root, f)
-            try:
-                xls = pd.ExcelFile(path)
-                sheet_match = [s for s in xls.sheet_names if 'ZONIFICAC' in s.upper()]
-                if sheet_match:
-                    sheet_name = sheet_match[0]
-                    # Buscar la fila de encabezados
-                    df_temp = pd.read_excel(xls, sheet_name=sheet_name, nrows=15, header=None)
-                    
-                    header_idx = None
-                    for idx, row in df_temp.iterrows():
-                        if any(isinstance(val, str) and 'Regional UDS' in val for val in row.values):
-                            header_idx = idx
-                            break
-                    
-                    if header_idx is not None:
-                        df = pd.read_excel(xls, sheet_name=sheet_name, header=header_idx)
-                        
-                        col_regional = [c for c in df.columns if 'Regional UDS' in str(c)][0]
-                        df = df.dropna(subset=[col_regional])
-                        
-                        # Fix datetime timezone issues to avoid Excel corruption
-                        for col in df.columns:
-                            if pd.api.types.is_datetime64_any_dtype(df[col]):
-                                df[col] = df[col].dt.tz_localize(None).astype(str)
-                        
-                        df[col_regional] = df[col_regional].astype(str).str.strip()
-                        regs = df[col_regional].unique()
+            # Normalize columns
+            df = df.rename(columns={col_regional: 'Regional UDS'})
+            df['Archivo_Origen'] = os.path.basename(path)
+            return df, list(regs)
+    return None, []
+
+def main():
+    parser = argparse.ArgumentParser(description="Consolidación inicial de zonificación (integrales).")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="No usar ni actualizar la caché de libros ya procesados.")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="Borrar la caché y volver a procesar todos los libros.")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Escribir cada libro al dataset en disco en lugar de juntarlos en memoria; "
+                             "el Excel se exporta desde ese dataset.")
+    args = parser.parse_args()
+
+    all_dfs = []
+    regionales_encontradas = set()
+    # Valores tal como vienen en 'Regional UDS', para el índice del paso 02
+    regionales_crudas = set()
+    appender = None
+    if args.streaming:
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        appender = DatasetAppender(output_file, HOJA_ZONIFICACION)
+    cache = FileCache(os.path.join(os.path.dirname(output_file), '.cache_integrales'), code_version(__file__),
+                      enabled=not args.no_cache, rebuild=args.rebuild)
+
+    print(f"Buscando archivos en: {base_dir}")
+
+    for root, dirs, files in os.walk(base_dir):
+        for f in files:
+            f_lower = f.lower()
+            # Filtros: que sea excel, que NO sea el consolidado, que NO sea HCB y que NO sea integralidad
+            if (f.endswith(('.xlsx', '.xls', '.xlsm')) and 
+                not f.startswith('~$') and 
+                'consolidacion' not in f_lower and
+                'hcb' not in f_lower and 
+                'integralidad' not in f_lower):
+                
+                path = os.path.join(root, f)
+                try:
+                    hit = cache.get(path)
+                    if hit is not None:
+                        df, meta = hit
+                        regs = meta['regionales']
+                    else:
+                        df, regs = procesar_archivo(path)
+                        cache.put(path, df, {'regionales': regs})
+                    if df is not None:
                         for r in regs:
                             regionales_encontradas.add(clean_regional_name(r))
-                        
-                        # Normalize columns
-                        df = df.rename(columns={col_regional: 'Regional UDS'})
-                        df['Archivo_Origen'] = f
-                        all_dfs.append(df)
-                        print(f"  [OK] {f} - Regionales: {regs}")
-            except Exception as e:
-                print(f"  [ERROR] {f}: {e}")
+                        regionales_crudas.update(regs)
+                        if appender is not None:
+                            appender.append(apply_schema(df, 'integrales_zonificacion', only=(CATEGORIA,)))
+                        else:
+                            all_dfs.append(df)
+                        print(f"  [OK] {f} - Regionales: {regs}{' (caché)' if hit is not None else ''}")
+                except Exception as e:
+                    print(f"  [ERROR] {f}: {e}")
+    cache.close()
+    print(f"Caché: {cache.hits} libros reutilizados, {cache.misses} leídos")
+
+    # Escribir el consolidado
+    if appender is not None and appender.parts:
+        appender.close()
+        # El Excel se arma parte por parte desde el dataset, con las columnas ya unificadas
+        with StreamingExcelWriter(output_file) as writer:
+            writer.write_sheet_chunks(HOJA_ZONIFICACION, appender.columns, appender.iter_frames())
+        write_manifest(output_file, [HOJA_ZONIFICACION])
+        write_index_values(output_file, HOJA_ZONIFICACION, {'Regional UDS': regionales_crudas})
+        print(f"  {appender.rows} filas en {len(appender.parts)} partes, {len(appender.columns)} columnas")
+        print("\n¡ARCHIVO CREADO CON ÉXITO!:", output_file)
+    elif all_dfs:
+        df_final = pd.concat(all_dfs, ignore_index=True)
+        # Regional, municipio, archivo... como categorías (el Excel no cambia; el dataset pesa menos)
+        df_final = apply_schema(df_final, 'integrales_zonificacion', only=(CATEGORIA,), report=True)
+        # Crear carpeta si no existe
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        hojas = {HOJA_ZONIFICACION: df_final}
+        write_excel(output_file, hojas)
+        # Copia columnar para las etapas 02/03 (el Excel queda como entregable)
+        write_dataset(output_file, hojas)
+        # Índice de regionales para que el paso 02 no tenga que releer la zonificación
+        write_column_index(output_file, HOJA_ZONIFICACION, df_final, ['Regional UDS'])
+        print("\n¡ARCHIVO CREADO CON ÉXITO!:", output_file)
+    else:
+        print("\nNO SE ENCONTRARON DATOS PARA CONSOLIDAR.")
 
-# Escribir el consolidado
-if all_dfs:
-    df_final = pd.concat(all_dfs, ignore_index=True)
-    # Crear carpeta si no existe
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
-    df_final.to_excel(output_file, sheet_name='ZONIFICACIÓN- PEDAGOGICO', index=False)
-    print("\n¡ARCHIVO CREADO CON ÉXITO!:", output_file)
-else:
-    print("\nNO SE ENCONTRARON DATOS PARA CONSOLIDAR.")
+    print("\n--- RESUMEN ---")
+    print(f"Regionales encontradas: {len(regionales_encontradas)}")
+    missing = regionales_icbf - {r.replace('BOGOTA D.C.', 'BOGOTA') for r in regionales_encontradas}
+    if 'BOGOTA' in regionales_encontradas or 'BOGOTA D.C.' in regionales_encontradas:
+        missing.discard('BOGOTA D.C.')
+        missing.discard('BOGOTA')
 
-print("\n--- RESUMEN ---")
-print(f"Regionales encontradas: {len(regionales_encontradas)}")
-missing = regionales_icbf - {r.replace('BOGOTA D.C.', 'BOGOTA') for r in regionales_encontradas}
-if 'BOGOTA' in regionales_encontradas or 'BOGOTA D.C.' in regionales_encontradas:
-    missing.discard('BOGOTA D.C.')
-    missing.discard('BOGOTA')
+    if missing:
+        print(f"Regionales FALTANTES ({len(missing)}): {sorted(list(missing))}")
+    else:
+        print("¡Todas las regionales están presentes!")
 
-if missing:
-    print(f"Regionales FALTANTES ({len(missing)}): {sorted(list(missing))}")
-else:
-    print("¡Todas las regionales están presentes!")
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,13 @@ import shutil
 import pandas as pd
 import warnings
 import re
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from pipeline_common.columnar_store import (copy_dataset, read_column_index, read_sheets,
+                                            write_column_index, write_dataset)
+from pipeline_common.excel_reader import WorkbookSession, header_contains
+from pipeline_common.excel_writer import write_excel
 
 warnings.filterwarnings('ignore', category=UserWarning, module='openpyxl')
 
@@ -17,20 +24,26 @@ if not os.path.exists(original_file):
 
 # 1. Hacer una copia literal y leer el archivo original
 shutil.copy(original_file, output_file)
+dataset_copiado = copy_dataset(original_file, output_file)
 print(f"Refinando archivo: {output_file}")
 
-xls_orig = pd.ExcelFile(original_file)
-df_matriz_orig = pd.read_excel(xls_orig, sheet_name='MATRIZ_CALCULADA') if 'MATRIZ_CALCULADA' in xls_orig.sheet_names else pd.DataFrame()
-df_zoni_orig = pd.read_excel(xls_orig, sheet_name='ZONIFICACIÓN- PEDAGOGICO') if 'ZONIFICACIÓN- PEDAGOGICO' in xls_orig.sheet_names else pd.DataFrame()
+HOJAS_ORIG = ['MATRIZ_CALCULADA', 'ZONIFICACIÓN- PEDAGOGICO', 'Hoja3']
 
-try:
-    df_hoja3_orig = pd.read_excel(xls_orig, sheet_name='Hoja3')
-except:
-    df_hoja3_orig = None
+def leer_hojas_originales():
+    # Usa el dataset columnar del paso 01 si está al día; si no, el Excel
+    return read_sheets(original_file, HOJAS_ORIG)
 
-regionales_existentes = set()
-if not df_zoni_orig.empty and 'Regional UDS' in df_zoni_orig.columns:
-    regionales_existentes = set(df_zoni_orig['Regional UDS'].dropna().astype(str).str.upper().str.strip())
+# Las regionales existentes salen del índice que deja el paso 01; solo si no
+# está (o el Excel es más reciente) se lee la zonificación completa
+hojas_orig = None
+regionales_index = read_column_index(original_file, 'ZONIFICACIÓN- PEDAGOGICO', 'Regional UDS')
+if regionales_index is None:
+    hojas_orig = leer_hojas_originales()
+    df_zoni_orig = hojas_orig.get('ZONIFICACIÓN- PEDAGOGICO', pd.DataFrame())
+    regionales_index = []
+    if not df_zoni_orig.empty and 'Regional UDS' in df_zoni_orig.columns:
+        regionales_index = df_zoni_orig['Regional UDS'].dropna().astype(str)
+regionales_existentes = {str(r).upper().strip() for r in regionales_index}
 
 def clean_regional(name):
     if not isinstance(name, str):
@@ -45,18 +58,52 @@ def clean_regional(name):
 
 regionales_existentes = {clean_regional(r) for r in regionales_existentes}
 
-def encontrar_header(df_temp, keyword):
-    for idx, row in df_temp.iterrows():
-        if any(isinstance(val, str) and keyword.lower() in val.lower() for val in row.values):
-            return idx
-    return None
-
 def limpiar_fechas(df):
     for col in df.columns:
         if pd.api.types.is_datetime64_any_dtype(df[col]):
             df[col] = df[col].dt.tz_localize(None).astype(str)
     return df
 
+def procesar_libro(wb, f):
+    """Agrega desde un libro regional abierto las regionales que faltan en el consolidado."""
+    # Procesar ZONIFICACIÓN
+    _, df_z = wb.read_with_header(lambda s: 'ZONIFICAC' in s.upper(), header_contains('Regional UDS'), max_scan_rows=15)
+    if df_z is not None:
+        col_r = [c for c in df_z.columns if 'Regional UDS' in str(c)][0]
+        df_z = df_z.dropna(subset=[col_r])
+        
+        regs_in_file = df_z[col_r].dropna().unique()
+        regs_to_add = [r for r in regs_in_file if clean_regional(r) not in regionales_existentes]
+        
+        if regs_to_add:
+            print(f"  [NUEVO] Agregando {regs_to_add} desde {f}")
+            df_z = df_z[df_z[col_r].isin(regs_to_add)].copy()
+            df_z = limpiar_fechas(df_z)
+            df_z = df_z.rename(columns={col_r: 'Regional UDS'})
+            df_z['Archivo_Origen'] = f
+            nuevos_zoni.append(df_z)
+            for r in regs_to_add:
+                regionales_agregadas.add(clean_regional(r))
+                regionales_existentes.add(clean_regional(r))
+
+    # Procesar MATRIZ_CALCULADA (solo interesa si ya hay regionales agregadas)
+    if not regionales_agregadas:
+        return
+    _, df_m = wb.read_with_header(lambda s: 'MATRIZ_CALCULADA' in s.upper(), header_contains('REGIONAL'), max_scan_rows=15)
+    if df_m is not None:
+        cols_r = [c for c in df_m.columns if 'REGIONAL' == str(c).strip().upper()]
+        if cols_r:
+            col_r = cols_r[0]
+            df_m = df_m.dropna(subset=[col_r])
+            regs_in_file = df_m[col_r].dropna().unique()
+            # Solo agregamos a la matriz si la regional fue marcada como "nueva" o relevante en este proceso
+            regs_to_add = [r for r in regs_in_file if clean_regional(r) in regionales_agregadas]
+            if regs_to_add:
+                df_m = df_m[df_m[col_r].isin(regs_to_add)].copy()
+                df_m = limpiar_fechas(df_m)
+                df_m['Archivo_Origen'] = f
+                nuevos_matriz.append(df_m)
+
 archivos_ignorados = [os.path.basename(original_file), os.path.basename(output_file), 'UDS_28042026_10AM.xlsx']
 
 nuevos_matriz = []
@@ -74,68 +121,39 @@ for root, dirs, files in os.walk(base_dir):
             
             path = os.path.join(root, f)
             try:
-                xls = pd.ExcelFile(path)
-                
-                # Procesar ZONIFICACIÓN
-                sheet_match_zoni = [s for s in xls.sheet_names if 'ZONIFICAC' in s.upper()]
-                if sheet_match_zoni:
-                    sheet_name = sheet_match_zoni[0]
-                    df_temp = pd.read_excel(xls, sheet_name=sheet_name, nrows=15, header=None)
-                    h_idx = encontrar_header(df_temp, 'Regional UDS')
-                    if h_idx is not None:
-                        df_z = pd.read_excel(xls, sheet_name=sheet_name, header=h_idx)
-                        col_r = [c for c in df_z.columns if 'Regional UDS' in str(c)][0]
-                        df_z = df_z.dropna(subset=[col_r])
-                        
-                        regs_in_file = df_z[col_r].dropna().unique()
-                        regs_to_add = [r for r in regs_in_file if clean_regional(r) not in regionales_existentes]
-                        
-                        if regs_to_add:
-                            print(f"  [NUEVO] Agregando {regs_to_add} desde {f}")
-                            df_z = df_z[df_z[col_r].isin(regs_to_add)].copy()
-                            df_z = limpiar_fechas(df_z)
-                            df_z = df_z.rename(columns={col_r: 'Regional UDS'})
-                            df_z['Archivo_Origen'] = f
-                            nuevos_zoni.append(df_z)
-                            for r in regs_to_add:
-                                regionales_agregadas.add(clean_regional(r))
-                                regionales_existentes.add(clean_regional(r))
-                                
-                # Procesar MATRIZ_CALCULADA
-                sheet_match_mat = [s for s in xls.sheet_names if 'MATRIZ_CALCULADA' in s.upper()]
-                if sheet_match_mat:
-                    sheet_name = sheet_match_mat[0]
-                    df_temp = pd.read_excel(xls, sheet_name=sheet_name, nrows=15, header=None)
-                    h_idx = encontrar_header(df_temp, 'REGIONAL')
-                    if h_idx is not None:
-                        df_m = pd.read_excel(xls, sheet_name=sheet_name, header=h_idx)
-                        cols_r = [c for c in df_m.columns if 'REGIONAL' == str(c).strip().upper()]
-                        if cols_r:
-                            col_r = cols_r[0]
-                            df_m = df_m.dropna(subset=[col_r])
-                            regs_in_file = df_m[col_r].dropna().unique()
-                            # Solo agregamos a la matriz si la regional fue marcada como "nueva" o relevante en este proceso
-                            regs_to_add = [r for r in regs_in_file if clean_regional(r) in regionales_agregadas]
-                            if regs_to_add:
-                                df_m = df_m[df_m[col_r].isin(regs_to_add)].copy()
-                                df_m = limpiar_fechas(df_m)
-                                df_m['Archivo_Origen'] = f
-                                nuevos_matriz.append(df_m)
-                                
+                # El libro se abre una sola vez y cada hoja se recorre una vez (encabezado + datos)
+                with WorkbookSession(path) as wb:
+                    procesar_libro(wb, f)
             except Exception as e:
                 print(f"Error procesando {f}: {e}")
 
-# Concatenar y guardar
-df_zoni_final = pd.concat([df_zoni_orig] + nuevos_zoni, ignore_index=True) if nuevos_zoni else df_zoni_orig
-df_matriz_final = pd.concat([df_matriz_orig] + nuevos_matriz, ignore_index=True) if nuevos_matriz else df_matriz_orig
+hojas_nuevas = {}
+if nuevos_zoni or nuevos_matriz:
+    hojas_orig = hojas_orig if hojas_orig is not None else leer_hojas_originales()
+    df_matriz_orig = hojas_orig.get('MATRIZ_CALCULADA', pd.DataFrame())
+    df_zoni_orig = hojas_orig.get('ZONIFICACIÓN- PEDAGOGICO', pd.DataFrame())
+    df_hoja3_orig = hojas_orig.get('Hoja3')
+
+    # Concatenar y guardar
+    df_zoni_final = pd.concat([df_zoni_orig] + nuevos_zoni, ignore_index=True) if nuevos_zoni else df_zoni_orig
+    df_matriz_final = pd.concat([df_matriz_orig] + nuevos_matriz, ignore_index=True) if nuevos_matriz else df_matriz_orig
 
-with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+    hojas_final = {}
     if not df_matriz_final.empty:
-        df_matriz_final.to_excel(writer, sheet_name='MATRIZ_CALCULADA', index=False)
+        hojas_final['MATRIZ_CALCULADA'] = df_matriz_final
     if not df_zoni_final.empty:
-        df_zoni_final.to_excel(writer, sheet_name='ZONIFICACIÓN- PEDAGOGICO', index=False)
+        hojas_final['ZONIFICACIÓN- PEDAGOGICO'] = df_zoni_final
     if df_hoja3_orig is not None:
-        df_hoja3_orig.to_excel(writer, sheet_name='Hoja3', index=False)
+        hojas_final['Hoja3'] = df_hoja3_orig
+
+    write_excel(output_file, hojas_final)
+    # Copia columnar para la auditoría (el Excel queda como entregable)
+    write_dataset(output_file, hojas_final)
+    if 'ZONIFICACIÓN- PEDAGOGICO' in hojas_final:
+        write_column_index(output_file, 'ZONIFICACIÓN- PEDAGOGICO', df_zoni_final, ['Regional UDS'])
+elif not dataset_copiado:
+    # Sin regionales nuevas la copia literal ya es el resultado; solo falta su dataset
+    write_dataset(output_file, hojas_orig if hojas_orig is not None else leer_hojas_originales())
 
 print(f"\nProceso completado.")
 print(f"Nuevas regionales integradas: {regionales_agregadas if regionales_agregadas else 'Ninguna'}")
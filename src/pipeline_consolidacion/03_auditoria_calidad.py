@@ -1,9 +1,40 @@
 import pandas as pd
 import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from pipeline_common.audit_rules import (ColumnsMatchRule, DuplicateKeyRule, RangeRule, RequiredFieldsRule,
+                                         ThresholdRule, TotalRowsRule, print_audit_summary, run_audit)
+from pipeline_common.columnar_store import read_sheets
+from pipeline_common.schemas import apply_schema
 
 # Configuración de ruta
 file_path = r'D:\ICBF\cost-tracking\data\insumos 28 abril\consolidacion_matriz_integrales_28042026_COPIA_SEGURA.xlsx'
 
+CONTRATO = 'REFERENCIA / No. CONTRATO SECOP'
+
+# Reglas por hoja: (columna de regional, esquema de tipos, reglas)
+REGLAS = {
+    'MATRIZ_CALCULADA': ('REGIONAL', 'integrales_matriz', [
+        TotalRowsRule('filas_total', severity='error',
+                      description="Filas de SUBTOTAL/TOTAL que duplicarían los valores al sumar"),
+        DuplicateKeyRule('filas_duplicadas', severity='alerta'),
+        DuplicateKeyRule('contrato_repetido', [CONTRATO], severity='info',
+                         description="Contratos con múltiples filas"),
+        ColumnsMatchRule('cupos_vs_cupos_zona', 'CUPOS', 'Cupos_Zona', severity='alerta'),
+        RangeRule('cupos_negativos', 'CUPOS', min_value=0, severity='error'),
+        RangeRule('valor_actual_negativo', 'VALOR ACTUAL', min_value=0, severity='error'),
+        ThresholdRule('contrato_mayor_1000_smlmv', 'VALOR TOTAL DEL CONTRATO (SMLV)', 1000, severity='info'),
+        ThresholdRule('contrato_mayor_5000_smlmv', 'VALOR TOTAL DEL CONTRATO (SMLV)', 5000, severity='alerta'),
+        RequiredFieldsRule('campos_criticos_vacios', ['REGIONAL', 'MUNICIPIO', CONTRATO], severity='alerta'),
+    ]),
+    'ZONIFICACIÓN- PEDAGOGICO': ('Regional UDS', 'integrales_zonificacion', [
+        TotalRowsRule('filas_total', severity='error'),
+        DuplicateKeyRule('filas_duplicadas', severity='alerta'),
+        RequiredFieldsRule('campos_criticos_vacios', ['Regional UDS', 'Municipio UDS'], severity='alerta'),
+    ]),
+}
+
 if not os.path.exists(file_path):
     print(f"Error: No se encuentra el archivo {file_path}. Ejecuta los pasos 01 y 02 primero.")
     exit()
@@ -12,44 +43,28 @@ print(f"Iniciando auditoría sobre: {os.path.basename(file_path)}")
 
 try:
     # 1. Cargar datos
-    xls = pd.ExcelFile(file_path)
-    df_matriz = pd.read_excel(xls, sheet_name='MATRIZ_CALCULADA')
-    df_zoni = pd.read_excel(xls, sheet_name='ZONIFICACIÓN- PEDAGOGICO')
+    hojas = read_sheets(file_path, list(REGLAS))
     
     print(f"\n--- ESTADÍSTICAS GENERALES ---")
-    print(f"Filas en MATRIZ: {len(df_matriz)}")
-    print(f"Filas en ZONIFICACIÓN: {len(df_zoni)}")
+    for hoja in REGLAS:
+        print(f"Filas en {hoja}: {len(hojas[hoja]) if hoja in hojas else 'hoja no encontrada'}")
     
-    # 2. Detección de filas de "TOTAL" (Riesgo de doble conteo)
-    mask_total = df_matriz.apply(lambda row: row.astype(str).str.contains('TOTAL', case=False).any(), axis=1)
-    total_rows = df_matriz[mask_total]
-    if not total_rows.empty:
-        print(f"\n[ALERTA] Se encontraron {len(total_rows)} filas que parecen ser SUBTOTALES o TOTALES.")
-        print("Estas filas podrían estar duplicando los valores si se suman directamente.")
-        print(total_rows[['REGIONAL', 'MUNICIPIO', 'VALOR ACTUAL']].head())
-    else:
-        print("\n[OK] No se detectaron filas de 'TOTAL' evidentes en la Matriz.")
-
-    # 3. Análisis de Contratos Duplicados
-    contract_col = 'REFERENCIA / No. CONTRATO SECOP'
-    if contract_col in df_matriz.columns:
-        counts = df_matriz[contract_col].value_counts()
-        duplicados = counts[counts > 1]
-        print(f"\n--- ANÁLISIS DE CONTRATOS ---")
-        print(f"Contratos con múltiples filas: {len(duplicados)}")
-        if len(duplicados) > 0:
-            print("Ejemplo de contrato repetido:")
-            sample_id = duplicados.index[0]
-            print(df_matriz[df_matriz[contract_col] == sample_id][['REGIONAL', 'MUNICIPIO', 'CUPOS', 'VALOR ACTUAL']])
-
-    # 4. Verificación de Cupos
-    if 'CUPOS' in df_matriz.columns and 'Cupos_Zona' in df_matriz.columns:
-        print(f"\n--- VERIFICACIÓN DE CUPOS ---")
-        diff = df_matriz[df_matriz['CUPOS'] != df_matriz['Cupos_Zona']]
-        if not diff.empty:
-            print(f"[!] Hay {len(diff)} filas donde CUPOS no coincide con Cupos_Zona.")
-        else:
-            print("[OK] Los cupos coinciden perfectamente.")
+    # 2. Reglas de calidad, todas en una pasada por hoja
+    partes = []
+    for hoja, (col_regional, esquema, reglas) in REGLAS.items():
+        if hoja not in hojas:
+            continue
+        print(f"\n=== {hoja} ===")
+        df = apply_schema(hojas[hoja], esquema, report=True)
+        hallazgos, tiempos = run_audit(df, reglas, sheet=hoja, regional_col=col_regional)
+        print_audit_summary(hallazgos, tiempos)
+        partes.append(hallazgos)
+
+    if partes:
+        hallazgos = pd.concat(partes, ignore_index=True)
+        salida = os.path.splitext(file_path)[0] + '_hallazgos.csv'
+        hallazgos.to_csv(salida, index=False, encoding='utf-8-sig')
+        print(f"\nHallazgos ({len(hallazgos)}): {salida}")
 
 except Exception as e:
     print(f"Error durante la auditoría: {e}")
@@ -1,8 +1,23 @@
 import os
+import sys
+import argparse
+import time
+import numpy as np
 import pandas as pd
 import warnings
-import re
 import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from pipeline_common.cleaning import clean_currency_series, detect_total_rows
+from pipeline_common.column_mapping import HCB_MATRIZ_MAPPER, normalize_str
+from pipeline_common.excel_reader import read_sheet_with_header
+from pipeline_common.columnar_store import write_dataset
+from pipeline_common.excel_writer import CURRENCY_FORMAT, StreamingExcelWriter
+from pipeline_common.file_cache import FileCache, code_version
+from pipeline_common.schemas import CATEGORIA, apply_schema
+from pipeline_common.source_manifest import source_entry, write_sources
+from pipeline_common import cleaning, column_mapping, excel_reader
 
 warnings.filterwarnings('ignore', category=UserWarning, module='openpyxl')
 
@@ -10,28 +25,8 @@ warnings.filterwarnings('ignore', category=UserWarning, module='openpyxl')
 base_dir = 'd:/ICBF/cost-tracking/data/Matrices_validadas_definitivas'
 output_file = 'd:/ICBF/cost-tracking/data/insumos 28 abril/consolidacion_matriz_hcb_28042026.xlsx'
 
-def normalize_str(s):
-    if not isinstance(s, str):
-        return str(s)
-    s = s.upper().strip()
-    s = ''.join(c for c in unicodedata.normalize('NFD', s) if unicodedata.category(c) != 'Mn')
-    s_clean = re.sub(r'[^A-Z0-9]', '', s)
-    return s_clean
-
-def clean_currency(val):
-    if pd.isna(val) or val == '': return 0.0
-    if isinstance(val, (int, float)): return float(val)
-    # Limpiar string: quitar $, puntos de miles, espacios, etc.
-    s = str(val).replace('$', '').replace(' ', '').replace('.', '').replace(',', '.')
-    # Si después de limpiar hay varios puntos (ej. 1.200.000 -> 1200000)
-    # Ya quitamos los puntos arriba, ahora nos aseguramos que sea convertible
-    try:
-        return float(s)
-    except:
-        # Intentar rescatar solo números
-        s_only_num = re.sub(r'[^0-9.]', '', s)
-        try: return float(s_only_num)
-        except: return 0.0
+# Caché por libro: si cambia cualquiera de estos archivos de código se invalida
+CODIGO_CACHE = [__file__, cleaning.__file__, column_mapping.__file__, excel_reader.__file__]
 
 def clean_regional_name(name):
     if not isinstance(name, str): return str(name)
@@ -96,183 +91,343 @@ COLS_ZONI_HCB = [
 ]
 
 def map_hcb_columns(df_cols):
-    rename_dict = {}
-    for col in df_cols:
-        c = normalize_str(col)
-        if 'REGIONAL' in c: rename_dict[col] = 'REGIONAL'
-        elif 'CONTRATOSECOP' in c: rename_dict[col] = 'REFERENCIA / No. CONTRATO SECOP'
-        elif 'CENTROZONAL' in c: rename_dict[col] = 'CENTRO ZONAL'
-        elif 'MUNICIPIO' in c: rename_dict[col] = 'MUNICIPIO'
-        elif 'NOMBREDELSERVICIO' in c: rename_dict[col] = 'SERVICIO 2026'
-        elif 'MODALIDADDESERVICIO' in c: rename_dict[col] = 'Componente para la UDS'
-        elif c == 'NIT': rename_dict[col] = 'NIT CONTRATISTA 2026'
-        elif 'NOMBREEAS' in c: rename_dict[col] = 'CONTRATISTA 2026'
-        elif 'CUPOSPORUNIDAD' in c: rename_dict[col] = 'Cupos'
-        elif 'MADRESPORUDS' in c and '2025' in c: rename_dict[col] = 'CANTIDAD DE MADRES POR UDS'
-        
-        # Administrativos y Tiempos
-        elif c == 'NORP': rename_dict[col] = 'No. RP'
-        elif c == 'VIGENCIA': rename_dict[col] = 'VIGENCIA'
-        elif 'FORMADECONTRATACION' in c: rename_dict[col] = 'FORMA CONTRATACION'
-        elif 'TIEMPOINICIALDELCONTRATO' in c: rename_dict[col] = 'DURACION INICIAL'
-        elif 'TIEMPOAADICIONAR' in c: rename_dict[col] = 'DURACION ADICION'
-        elif 'CANTIDADDEUDS' in c: rename_dict[col] = 'CANTIDAD UDS'
-        elif 'SANCIONATORIOS' in c: rename_dict[col] = 'SANCIONATORIOS'
-        elif 'ALERTADEAVAL' in c and '1000' in c: rename_dict[col] = 'ALERTA 1000 SMLMV'
-        elif 'ALERTA' in c and '5000' in c: rename_dict[col] = 'ALERTA 5000 SMLMV'
-        
-        # Variables de Análisis Presupuestal
-        elif 'VALORUNITARIO' in c and 'MES' in c: rename_dict[col] = 'VALOR UNITARIO MES'
-        elif 'VALORCANASTA' in c and '2026' in c: rename_dict[col] = 'VALOR CANASTA 2026'
-        
-        # Pesos
-        elif 'VALORTOTALINICIAL' in c and 'APORTEICBF' in c and 'UNICO' in c: rename_dict[col] = 'VALOR INICIAL 2026'
-        elif 'VALORINICIALCONTRAPARTIDA' in c: rename_dict[col] = 'APORTE CONTRAPARTIDA'
-        elif 'VALORADICIONESHISTORICAS' in c and 'ICBF' in c: rename_dict[col] = 'VALOR ADICIONES A LA FECHA'
-        elif 'VALORADICIONOTROSCONCEPTOS' in c: rename_dict[col] = 'ADICION OTROS CONCEPTOS'
-        elif 'VALORREDUCCIONESHISTORICAS' in c and 'ICBF' in c: rename_dict[col] = 'VALOR REDUCCIONES A LA FECHA'
-        elif 'VALORINEJECUCIONES' in c: rename_dict[col] = 'INEJECUCIONES'
-        elif 'VALORACTUALDELCONTRATO' in c and 'ANTES' in c and 'UNICO' in c and 'SML' not in c: rename_dict[col] = 'VALOR ACTUAL'
-        elif 'VALORTOTALDELAADICIONCONTRATO' in c and 'UNICO' in c and 'SML' not in c: rename_dict[col] = 'VALOR FINAL ADICION SERVICIO'
-        elif 'VALORTOTALDELAADICIONAPORTEICBF' in c and 'UNICO' in c: rename_dict[col] = 'VALOR A ADICIONAR'
-        elif 'VALORCONTRAPARTIDAADICION' in c: rename_dict[col] = 'CONTRAPARTIDA ADICION'
-        
-        # SMLV (Detección por palabra 'SML' o 'SMML')
-        elif 'VALORTOTALINICIAL' in c and 'UNICO' in c and ('SML' in c or 'SMML' in c): rename_dict[col] = 'VALOR INICIAL 2026 (SMLV)'
-        elif 'VALORACTUAL' in c and 'UNICO' in c and ('SML' in c or 'SMML' in c): rename_dict[col] = 'VALOR ACTUAL TOTAL DEL CONTRATO (SMLV)'
-        elif 'VALORTOTALDELAADICION' in c and 'UNICO' in c and ('SML' in c or 'SMML' in c): rename_dict[col] = 'VALOR FINAL ADICION SERVICIO (SMLV)'
-        elif 'VALORFINAL' in c and 'UNICO' in c and ('SML' in c or 'SMML' in c): rename_dict[col] = 'VALOR TOTAL DEL CONTRATO (SMLV)'
+    # Reglas declarativas en pipeline_common.column_mapping (memorizadas por plantilla)
+    return HCB_MATRIZ_MAPPER.rename_dict(df_cols)
+
+# Columnas en pesos (formato moneda en el Excel; las SMLV y cupos quedan como número)
+COLS_PESOS_HCB = [
+    'VALOR UNITARIO MES', 'VALOR CANASTA 2026', 'VALOR INICIAL 2026', 'APORTE CONTRAPARTIDA',
+    'VALOR ADICIONES A LA FECHA', 'ADICION OTROS CONCEPTOS', 'VALOR REDUCCIONES A LA FECHA',
+    'INEJECUCIONES', 'VALOR ACTUAL', 'VALOR FINAL ADICION SERVICIO', 'VALOR A ADICIONAR',
+    'CONTRAPARTIDA ADICION', 'VALOR ADICION CANASTA (MULTIPLE)', 'VALOR TOTAL ADICION (MULTIPLE)',
+    # Resúmenes
+    'Valor Inicial (Total)', 'Valor Adicion (Total)', 'Inversion por Cupo', 'Adicion Presupuestal',
+]
+
+# Columnas que deben ser numéricas
+FIN_KEYWORDS = ['VALOR', 'APORTE', 'ADICION', 'REDUCCION', 'INEJECUCION', 'CONTRAPARTIDA', 'SMLV', 'CUPOS', 'CANTIDAD']
+
+def es_hoja_matriz(sheet_name):
+    return 'MATRIZ' == sheet_name.upper()
+
+def es_fila_encabezado(values):
+    return any(isinstance(val, str) and 'REGIONAL' == normalize_str(val) for val in values)
+
+def listar_archivos_hcb(base_dir):
+    """Lista (root, archivo) de los libros HCB regionales en el orden de os.walk."""
+    archivos = []
+    for root, dirs, files in os.walk(base_dir):
+        for f in files:
+            f_lower = f.lower()
+            if (f.endswith(('.xlsx', '.xls', '.xlsm')) and not f.startswith('~$') and 
+                'hcb' in f_lower and 'alimento' not in f_lower and 'consolidacion' not in f_lower):
+                archivos.append((root, f))
+    return archivos
+
+def regionales_crudas(df):
+    """
+    Valores distintos de la columna REGIONAL tal como vienen en el libro (antes de
+    limpiar), para el manifiesto de fuentes del consolidado.
+    """
+    cols = [c for c in df.columns if 'REGIONAL' == str(c).strip().upper()]
+    if not cols:
+        return []
+    return [v if isinstance(v, str) else str(v) for v in df[cols[0]].dropna().unique()]
+
+def procesar_archivo(root, f):
+    """
+    Lee, mapea y limpia un libro HCB regional. Puede ejecutarse en un proceso aparte.
+
+    No decide la pertenencia final de las filas: devuelve las filas de la regional
+    objetivo y las de SANTANDER para que `resolver_pertenencia` aplique el rescate
+    de Santander en el orden original de los archivos.
+    """
+    t0 = time.time()
+    res = {'archivo': f, 'df': None, 'target_regional': None, 'target_norm': None, 'error': None,
+           'hoja': None, 'regionales': []}
+    path = os.path.join(root, f)
+    try:
+        # Una sola pasada sobre la hoja: detecta el encabezado y carga los datos
+        res['hoja'], df = read_sheet_with_header(path, es_hoja_matriz, es_fila_encabezado, max_scan_rows=20)
+        if df is not None:
+            res['regionales'] = regionales_crudas(df)
+            # --- DEDUPLICACIÓN DE COLUMNAS ---
+            df = df.loc[:, ~df.columns.duplicated()].copy()
+            
+            rename_dict = map_hcb_columns(df.columns)
+            df = df.rename(columns=rename_dict)
+            # --- DEDUPLICACIÓN DE COLUMNAS (Después de renombrar) ---
+            df = df.loc[:, ~df.columns.duplicated()].copy()
+            
+            for col in df.columns:
+                if pd.api.types.is_datetime64_any_dtype(df[col]):
+                    df[col] = df[col].dt.tz_localize(None).astype(str)
+            if 'REGIONAL' in df.columns or any(normalize_str(c) == 'REGIONAL' for c in df.columns):
+                # Propagación
+                cols_to_ffill = [
+                    'REGIONAL', 'CENTRO ZONAL', 'MUNICIPIO', 'REFERENCIA / No. CONTRATO SECOP', 
+                    'NIT CONTRATISTA 2026', 'CONTRATISTA 2026', 'SERVICIO 2026', 
+                    'Componente para la UDS', 'No. RP', 'VIGENCIA', 'FORMA CONTRATACION',
+                    'DURACION INICIAL', 'DURACION ADICION', 'CANTIDAD UDS', 'SANCIONATORIOS',
+                    'ALERTA 1000 SMLMV', 'ALERTA 5000 SMLMV', 'CUPOS',
+                    'VALOR UNITARIO MES', 'VALOR CANASTA 2026'
+                ]
+                # También ffill de columnas financieras
+                fin_cols_temp = [c for c in df.columns if any(x in str(c).upper() for x in ['VALOR', 'APORTE', 'ADICION', 'REDUCCION', 'INEJECUCION', 'CONTRAPARTIDA'])]
+                for c in cols_to_ffill + fin_cols_temp:
+                    if c in df.columns: df[c] = df[c].ffill()
+                if 'REFERENCIA / No. CONTRATO SECOP' in df.columns:
+                    df['REFERENCIA / No. CONTRATO SECOP'] = df['REFERENCIA / No. CONTRATO SECOP'].astype(str).str.strip().str.upper()
+                df = df.dropna(subset=['REGIONAL'])
+                df['REGIONAL'] = df['REGIONAL'].apply(clean_regional_name)
+                
+                # Limpieza numérica preventiva
+                for col in df.columns:
+                    if any(k in col.upper() for k in FIN_KEYWORDS):
+                        df[col] = clean_currency_series(df[col])
+                
+                # --- LIMPIEZA DE FILAS DE TOTALES ---
+                # Eliminamos filas que sean resúmenes o totales dentro del Excel regional
+                mask_totals, _ = detect_total_rows(df)
+                df = df[~mask_totals].copy()
+                
+                # --- FILTRO DE PERTENENCIA REGIONAL ---
+                f_norm = normalize_str(f)
+                root_norm = normalize_str(root)
+                target_regional = None
+                
+                for alias, official in ALIASES_REGIONALES.items():
+                    if alias in f_norm or alias in root_norm:
+                        target_regional = official
+                        break
+                if not target_regional:
+                    for reg in REGIONALES_VALIDAS:
+                        reg_norm = normalize_str(reg)
+                        if reg_norm in f_norm or reg_norm in root_norm:
+                            target_regional = reg
+                            break
+                if not target_regional:
+                    mode_res = df['REGIONAL'].mode()
+                    target_regional = mode_res[0] if not mode_res.empty else 'DESCONOCIDO'
+                
+                target_norm = normalize_str(target_regional)
+                df['REGIONAL_NORM'] = df['REGIONAL'].apply(normalize_str)
+                
+                # Solo viajan de vuelta las filas que pueden quedarse en el consolidado
+                mask_keep = (df['REGIONAL_NORM'] == target_norm) | (df['REGIONAL_NORM'] == 'SANTANDER')
+                res['df'] = df[mask_keep].copy()
+                res['target_regional'] = target_regional
+                res['target_norm'] = target_norm
+    except Exception as e:
+        res['error'] = str(e)
+    res['segundos'] = time.time() - t0
+    return res
+
+def resolver_pertenencia(resultados):
+    """
+    Aplica el filtro de pertenencia regional y el rescate de Santander.
+
+    Recorre los resultados en el orden original de `listar_archivos_hcb`, de modo
+    que el estado `processed_pure_regionals` evoluciona igual que en la corrida serial.
+    """
+    all_data = []
+    # Tracking global para evitar duplicados de regionales "fantasma"
+    processed_pure_regionals = set()
+    
+    for res in resultados:
+        f = res['archivo']
+        if res['error'] is not None:
+            print(f"  [ERROR] {f}: {res['error']} ({res['segundos']:.1f}s)")
+            continue
+        df = res['df']
+        if df is None:
+            continue
+        target_regional = res['target_regional']
         
-        # Granular
-        elif 'VALORADICIONNIVELACIONCANASTA' in c and 'MULTIPLE' in c: rename_dict[col] = 'VALOR ADICION CANASTA (MULTIPLE)'
-        elif 'VALORTOTALDELAADICIONAPORTEICBF' in c and 'MULTIPLE' in c: rename_dict[col] = 'VALOR TOTAL ADICION (MULTIPLE)'
+        # Lógica de Rescate de Santander
+        mask_target = (df['REGIONAL_NORM'] == res['target_norm'])
+        mask_santander = (df['REGIONAL_NORM'] == 'SANTANDER')
         
-        # Cupos (Manejo de erratas como 'CONTRAO' y variaciones)
-        elif 'CUPOS' in c and ('UNICO' in c or 'CONTRATO' in c or 'CONTRAO' in c or 'SUMATORIA' in c): 
-            rename_dict[col] = 'CUPOS'
-        elif 'CUPOS' in c and 'UNIDAD' in c: 
-            rename_dict[col] = 'Cupos' # Para zonificación
+        if ('SANTANDER' not in processed_pure_regionals) and mask_santander.any():
+            df_clean = df[mask_target | mask_santander].copy()
+            processed_pure_regionals.add('SANTANDER')
+        else:
+            df_clean = df[mask_target].copy()
+            
+        if target_regional not in processed_pure_regionals:
+            processed_pure_regionals.add(target_regional)
+
+        df_clean = df_clean.drop(columns=['REGIONAL_NORM'])
+        df = df_clean
         
-    return rename_dict
+        if not df.empty:
+            origen = 'caché' if res.get('cache') else f"{res['segundos']:.1f}s"
+            print(f"  [OK] {f}: Procesada como {target_regional} ({len(df)} filas, {origen})")
+            df['Archivo_Origen'] = f
+            all_data.append(df)
+    return all_data
 
-all_data = []
-print(f"Consolidando HCB con Resumen Ejecutivo...")
+def leer_archivos(archivos, workers=1, cache=None):
+    """
+    Procesa los libros en serie (workers=1) o en un pool de procesos, conservando el orden.
 
-# Tracking global para evitar duplicados de regionales "fantasma"
-processed_pure_regionals = set()
+    Con `cache`, los libros sin cambios se toman de la caché y solo se leen los
+    nuevos o modificados; los que terminan con error no se cachean.
+    """
+    resultados = [None] * len(archivos)
+    pendientes = []
+    for i, (root, f) in enumerate(archivos):
+        hit = cache.get(os.path.join(root, f)) if cache is not None else None
+        if hit is None:
+            pendientes.append(i)
+            continue
+        df, meta = hit
+        resultados[i] = dict(meta, df=df, segundos=0.0, cache=True)
 
-# Columnas que deben ser numéricas
-FIN_KEYWORDS = ['VALOR', 'APORTE', 'ADICION', 'REDUCCION', 'INEJECUCION', 'CONTRAPARTIDA', 'SMLV', 'CUPOS', 'CANTIDAD']
+    roots = [archivos[i][0] for i in pendientes]
+    files = [archivos[i][1] for i in pendientes]
+    if workers <= 1 or len(pendientes) <= 1:
+        leidos = [procesar_archivo(root, f) for root, f in zip(roots, files)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            leidos = list(executor.map(procesar_archivo, roots, files))
+
+    for i, res in zip(pendientes, leidos):
+        resultados[i] = res
+        if cache is not None and res['error'] is None:
+            meta = {k: res[k] for k in ('archivo', 'target_regional', 'target_norm', 'error', 'hoja', 'regionales')}
+            cache.put(os.path.join(*archivos[i]), res['df'], meta)
+    return resultados
+
+# Agregación de CONSOLIDADO_CONTRATO: 'first' = primer valor no nulo del contrato,
+# 'sum' = suma de sus filas, 'servicios' = servicios distintos ordenados y unidos con ' / '
+AGG_CONTRATO = {
+    'REGIONAL': 'first',
+    'NIT CONTRATISTA 2026': 'first',
+    'CONTRATISTA 2026': 'first',
+    'SERVICIO 2026': 'servicios',
+    'Componente para la UDS': 'first',
+    'No. RP': 'first',
+    'VIGENCIA': 'first',
+    'FORMA CONTRATACION': 'first',
+    'DURACION INICIAL': 'first',
+    'DURACION ADICION': 'first',
+    'CUPOS': 'first',
+    'CANTIDAD DE MADRES POR UDS': 'sum',
+    'VALOR UNITARIO MES': 'first',
+    'VALOR CANASTA 2026': 'first',
+    # Pesos ($)
+    'VALOR INICIAL 2026': 'first',
+    'APORTE CONTRAPARTIDA': 'first',
+    'VALOR ADICIONES A LA FECHA': 'first',
+    'ADICION OTROS CONCEPTOS': 'first',
+    'VALOR REDUCCIONES A LA FECHA': 'first',
+    'INEJECUCIONES': 'first',
+    'VALOR ACTUAL': 'first',
+    'VALOR FINAL ADICION SERVICIO': 'first',
+    'VALOR A ADICIONAR': 'first',
+    'CONTRAPARTIDA ADICION': 'first',
+    # SMLV
+    'VALOR INICIAL 2026 (SMLV)': 'first',
+    'VALOR ACTUAL TOTAL DEL CONTRATO (SMLV)': 'first',
+    'VALOR FINAL ADICION SERVICIO (SMLV)': 'first',
+    'VALOR TOTAL DEL CONTRATO (SMLV)': 'first',
+    # Alertas
+    'SANCIONATORIOS': 'first',
+    'ALERTA 1000 SMLMV': 'first',
+    'ALERTA 5000 SMLMV': 'first'
+}
+
+def factorizar_contratos(df):
+    """
+    Códigos enteros del contrato por fila (en orden alfabético de contrato, como
+    `groupby`; -1 = sin contrato) y el arreglo de contratos distintos.
+    """
+    return pd.factorize(df['REFERENCIA / No. CONTRATO SECOP'], sort=True)
+
+def suma_por_contrato(valores, cod_contrato):
+    """Equivalente a groupby(contrato).transform('sum'): total del contrato repetido en cada fila."""
+    totales = valores.groupby(cod_contrato).sum()
+    out = totales.reindex(cod_contrato).to_numpy()
+    sin_contrato = cod_contrato < 0
+    if sin_contrato.any():
+        out = out.astype('float64')
+        out[sin_contrato] = np.nan
+    return pd.Series(out, index=valores.index)
+
+def unir_servicios(servicios, cod_contrato, n_contratos):
+    """
+    Servicios distintos de cada contrato, ordenados y unidos con ' / ', sin una
+    lambda por grupo: se ordenan los pares (contrato, servicio) una vez y se unen.
+    """
+    validos = (cod_contrato >= 0) & servicios.notna().to_numpy()
+    pares = pd.DataFrame({'cod': cod_contrato[validos], 'servicio': servicios[validos].astype(str).to_numpy()})
+    pares = pares.drop_duplicates().sort_values(['cod', 'servicio'])
+    unidos = pares.groupby('cod')['servicio'].agg(' / '.join)
+    return unidos.reindex(range(n_contratos), fill_value='').to_numpy()
+
+def consolidar_por_contrato(df_full, cod_contrato, contratos, agg_contrato):
+    """Una fila por contrato con todas las columnas de `agg_contrato`, desde un único agrupamiento."""
+    validos = cod_contrato >= 0
+    grupos = df_full[validos].groupby(cod_contrato[validos])
+    cols = [k for k in agg_contrato if k in df_full.columns]
+    primeros = grupos[[k for k in cols if agg_contrato[k] == 'first']].first()
+    sumas = grupos[[k for k in cols if agg_contrato[k] == 'sum'] + ['VALOR TOTAL ADICION (MULTIPLE)']].sum()
+
+    df_contrato = pd.DataFrame({'REFERENCIA / No. CONTRATO SECOP': contratos})
+    for k in cols:
+        if agg_contrato[k] == 'first':
+            df_contrato[k] = primeros[k].to_numpy()
+        elif agg_contrato[k] == 'sum':
+            df_contrato[k] = sumas[k].to_numpy()
+        else:
+            df_contrato[k] = unir_servicios(df_full[k], cod_contrato, len(contratos))
+    df_contrato['VALOR_MULTIPLE_SUM'] = sumas['VALOR TOTAL ADICION (MULTIPLE)'].to_numpy()
+    return df_contrato
+
+def tabla_contrato_regional(df_matriz, mask_dupe):
+    """
+    Tabla de contratos para los resúmenes: una fila por (REGIONAL, contrato) en el
+    orden de la MATRIZ ya ordenada, con los valores de la primera fila de cada
+    contrato (las demás quedan en blanco), si esa es la fila principal del
+    contrato y la suma de madres del par.
+    """
+    reg = df_matriz['REGIONAL'].to_numpy()
+    cod = df_matriz['_COD_CONTRATO'].to_numpy()
+    nuevo_par = np.ones(len(df_matriz), dtype=bool)
+    nuevo_par[1:] = (reg[1:] != reg[:-1]) | (cod[1:] != cod[:-1])
+    inicios = np.flatnonzero(nuevo_par)
+
+    cols = ['REGIONAL', 'REFERENCIA / No. CONTRATO SECOP', 'Componente para la UDS', 'CUPOS', 'VALOR INICIAL 2026', 'VALOR A ADICIONAR']
+    tabla = df_matriz.iloc[inicios][cols].reset_index(drop=True)
+    tabla['_PRINCIPAL'] = ~mask_dupe.to_numpy()[inicios]
+    par = np.cumsum(nuevo_par) - 1
+    tabla['CANTIDAD DE MADRES POR UDS'] = df_matriz['CANTIDAD DE MADRES POR UDS'].groupby(par).sum().to_numpy()
+    return tabla
+
+def generar_consolidado(all_data, output_file, fuentes=None):
+    """
+    Construye las hojas ejecutivas a partir de los libros ya filtrados y guarda el Excel.
+    `fuentes` (registros de `source_entry`) se guarda como manifiesto junto al dataset;
+    es solo informativo, ningún paso lo lee.
+    """
+    if not all_data:
+        print("\nNO SE ENCONTRARON DATOS PARA CONSOLIDAR.")
+        return
 
-for root, dirs, files in os.walk(base_dir):
-    for f in files:
-        f_lower = f.lower()
-        if (f.endswith(('.xlsx', '.xls', '.xlsm')) and not f.startswith('~$') and 
-            'hcb' in f_lower and 'alimento' not in f_lower and 'consolidacion' not in f_lower):
-            path = os.path.join(root, f)
-            try:
-                xls = pd.ExcelFile(path)
-                sheet_m = [s for s in xls.sheet_names if 'MATRIZ' == s.upper()]
-                if sheet_m:
-                    df_temp = pd.read_excel(xls, sheet_name=sheet_m[0], nrows=20, header=None)
-                    h_idx = None
-                    for idx, row in df_temp.iterrows():
-                        if any(isinstance(val, str) and 'REGIONAL' == normalize_str(val) for val in row.values):
-                            h_idx = idx
-                            break
-                    if h_idx is not None:
-                        df = pd.read_excel(xls, sheet_name=sheet_m[0], header=h_idx)
-                        # --- DEDUPLICACIÓN DE COLUMNAS ---
-                        df = df.loc[:, ~df.columns.duplicated()].copy()
-                        
-                        rename_dict = map_hcb_columns(df.columns)
-                        df = df.rename(columns=rename_dict)
-                        # --- DEDUPLICACIÓN DE COLUMNAS (Después de renombrar) ---
-                        df = df.loc[:, ~df.columns.duplicated()].copy()
-                        
-                        for col in df.columns:
-                            if pd.api.types.is_datetime64_any_dtype(df[col]):
-                                df[col] = df[col].dt.tz_localize(None).astype(str)
-                        if 'REGIONAL' in df.columns or any(normalize_str(c) == 'REGIONAL' for c in df.columns):
-                            # Propagación
-                            cols_to_ffill = [
-                                'REGIONAL', 'CENTRO ZONAL', 'MUNICIPIO', 'REFERENCIA / No. CONTRATO SECOP', 
-                                'NIT CONTRATISTA 2026', 'CONTRATISTA 2026', 'SERVICIO 2026', 
-                                'Componente para la UDS', 'No. RP', 'VIGENCIA', 'FORMA CONTRATACION',
-                                'DURACION INICIAL', 'DURACION ADICION', 'CANTIDAD UDS', 'SANCIONATORIOS',
-                                'ALERTA 1000 SMLMV', 'ALERTA 5000 SMLMV', 'CUPOS',
-                                'VALOR UNITARIO MES', 'VALOR CANASTA 2026'
-                            ]
-                            # También ffill de columnas financieras
-                            fin_cols_temp = [c for c in df.columns if any(x in str(c).upper() for x in ['VALOR', 'APORTE', 'ADICION', 'REDUCCION', 'INEJECUCION', 'CONTRAPARTIDA'])]
-                            for c in cols_to_ffill + fin_cols_temp:
-                                if c in df.columns: df[c] = df[c].ffill()
-                            if 'REFERENCIA / No. CONTRATO SECOP' in df.columns:
-                                df['REFERENCIA / No. CONTRATO SECOP'] = df['REFERENCIA / No. CONTRATO SECOP'].astype(str).str.strip().str.upper()
-                            df = df.dropna(subset=['REGIONAL'])
-                            df['REGIONAL'] = df['REGIONAL'].apply(clean_regional_name)
-                            
-                            # Limpieza numérica preventiva
-                            for col in df.columns:
-                                if any(k in col.upper() for k in FIN_KEYWORDS):
-                                    df[col] = df[col].apply(clean_currency)
-                            
-                            # --- LIMPIEZA DE FILAS DE TOTALES ---
-                            # Eliminamos filas que sean resúmenes o totales dentro del Excel regional
-                            mask_totals = df.astype(str).apply(lambda x: x.str.contains('TOTAL|SUBTOTAL', case=False, na=False)).any(axis=1)
-                            df = df[~mask_totals].copy()
-                            
-                            # --- FILTRO DE PERTENENCIA REGIONAL ---
-                            f_norm = normalize_str(f)
-                            root_norm = normalize_str(root)
-                            target_regional = None
-                            
-                            for alias, official in ALIASES_REGIONALES.items():
-                                if alias in f_norm or alias in root_norm:
-                                    target_regional = official
-                                    break
-                            if not target_regional:
-                                for reg in REGIONALES_VALIDAS:
-                                    reg_norm = normalize_str(reg)
-                                    if reg_norm in f_norm or reg_norm in root_norm:
-                                        target_regional = reg
-                                        break
-                            if not target_regional:
-                                mode_res = df['REGIONAL'].mode()
-                                target_regional = mode_res[0] if not mode_res.empty else 'DESCONOCIDO'
-                            
-                            target_norm = normalize_str(target_regional)
-                            df['REGIONAL_NORM'] = df['REGIONAL'].apply(normalize_str)
-                            
-                            # Lógica de Rescate de Santander
-                            mask_target = (df['REGIONAL_NORM'] == target_norm)
-                            mask_santander = (df['REGIONAL_NORM'] == 'SANTANDER')
-                            
-                            if ('SANTANDER' not in processed_pure_regionals) and mask_santander.any():
-                                df_clean = df[mask_target | mask_santander].copy()
-                                processed_pure_regionals.add('SANTANDER')
-                            else:
-                                df_clean = df[mask_target].copy()
-                                
-                            if target_regional not in processed_pure_regionals:
-                                processed_pure_regionals.add(target_regional)
-
-                            df_clean = df_clean.drop(columns=['REGIONAL_NORM'])
-                            df = df_clean
-                            
-                            if not df.empty:
-                                print(f"  [OK] {f}: Procesada como {target_regional} ({len(df)} filas)")
-                                df['Archivo_Origen'] = f
-                                all_data.append(df)
-            except Exception as e: print(f"  [ERROR] {f}: {e}")
-
-if all_data:
     df_full = pd.concat(all_data, ignore_index=True)
     df_full = df_full.loc[:, ~df_full.columns.duplicated()]
+    # Textos repetidos (regional, municipio, servicio...) como categorías: menos memoria y
+    # agrupaciones más rápidas. Los tipos numéricos no se tocan para no cambiar el Excel.
+    df_full = apply_schema(df_full, 'hcb_filas', only=(CATEGORIA,), report=True)
+
+    # El contrato se factoriza una sola vez: todas las salidas por contrato salen de estos códigos
+    cod_contrato, contratos = factorizar_contratos(df_full)
 
     # --- MATRIZ_CALCULADA ---
     # No agrupamos para mantener la granularidad original (ej. por UDS/Sede)
     df_matriz = df_full.copy()
+    df_matriz['_COD_CONTRATO'] = cod_contrato
     
     # --- FALLBACK DE CUPOS (Específico para regionales como Valle que dejan el total en cero) ---
     # Si CUPOS (total contrato) es 0 o NaN, calculamos la suma de Cupos (nivel sede) por contrato
@@ -281,7 +436,7 @@ if all_data:
         df_matriz['Cupos'] = pd.to_numeric(df_matriz['Cupos'], errors='coerce').fillna(0)
         
         # Calculamos totales por contrato basados en la granularidad de las sedes
-        contract_totals = df_matriz.groupby('REFERENCIA / No. CONTRATO SECOP')['Cupos'].transform('sum')
+        contract_totals = suma_por_contrato(df_matriz['Cupos'], cod_contrato)
         # Solo aplicamos el fallback donde el total original sea 0
         mask_zero = (df_matriz['CUPOS'] == 0) & (contract_totals > 0)
         df_matriz.loc[mask_zero, 'CUPOS'] = contract_totals[mask_zero]
@@ -300,6 +455,7 @@ if all_data:
     # Asegurar columnas finales
     for c in COLS_MATRIZ_HCB:
         if c not in df_matriz.columns: df_matriz[c] = None
+    tabla_contratos = tabla_contrato_regional(df_matriz, mask_dupe)
     df_matriz = df_matriz[COLS_MATRIZ_HCB]
 
     # --- ZONIFICACIÓN ---
@@ -309,23 +465,20 @@ if all_data:
     df_zoni = df_zoni[COLS_ZONI_HCB]
 
     # --- RESUMEN_EJECUTIVO ---
-    # Usamos df_matriz (sin duplicados) para el resumen para asegurar consistencia
-    res_reg = df_matriz.groupby('REGIONAL').agg({
+    # Se acumula desde la tabla de contratos (valores de la primera fila de cada contrato)
+    res_reg = tabla_contratos.groupby('REGIONAL', observed=True).agg({
         'REFERENCIA / No. CONTRATO SECOP': 'nunique',
         'CUPOS': 'sum',
         'VALOR INICIAL 2026': 'sum',
-        'VALOR A ADICIONAR': 'sum'
-    }).rename(columns={'REFERENCIA / No. CONTRATO SECOP': 'No. Contratos', 'CUPOS': 'Cupos Totales', 'VALOR INICIAL 2026': 'Valor Inicial (Total)', 'VALOR A ADICIONAR': 'Valor Adicion (Total)'})
-    
-    # Madres (sumamos de todas las filas granulares)
-    madres_reg = df_full.groupby('REGIONAL')['CANTIDAD DE MADRES POR UDS'].sum()
-    res_reg = res_reg.join(madres_reg).rename(columns={'CANTIDAD DE MADRES POR UDS': 'Total Madres'})
+        'VALOR A ADICIONAR': 'sum',
+        'CANTIDAD DE MADRES POR UDS': 'sum'
+    }).rename(columns={'REFERENCIA / No. CONTRATO SECOP': 'No. Contratos', 'CUPOS': 'Cupos Totales', 'VALOR INICIAL 2026': 'Valor Inicial (Total)', 'VALOR A ADICIONAR': 'Valor Adicion (Total)', 'CANTIDAD DE MADRES POR UDS': 'Total Madres'})
     res_reg['Inversion por Cupo'] = res_reg['Valor Adicion (Total)'] / res_reg['Cupos Totales']
     res_reg = res_reg.reset_index()
 
     # Resumen por Modalidad
-    df_contracts = df_matriz.drop_duplicates(subset=['REFERENCIA / No. CONTRATO SECOP'])
-    res_mod = df_contracts.groupby('Componente para la UDS').agg({
+    df_contracts = tabla_contratos[tabla_contratos['_PRINCIPAL']]
+    res_mod = df_contracts.groupby('Componente para la UDS', observed=True).agg({
         'REFERENCIA / No. CONTRATO SECOP': 'nunique',
         'CUPOS': 'sum',
         'VALOR A ADICIONAR': 'sum'
@@ -334,50 +487,10 @@ if all_data:
     # --- CONSOLIDADO POR CONTRATO (Estilo Casanare - Super Matriz Ejecutiva) ---
     # Calculamos sumatorias granulares para rescate si el total único falla
     df_full['VALOR TOTAL ADICION (MULTIPLE)'] = pd.to_numeric(df_full['VALOR TOTAL ADICION (MULTIPLE)'], errors='coerce').fillna(0)
-    
-    agg_contrato = {
-        'REGIONAL': 'first',
-        'NIT CONTRATISTA 2026': 'first',
-        'CONTRATISTA 2026': 'first',
-        'SERVICIO 2026': lambda x: ' / '.join(sorted(set(str(v) for v in x if pd.notna(v)))),
-        'Componente para la UDS': 'first',
-        'No. RP': 'first',
-        'VIGENCIA': 'first',
-        'FORMA CONTRATACION': 'first',
-        'DURACION INICIAL': 'first',
-        'DURACION ADICION': 'first',
-        'CUPOS': 'first',
-        'CANTIDAD DE MADRES POR UDS': 'sum',
-        'VALOR UNITARIO MES': 'first',
-        'VALOR CANASTA 2026': 'first',
-        # Pesos ($)
-        'VALOR INICIAL 2026': 'first',
-        'APORTE CONTRAPARTIDA': 'first',
-        'VALOR ADICIONES A LA FECHA': 'first',
-        'ADICION OTROS CONCEPTOS': 'first',
-        'VALOR REDUCCIONES A LA FECHA': 'first',
-        'INEJECUCIONES': 'first',
-        'VALOR ACTUAL': 'first',
-        'VALOR FINAL ADICION SERVICIO': 'first',
-        'VALOR A ADICIONAR': 'first',
-        'CONTRAPARTIDA ADICION': 'first',
-        # SMLV
-        'VALOR INICIAL 2026 (SMLV)': 'first',
-        'VALOR ACTUAL TOTAL DEL CONTRATO (SMLV)': 'first',
-        'VALOR FINAL ADICION SERVICIO (SMLV)': 'first',
-        'VALOR TOTAL DEL CONTRATO (SMLV)': 'first',
-        # Alertas
-        'SANCIONATORIOS': 'first',
-        'ALERTA 1000 SMLMV': 'first',
-        'ALERTA 5000 SMLMV': 'first'
-    }
-    
-    # Ejecutamos la agregación
-    df_contrato = df_full.groupby('REFERENCIA / No. CONTRATO SECOP').agg({k: v for k, v in agg_contrato.items() if k in df_full.columns}).reset_index()
+    df_contrato = consolidar_por_contrato(df_full, cod_contrato, contratos, AGG_CONTRATO)
     
     # --- FALLBACK FINANCIERO ---
     # Si el valor único es 0, usamos la suma de los múltiples
-    df_contrato['VALOR_MULTIPLE_SUM'] = df_full.groupby('REFERENCIA / No. CONTRATO SECOP')['VALOR TOTAL ADICION (MULTIPLE)'].sum().values
     if 'VALOR A ADICIONAR' in df_contrato.columns:
         mask_val_zero = (df_contrato['VALOR A ADICIONAR'] == 0) & (df_contrato['VALOR_MULTIPLE_SUM'] > 0)
         df_contrato.loc[mask_val_zero, 'VALOR A ADICIONAR'] = df_contrato['VALOR_MULTIPLE_SUM']
@@ -402,12 +515,56 @@ if all_data:
     df_contrato = df_contrato[final_cols_contrato]
 
     # Guardar
-    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-        res_reg.to_excel(writer, sheet_name='RESUMEN_EJECUTIVO', index=False)
-        df_contrato.to_excel(writer, sheet_name='CONSOLIDADO_CONTRATO', index=False)
-        df_matriz.to_excel(writer, sheet_name='MATRIZ_CALCULADA', index=False)
-        df_zoni.to_excel(writer, sheet_name='ZONIFICACIÓN- PEDAGOGICO', index=False)
-        res_mod.to_excel(writer, sheet_name='RESUMEN_MODALIDAD', index=False)
+    hojas = {
+        'RESUMEN_EJECUTIVO': res_reg,
+        'CONSOLIDADO_CONTRATO': df_contrato,
+        'MATRIZ_CALCULADA': df_matriz,
+        'ZONIFICACIÓN- PEDAGOGICO': df_zoni,
+        'RESUMEN_MODALIDAD': res_mod,
+    }
+    formatos = {c: CURRENCY_FORMAT for c in COLS_PESOS_HCB}
+    with StreamingExcelWriter(output_file) as writer:
+        for sheet_name, df in hojas.items():
+            writer.write_sheet(sheet_name, df, number_formats=formatos)
+    # Copia columnar para las etapas 02/03 (el Excel queda como entregable)
+    write_dataset(output_file, {k: v.reset_index(drop=True) for k, v in hojas.items()})
+    if fuentes is not None:
+        write_sources(output_file, fuentes)
 
     print(f"\n¡CONSOLIDACIÓN HCB COMPLETADA!")
     print(f"Ubicación: {output_file}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consolidación de matrices HCB regionales.")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Procesos para leer los libros en paralelo (1 = serial).")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="No usar ni actualizar la caché de libros ya procesados.")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="Borrar la caché y volver a procesar todos los libros.")
+    args = parser.parse_args()
+
+    print(f"Consolidando HCB con Resumen Ejecutivo...")
+    t0 = time.time()
+    cache = FileCache(os.path.join(os.path.dirname(output_file), '.cache_hcb'), code_version(*CODIGO_CACHE),
+                      enabled=not args.no_cache, rebuild=args.rebuild)
+    archivos = listar_archivos_hcb(base_dir)
+    resultados = leer_archivos(archivos, workers=args.workers, cache=cache)
+    # Manifiesto informativo: qué libros (y con qué regionales) entraron al consolidado.
+    # Ningún paso lo lee; el paso 02 lleva su propio manifiesto sobre otra carpeta.
+    # El SHA-1 sale del índice de la caché (ya calculado al leer); con --no-cache
+    # no se calcula y la huella queda en tamaño y fecha
+    fuentes = [source_entry(os.path.join(root, f),
+                            cache.fingerprint(os.path.join(root, f)) if cache.enabled else None,
+                            hash_content=cache.enabled,
+                            hoja=res['hoja'], regionales=res['regionales'], error=res['error'])
+               for (root, f), res in zip(archivos, resultados)]
+    cache.close()
+    all_data = resolver_pertenencia(resultados)
+    print(f"  Lectura de {len(archivos)} archivos en {time.time() - t0:.1f}s "
+          f"(workers={args.workers}, caché: {cache.hits} reutilizados, {cache.misses} leídos)")
+    generar_consolidado(all_data, output_file, fuentes)
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,14 @@ import shutil
 import pandas as pd
 import warnings
 import re
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from pipeline_common.columnar_store import copy_dataset, read_sheets, update_dataset
+from pipeline_common.excel_reader import read_sheet_with_header
+from pipeline_common.excel_writer import write_excel
+from pipeline_common.skip_report import SkipReport
+from pipeline_common.source_manifest import read_sources, source_entry, source_key, source_unchanged, write_sources
 
 warnings.filterwarnings('ignore', category=UserWarning, module='openpyxl')
 
@@ -15,12 +23,19 @@ if not os.path.exists(original_file):
     print(f"Error: No se encuentra el archivo base {original_file}. Ejecuta primero el paso 01.")
     exit()
 
+# Libros ya revisados por la corrida anterior de este paso. El manifiesto del
+# paso 01 no sirve aquí: registra los libros de Matrices_validadas_definitivas,
+# no los de esta carpeta, así que la primera corrida abre todos los libros.
+fuentes_conocidas = read_sources(output_file)
+
 shutil.copy(original_file, output_file)
+dataset_copiado = copy_dataset(original_file, output_file)
 print(f"Refinando archivo HCB (Estructura Análoga): {output_file}")
 
-xls_orig = pd.ExcelFile(original_file)
-df_matriz_orig = pd.read_excel(xls_orig, sheet_name='MATRIZ_CALCULADA')
-df_zoni_orig = pd.read_excel(xls_orig, sheet_name='ZONIFICACIÓN- PEDAGOGICO')
+# Usa el dataset columnar del paso 01 si está al día; si no, el Excel
+hojas_orig = read_sheets(original_file, ['MATRIZ_CALCULADA', 'ZONIFICACIÓN- PEDAGOGICO'])
+df_matriz_orig = hojas_orig['MATRIZ_CALCULADA']
+df_zoni_orig = hojas_orig['ZONIFICACIÓN- PEDAGOGICO']
 
 regionales_existentes = set(df_matriz_orig['REGIONAL'].dropna().astype(str).str.upper().str.strip())
 
@@ -30,8 +45,20 @@ def clean_regional(name):
 
 regionales_existentes = {clean_regional(r) for r in regionales_existentes}
 
+def sin_regionales_nuevas(entrada):
+    """
+    El manifiesto basta para descartar el libro sin abrirlo si se leyó sin error
+    y todas sus regionales ya están en el consolidado (o no tiene ninguna).
+    """
+    if entrada.get('error'):
+        return False
+    return all(clean_regional(r) in regionales_existentes for r in entrada['regionales'])
+
 nuevos_m = []
 archivos_ignorados = [os.path.basename(original_file), os.path.basename(output_file)]
+omitidos = SkipReport()
+fuentes = dict(fuentes_conocidas)
+sin_cambios = 0
 
 for root, dirs, files in os.walk(base_dir):
     for f in files:
@@ -40,36 +67,58 @@ for root, dirs, files in os.walk(base_dir):
             'hcb' in f_lower and 'alimento' not in f_lower and f not in archivos_ignorados):
             
             path = os.path.join(root, f)
+            entrada = fuentes_conocidas.get(source_key(path))
+            if entrada is not None and source_unchanged(entrada, path) and sin_regionales_nuevas(entrada):
+                sin_cambios += 1
+                if not entrada['regionales']:
+                    omitidos.add(path, entrada.get('motivo', 'sin_regionales'), entrada.get('detalle', ''))
+                continue
             try:
-                xls = pd.ExcelFile(path)
-                sheet_m = [s for s in xls.sheet_names if 'MATRIZ' == s.upper()]
-                if sheet_m:
-                    df_temp = pd.read_excel(xls, sheet_name=sheet_m[0], nrows=10, header=None)
-                    h_idx = None
-                    for idx, row in df_temp.iterrows():
-                        if any(isinstance(val, str) and 'REGIONAL' == val.strip().upper() for val in row.values):
-                            h_idx = idx
-                            break
-                    if h_idx is not None:
-                        df = pd.read_excel(xls, sheet_name=sheet_m[0], header=h_idx)
-                        col_r = [c for c in df.columns if 'REGIONAL' == str(c).strip().upper()][0]
-                        regs_in_file = df[col_r].dropna().unique()
-                        regs_to_add = [r for r in regs_in_file if clean_regional(r) not in regionales_existentes]
-                        
-                        if regs_to_add:
-                            print(f"  [NUEVO] Agregando {regs_to_add} desde {f}")
-                            df = df[df[col_r].isin(regs_to_add)].copy()
-                            df['Archivo_Origen'] = f
-                            nuevos_m.append(df)
-                            for r in regs_to_add: regionales_existentes.add(clean_regional(r))
+                # Una sola pasada sobre la hoja: detecta el encabezado y carga los datos
+                hoja, df = read_sheet_with_header(
+                    path,
+                    lambda s: 'MATRIZ' == s.upper(),
+                    lambda values: any(isinstance(val, str) and 'REGIONAL' == val.strip().upper() for val in values),
+                    max_scan_rows=10,
+                )
             except Exception as e:
-                pass
+                omitidos.add(path, 'error_lectura', f"{type(e).__name__}: {e}")
+                fuentes.pop(source_key(path), None)
+                continue
+            cols_r = [] if df is None else [c for c in df.columns if 'REGIONAL' == str(c).strip().upper()]
+            if not cols_r:
+                if hoja is None:
+                    motivo, detalle = 'sin_matriz', 'sin hoja MATRIZ'
+                else:
+                    motivo, detalle = 'sin_regional', f"hoja '{hoja}' sin columna REGIONAL"
+                omitidos.add(path, motivo, detalle)
+                fuentes[source_key(path)] = source_entry(path, hoja=hoja, regionales=[], error=None,
+                                                         motivo=motivo, detalle=detalle)
+                continue
+            col_r = cols_r[0]
+            regs_in_file = df[col_r].dropna().unique()
+            fuentes[source_key(path)] = source_entry(
+                path, hoja=hoja, regionales=[r if isinstance(r, str) else str(r) for r in regs_in_file], error=None)
+            regs_to_add = [r for r in regs_in_file if clean_regional(r) not in regionales_existentes]
+        
+            if regs_to_add:
+                print(f"  [NUEVO] Agregando {regs_to_add} desde {f}")
+                df = df[df[col_r].isin(regs_to_add)].copy()
+                df['Archivo_Origen'] = f
+                nuevos_m.append(df)
+                for r in regs_to_add: regionales_existentes.add(clean_regional(r))
+
+print(f"  Libros sin cambios ni regionales nuevas (no se abrieron): {sin_cambios}")
+omitidos.print_summary()
+omitidos.save(os.path.splitext(output_file)[0] + '_omitidos.csv')
 
 if nuevos_m:
     df_m_final = pd.concat([df_matriz_orig] + nuevos_m, ignore_index=True)
-    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-        df_m_final.to_excel(writer, sheet_name='MATRIZ_CALCULADA', index=False)
-        df_zoni_orig.to_excel(writer, sheet_name='ZONIFICACIÓN- PEDAGOGICO', index=False)
+    hojas_final = {'MATRIZ_CALCULADA': df_m_final, 'ZONIFICACIÓN- PEDAGOGICO': df_zoni_orig}
+    write_excel(output_file, hojas_final)
+    # Solo cambia la MATRIZ: la ZONIFICACIÓN copiada del paso 01 se conserva tal cual
+    update_dataset(output_file, hojas_final, changed={'MATRIZ_CALCULADA'} if dataset_copiado else None)
     print(f"Proceso completado. Archivo: {output_file}")
 else:
     print("No se encontraron nuevas regionales.")
+write_sources(output_file, fuentes.values())
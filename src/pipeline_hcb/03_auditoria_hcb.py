@@ -1,8 +1,33 @@
-import pandas as pd
 import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from pipeline_common.audit_rules import (ConflictingKeyRule, DuplicateKeyRule, RangeRule, RequiredFieldsRule,
+                                         ThresholdRule, TotalRowsRule, print_audit_summary, run_audit)
+from pipeline_common.columnar_store import read_sheet
+from pipeline_common.schemas import apply_schema
 
 file_path = r'D:\ICBF\cost-tracking\data\insumos 28 abril\consolidacion_matriz_hcb_28042026_COPIA_SEGURA.xlsx'
 
+CONTRATO = 'REFERENCIA / No. CONTRATO SECOP'
+
+# Reglas sobre MATRIZ_CALCULADA. Los valores de contrato (CUPOS, pesos, SMLV) solo
+# vienen en la primera fila de cada contrato, así que cada contrato se evalúa una vez.
+REGLAS_HCB = [
+    TotalRowsRule('filas_total', severity='error',
+                  description="Filas de TOTAL/SUBTOTAL que duplicarían los valores al sumar"),
+    DuplicateKeyRule('filas_duplicadas', severity='alerta',
+                     description="Filas idénticas (libro regional leído dos veces)"),
+    ConflictingKeyRule('contrato_en_varias_regionales', CONTRATO, 'REGIONAL', severity='alerta'),
+    RangeRule('cupos_negativos', 'CUPOS', min_value=0, severity='error'),
+    RangeRule('valor_actual_negativo', 'VALOR ACTUAL', min_value=0, severity='error'),
+    RangeRule('valor_a_adicionar_negativo', 'VALOR A ADICIONAR', min_value=0, severity='error'),
+    ThresholdRule('contrato_mayor_1000_smlmv', 'VALOR TOTAL DEL CONTRATO (SMLV)', 1000, severity='info'),
+    ThresholdRule('contrato_mayor_5000_smlmv', 'VALOR TOTAL DEL CONTRATO (SMLV)', 5000, severity='alerta'),
+    RequiredFieldsRule('campos_criticos_vacios', ['REGIONAL', CONTRATO, 'NIT CONTRATISTA 2026', 'SERVICIO 2026'],
+                       severity='alerta'),
+]
+
 if not os.path.exists(file_path):
     print(f"Error: No se encuentra el archivo {file_path}. Ejecuta los pasos 01 y 02 de HCB.")
     exit()
@@ -10,26 +35,21 @@ if not os.path.exists(file_path):
 print(f"Iniciando auditoría HCB sobre: {os.path.basename(file_path)}")
 
 try:
-    df = pd.read_excel(file_path, sheet_name='MATRIZ_CALCULADA')
+    # Tipos compactos del registro (categorías, enteros con nulos) al cargar
+    df = apply_schema(read_sheet(file_path, 'MATRIZ_CALCULADA'), 'hcb_matriz', report=True)
     
     print(f"\n--- ESTADÍSTICAS HCB ---")
     print(f"Total registros consolidados: {len(df)}")
     print(f"Regionales presentes: {len(df['REGIONAL'].unique())}")
-    
-    # 1. Detección de Totales
-    mask_total = df.apply(lambda row: row.astype(str).str.contains('TOTAL', case=False).any(), axis=1)
-    total_rows = df[mask_total]
-    if not total_rows.empty:
-        print(f"\n[ALERTA] Se encontraron {len(total_rows)} filas que parecen ser TOTALES.")
-        print(total_rows[['REGIONAL', 'Archivo_Origen']].head())
-    
-    # 2. Verificación de duplicados por contrato
-    # En HCB a veces un contrato tiene muchas filas por diferentes conceptos, 
-    # pero revisamos si hay algo sospechoso.
-    contract_col = 'REFERENCIA / No. CONTRATO SECOP'
-    if contract_col in df.columns:
-        counts = df[contract_col].value_counts()
-        print(f"\nContratos analizados: {len(counts)}")
+    if CONTRATO in df.columns:
+        print(f"Contratos analizados: {df[CONTRATO].nunique()}")
+
+    # Todas las reglas en una pasada; hallazgos en formato tabla para revisarlos o cruzarlos
+    hallazgos, tiempos = run_audit(df, REGLAS_HCB, sheet='MATRIZ_CALCULADA')
+    print_audit_summary(hallazgos, tiempos)
+    salida = os.path.splitext(file_path)[0] + '_hallazgos.csv'
+    hallazgos.to_csv(salida, index=False, encoding='utf-8-sig')
+    print(f"\nHallazgos ({len(hallazgos)}): {salida}")
         
 except Exception as e:
     print(f"Error: {e}")
@@ -0,0 +1,73 @@
+"""
+`clean_currency_series` debe dar exactamente lo mismo que
+`s.apply(clean_currency)`, que es la referencia del paso 01 de HCB.
+"""
+
+import datetime
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from pipeline_common.cleaning import clean_currency, clean_currency_series
+
+
+def assert_same_as_apply(s):
+    esperado = s.apply(clean_currency).astype('float64')
+    pd.testing.assert_series_equal(clean_currency_series(s), esperado)
+
+
+@pytest.mark.parametrize('valor', [
+    '$ 1.234.567,89', '$1.200.000', '1.200.000', '1234,5', ' 12 ', '-1.500,25', '+7', '0,5',
+    '', ' ', 'N/A', 'abc', '12abc', 'a1b2', '$', '.', ',', '1,2,3', '1e5', 'inf', 'nan',
+    '3.000 pesos', 'USD 45,10', 'COP$ 2.000.000,00', '12-34',
+    0, 7, -3, 2.5, float('nan'), None, True, False, np.int64(9), np.float64(1.25),
+    datetime.datetime(2026, 4, 28), datetime.time(8, 30),
+])
+def test_valor_suelto(valor):
+    assert_same_as_apply(pd.Series([valor], dtype=object))
+
+
+@pytest.mark.parametrize('s', [
+    pd.Series([1, 2, 3]),
+    pd.Series([1.5, np.nan, 3.0]),
+    pd.Series([True, False]),
+    pd.Series([np.nan, np.nan], dtype=object),
+    pd.Series([], dtype=object),
+    pd.Series(['1.000', 2, 3.5, None, '$ 4,5'], dtype=object),
+    pd.Series(['1.000', '2.000', None], dtype='string'),
+    pd.Series(['1.000', '1.000', 'x', ''], dtype='category'),
+])
+def test_tipos_de_columna(s):
+    assert_same_as_apply(s)
+
+
+def test_conserva_indice_y_nombre():
+    s = pd.Series(['$ 1.000', None, '2,5'], index=[10, 5, 7], name='VALOR ACTUAL')
+    out = clean_currency_series(s)
+    assert out.name == 'VALOR ACTUAL'
+    assert list(out.index) == [10, 5, 7]
+    assert_same_as_apply(s)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_mezcla_aleatoria(seed):
+    """Formatos de la MATRIZ mezclados al azar, con valores repetidos como tras el ffill."""
+    rng = np.random.default_rng(seed)
+    n = 5000
+    valores = rng.integers(-10**9, 5 * 10**10, n) / 100
+    basura = np.array(['N/A', 'SIN DATO', '-', '', ' ', '$', '12abc', 'a.1,2', '1,2,3', '0x10', '1e3'], dtype=object)
+    celdas = valores.astype(object)
+    tipo = rng.integers(0, 7, n)
+    pesos = [f"$ {v:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.') for v in valores]
+    celdas[tipo == 1] = np.array(pesos, dtype=object)[tipo == 1]
+    celdas[tipo == 2] = [f"{v:.2f}".replace('.', ',') for v in valores[tipo == 2]]
+    celdas[tipo == 3] = [int(v) for v in valores[tipo == 3]]
+    celdas[tipo == 4] = np.nan
+    celdas[tipo == 5] = basura[rng.integers(0, len(basura), (tipo == 5).sum())]
+    celdas[tipo == 6] = [str(int(v)) for v in valores[tipo == 6]]
+    s = pd.Series(celdas[rng.integers(0, n, 4 * n)], dtype=object)
+    assert_same_as_apply(s)